@@ -0,0 +1,231 @@
+"""
+Batch background removal for many images (used by the Streamlit batch mode and as a CLI).
+
+    python batch.py photos/ cutouts/ --model u2netp --workers 6
+    python batch.py photos/ cutouts/               # run again: finished files are skipped
+
+Each worker thread runs decode → inference → encode for one image. Inference
+borrows a session from the shared pool, so while some threads wait on the model,
+others decode or encode: the three stages overlap across images. Threads are
+enough here because Pillow codecs and ONNX Runtime release the GIL, and one set
+of loaded models is shared instead of one per process.
+
+For directory runs a manifest (manifest.jsonl in the output folder) records every
+finished file, so an interrupted run resumes where it stopped.
+"""
+import argparse
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from io import BytesIO
+
+from PIL import Image
+
+from matte import REFINE_MODES, remove_fullres
+from rembg_sessions import AVAILABLE_MODELS, REMBG_MODEL, get_session_pool
+from result_cache import OUTPUT_FORMAT, OUTPUT_FORMATS, OutputEncoder
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+MANIFEST_NAME = "manifest.jsonl"
+MAX_IMAGE_SIZE = 2000  # pixels, for the resized (non full resolution) mode
+
+
+def default_workers(pool):
+    """Enough threads to keep every session busy while others decode/encode"""
+    return pool.pool_size + 2
+
+
+def process_one(data, pool, full_resolution=True, refine="none", encoder=None):
+    """One image through all stages; returns (encoded bytes, per-stage timings)"""
+    encoder = encoder or OutputEncoder()
+    timings = {}
+    start = time.perf_counter()
+    image = Image.open(BytesIO(data))
+    image.load()
+    timings["decode"] = time.perf_counter() - start
+
+    t = time.perf_counter()
+    if full_resolution:
+        fixed = remove_fullres(image, pool, refine=refine)
+    else:
+        image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.LANCZOS)
+        fixed = pool.remove(image)
+    timings["inference"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    output = encoder.encode(fixed)
+    timings["encode"] = time.perf_counter() - t
+    timings["total"] = time.perf_counter() - start
+    return output, timings
+
+
+def run_batch(items, pool, workers=None, full_resolution=True, refine="none", encoder=None):
+    """
+    items: iterable of (name, read) where read() returns the image bytes.
+    Yields {"name", "output", "timings"} or {"name", "error"} as images finish.
+    At most 2 x workers images are in flight, so memory stays bounded for large folders.
+    """
+    workers = workers or default_workers(pool)
+
+    def task(name, read):
+        try:
+            output, timings = process_one(read(), pool, full_resolution, refine, encoder)
+            return {"name": name, "output": output, "timings": timings}
+        except Exception as e:
+            return {"name": name, "error": str(e)}
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bg-batch") as executor:
+        running = set()
+        for name, read in items:
+            running.add(executor.submit(task, name, read))
+            if len(running) >= workers * 2:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in running:
+            yield future.result()
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if "error" not in r]
+    stage_means = {
+        stage: sum(r["timings"][stage] for r in ok) / len(ok)
+        for stage in ("decode", "inference", "encode", "total")
+    } if ok else {}
+    return {
+        "images": len(ok),
+        "errors": len(results) - len(ok),
+        "seconds": elapsed,
+        "images_per_second": len(ok) / elapsed if elapsed else 0.0,
+        "mean_stage_seconds": stage_means,
+    }
+
+
+def output_names(names, extension):
+    """
+    name → output file name. Inputs that share a stem (a.jpg and a.png) would both
+    become a.png, so those keep their source extension in the name (a_jpg.png, a_png.png).
+    """
+    stems = {}
+    for name in names:
+        stem = os.path.splitext(name)[0]
+        stems[stem] = stems.get(stem, 0) + 1
+    result = {}
+    for name in names:
+        stem, source_ext = os.path.splitext(name)
+        if stems[stem] > 1:
+            stem = f"{stem}_{source_ext.lstrip('.').lower()}"
+        result[name] = stem + extension
+    return result
+
+
+def make_zip(results, encoder=None):
+    """ZIP of the outputs (stored, not deflated: PNG/WebP are already compressed)"""
+    extension = (encoder or OutputEncoder()).extension
+    outputs = [r for r in results if "output" in r]
+    names = output_names([r["name"] for r in outputs], extension)
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for r in outputs:
+            zf.writestr(names[r["name"]], r["output"])
+    return buf.getvalue()
+
+
+# Directory mode with a resumable manifest
+def _fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_manifest(output_dir):
+    """name → manifest entry for files that finished in earlier runs"""
+    entries = {}
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by an interruption
+                entries[entry["name"]] = entry
+    return entries
+
+
+def run_directory(input_dir, output_dir, pool, workers=None, full_resolution=True, refine="none",
+                  encoder=None, log=print):
+    encoder = encoder or OutputEncoder()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    names = sorted(n for n in os.listdir(input_dir) if n.lower().endswith(IMAGE_EXTENSIONS))
+    out_names = output_names(names, encoder.extension)
+
+    pending = []
+    for name in names:
+        entry = manifest.get(name)
+        src = os.path.join(input_dir, name)
+        if (entry and entry.get("fingerprint") == _fingerprint(src)
+                and entry["output"] == out_names[name]
+                and os.path.exists(os.path.join(output_dir, entry["output"]))):
+            continue
+        pending.append(name)
+    log(f"{len(names)} images, {len(names) - len(pending)} already done, {len(pending)} to process")
+
+    def reader(name):
+        def read():
+            with open(os.path.join(input_dir, name), "rb") as f:
+                return f.read()
+        return read
+
+    results = []
+    start = time.perf_counter()
+    with open(os.path.join(output_dir, MANIFEST_NAME), "a", encoding="utf-8") as manifest_file:
+        for r in run_batch(((n, reader(n)) for n in pending), pool, workers, full_resolution, refine, encoder):
+            if "error" in r:
+                log(f"FAILED {r['name']}: {r['error']}")
+            else:
+                out_name = out_names[r["name"]]
+                tmp_path = os.path.join(output_dir, out_name + ".tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(r["output"])
+                os.replace(tmp_path, os.path.join(output_dir, out_name))
+                # Record the file only after its output is fully written
+                manifest_file.write(json.dumps({
+                    "name": r["name"],
+                    "output": out_name,
+                    "fingerprint": _fingerprint(os.path.join(input_dir, r["name"])),
+                    "timings": r["timings"],
+                }) + "\n")
+                manifest_file.flush()
+                t = r["timings"]
+                log(f"{r['name']}: decode {t['decode']:.2f}s · inference {t['inference']:.2f}s · "
+                    f"encode {t['encode']:.2f}s · total {t['total']:.2f}s")
+                r.pop("output")
+            results.append(r)
+    return summarize(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove backgrounds from every image in a folder")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--model", default=REMBG_MODEL, choices=AVAILABLE_MODELS)
+    parser.add_argument("--workers", type=int, default=0, help="worker threads (default: sessions + 2)")
+    parser.add_argument("--refine", default="none", choices=REFINE_MODES)
+    parser.add_argument("--format", default=OUTPUT_FORMAT, choices=OUTPUT_FORMATS)
+    parser.add_argument("--resized", action="store_true", help=f"resize to {MAX_IMAGE_SIZE}px instead of full resolution")
+    args = parser.parse_args()
+
+    pool = get_session_pool(args.model)
+    summary = run_directory(
+        args.input_dir, args.output_dir, pool,
+        workers=args.workers or None, full_resolution=not args.resized, refine=args.refine,
+        encoder=OutputEncoder(args.format),
+    )
+    print(f"{summary['images']} images in {summary['seconds']:.2f}s "
+          f"({summary['images_per_second']:.2f} images/s, {summary['errors']} errors)")
+    for stage, seconds in summary["mean_stage_seconds"].items():
+        print(f"  mean {stage:9s} {seconds:.3f}s")
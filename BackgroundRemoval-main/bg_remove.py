@@ -1,12 +1,16 @@
 import streamlit as st
-from rembg import remove
 from PIL import Image
 import numpy as np
 from io import BytesIO
 import base64
+import hashlib
 import os
 import traceback
 import time
+from rembg_sessions import AVAILABLE_MODELS, REMBG_MODEL, get_session_pool
+from matte import REFINE_MODES, remove_fullres
+from batch import make_zip, run_batch, summarize
+from result_cache import OUTPUT_FORMAT, OUTPUT_FORMATS, OutputEncoder, get_result_cache
 
 st.set_page_config(layout="wide", page_title="Image Background Remover")
 
@@ -22,13 +26,6 @@ MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 # Max dimensions for processing
 MAX_IMAGE_SIZE = 2000  # pixels
 
-# Download the fixed image
-def convert_image(img):
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    byte_im = buf.getvalue()
-    return byte_im
-
 # Resize image while maintaining aspect ratio
 def resize_image(image, max_size):
     width, height = image.size
@@ -44,19 +41,38 @@ def resize_image(image, max_size):
     
     return image.resize((new_width, new_height), Image.LANCZOS)
 
-@st.cache_data
-def process_image(image_bytes):
-    """Process image with caching to avoid redundant processing"""
-    try:
+# Preloaded inference sessions, built once per process and model
+@st.cache_resource(show_spinner="Loading background removal model...")
+def load_session_pool(model_name):
+    return get_session_pool(model_name)
+
+def process_image(image_bytes, model_name=REMBG_MODEL, full_resolution=True, refine="none", encoder=None):
+    """Encoded output bytes and whether they came from the result cache"""
+    encoder = encoder or OutputEncoder()
+    cache = get_result_cache()
+    key = cache.key(
+        image_bytes, "remove_background", model=model_name, full_resolution=full_resolution,
+        refine=refine if full_resolution else "none", max_size=MAX_IMAGE_SIZE, encoder=encoder.params(),
+    )
+
+    def compute():
         image = Image.open(BytesIO(image_bytes))
-        # Resize large images to prevent memory issues
-        resized = resize_image(image, MAX_IMAGE_SIZE)
-        # Process the image
-        fixed = remove(resized)
-        return image, fixed
+        pool = load_session_pool(model_name)
+        if full_resolution:
+            # Predict the mask on a small proxy and apply it to the original pixels
+            fixed = remove_fullres(image, pool, refine=refine)
+        else:
+            # Resize large images to prevent memory issues
+            resized = resize_image(image, MAX_IMAGE_SIZE)
+            # Process the image with a warm pooled session
+            fixed = pool.remove(resized)
+        return encoder.encode(fixed)
+
+    try:
+        return cache.get_or_compute(key, compute)
     except Exception as e:
         st.error(f"Error processing image: {str(e)}")
-        return None, None
+        return None, False
 
 def fix_image(upload):
     try:
@@ -83,8 +99,8 @@ def fix_image(upload):
         progress_bar.progress(30)
         
         # Process image (using cache if available)
-        image, fixed = process_image(image_bytes)
-        if image is None or fixed is None:
+        fixed, cached = process_image(image_bytes, model_name, full_resolution, refine, encoder)
+        if fixed is None:
             return
         
         progress_bar.progress(80)
@@ -92,7 +108,7 @@ def fix_image(upload):
         
         # Display images
         col1.write("Original Image :camera:")
-        col1.image(image)
+        col1.image(image_bytes)
         
         col2.write("Fixed Image :wrench:")
         col2.image(fixed)
@@ -101,14 +117,14 @@ def fix_image(upload):
         st.sidebar.markdown("\n")
         st.sidebar.download_button(
             "Download fixed image", 
-            convert_image(fixed), 
-            "fixed.png", 
-            "image/png"
+            fixed, 
+            "fixed" + encoder.extension, 
+            encoder.mime
         )
         
         progress_bar.progress(100)
         processing_time = time.time() - start_time
-        status_text.text(f"Completed in {processing_time:.2f} seconds")
+        status_text.text(f"Completed in {processing_time:.2f} seconds" + (" (cached)" if cached else ""))
         
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
@@ -116,21 +132,103 @@ def fix_image(upload):
         # Log the full error for debugging
         print(f"Error in fix_image: {traceback.format_exc()}")
 
+def fix_batch(uploads):
+    """Process several images in parallel and offer them as one ZIP"""
+    # Keep results across reruns (the download button triggers one); keyed on content so
+    # re-uploading different images with the same names and sizes reprocesses them
+    files = tuple((u.name, hashlib.sha256(u.getvalue()).hexdigest()) for u in uploads)
+    batch_key = (files, model_name, full_resolution, refine, output_format)
+    if st.session_state.get("batch_key") != batch_key:
+        pool = load_session_pool(model_name)
+        progress_bar = st.sidebar.progress(0)
+        status_text = st.sidebar.empty()
+        results = []
+        start_time = time.time()
+        items = [(u.name, u.getvalue) for u in uploads]
+        for result in run_batch(items, pool, full_resolution=full_resolution, refine=refine, encoder=encoder):
+            results.append(result)
+            progress_bar.progress(len(results) / len(items))
+            status_text.text(f"Processed {len(results)}/{len(items)} images")
+        summary = summarize(results, time.time() - start_time)
+        st.session_state["batch_key"] = batch_key
+        st.session_state["batch_zip"] = make_zip(results, encoder)
+        st.session_state["batch_results"] = [{k: v for k, v in r.items() if k != "output"} for r in results]
+        st.session_state["batch_summary"] = summary
+
+    summary = st.session_state["batch_summary"]
+    st.write(
+        f"Processed {summary['images']} images in {summary['seconds']:.2f} seconds "
+        f"({summary['images_per_second']:.2f} images/s)"
+    )
+    rows = []
+    for r in st.session_state["batch_results"]:
+        if "error" in r:
+            rows.append({"image": r["name"], "error": r["error"]})
+        else:
+            rows.append({"image": r["name"], **{f"{stage} (s)": round(v, 3) for stage, v in r["timings"].items()}})
+    st.dataframe(rows, use_container_width=True)
+    st.sidebar.download_button(
+        "Download all (ZIP)",
+        st.session_state["batch_zip"],
+        "fixed_images.zip",
+        "application/zip",
+    )
+
 # UI Layout
 col1, col2 = st.columns(2)
 my_upload = st.sidebar.file_uploader("Upload an image", type=["png", "jpg", "jpeg"])
+batch_uploads = st.sidebar.file_uploader(
+    "Batch: upload several images", type=["png", "jpg", "jpeg"], accept_multiple_files=True,
+)
+model_name = st.sidebar.selectbox(
+    "Model",
+    AVAILABLE_MODELS,
+    index=AVAILABLE_MODELS.index(REMBG_MODEL) if REMBG_MODEL in AVAILABLE_MODELS else 0,
+    help="u2netp is the fastest, isnet-general-use the most accurate",
+)
+full_resolution = st.sidebar.checkbox(
+    "Full resolution output",
+    value=True,
+    help="Compute the mask on a small copy and apply it to the original-size image",
+)
+refine = st.sidebar.selectbox(
+    "Edge refinement", REFINE_MODES, index=0, disabled=not full_resolution,
+    help="guided follows fine edges such as hair using the full-resolution image",
+)
+output_format = st.sidebar.selectbox(
+    "Output format", OUTPUT_FORMATS, index=OUTPUT_FORMATS.index(OUTPUT_FORMAT),
+    help="Both are lossless; WebP files are usually smaller",
+)
+encoder = OutputEncoder(output_format)
+# Warm the session pool before the first image is processed
+pool_stats = load_session_pool(model_name).stats()
+st.sidebar.caption(
+    f"{pool_stats['pool_size']} sessions x {pool_stats['intra_op_threads']} threads · "
+    f"cold start {pool_stats['cold_seconds']:.2f}s · warm inference {pool_stats['warm_seconds']:.2f}s"
+)
+cache_stats = get_result_cache().summary()
+st.sidebar.caption(
+    f"Result cache: {cache_stats['hit_rate']:.0%} hits · "
+    f"{cache_stats['memory_bytes'] / 1024 / 1024:.0f}MB in memory · {cache_stats['disk_bytes'] / 1024 / 1024:.0f}MB on disk"
+)
 
 # Information about limitations
 with st.sidebar.expander("ℹ️ Image Guidelines"):
     st.write("""
     - Maximum file size: 10MB
-    - Large images will be automatically resized
+    - Full resolution output keeps the original size; otherwise large images are resized
     - Supported formats: PNG, JPG, JPEG
     - Processing time depends on image size
     """)
 
 # Process the image
-if my_upload is not None:
+if batch_uploads:
+    too_large = [u.name for u in batch_uploads if u.size > MAX_FILE_SIZE]
+    if too_large:
+        st.error(f"These files are larger than {MAX_FILE_SIZE/1024/1024:.1f}MB: {', '.join(too_large)}")
+    else:
+        fix_batch(batch_uploads)
+elif my_upload is not None:
     if my_upload.size > MAX_FILE_SIZE:
         st.error(f"The uploaded file is too large. Please upload an image smaller than {MAX_FILE_SIZE/1024/1024:.1f}MB.")
     else:
@@ -1,15 +1,19 @@
 import streamlit as st
-from PIL import Image
 from io import BytesIO
 import os
 import traceback
 import time
+import zipfile
+from PIL import Image, ImageOps
+from result_cache import OUTPUT_FORMAT, OUTPUT_FORMATS, OutputEncoder, get_result_cache
+from transforms import JPEG_MODES, Transformed, is_jpeg, transform_bytes, transform_many
 
-st.set_page_config(layout="wide", page_title="Image Rotator (180°)")
+st.set_page_config(layout="wide", page_title="Image Rotator")
 
-st.write("## Rotate your image 180°")
+st.write("## Rotate or flip your image")
 st.write(
-    "📸 Upload an image and watch it rotate 180°. "
+    "📸 Upload an image and watch it rotate (180° by default). "
+    "JPEGs are transformed losslessly and every image keeps its full resolution. "
     "You can download the rotated image from the sidebar."
 )
 st.sidebar.write("## Upload and download ⚙️")
@@ -17,44 +21,35 @@ st.sidebar.write("## Upload and download ⚙️")
 # File size limit
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-# Max dimensions for processing
-MAX_IMAGE_SIZE = 2000  # pixels
-
-
-# Convert image for download
-def convert_image(img):
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    return buf.getvalue()
-
-
-# Resize image while maintaining aspect ratio
-def resize_image(image, max_size):
-    width, height = image.size
-    if width <= max_size and height <= max_size:
-        return image
-
-    if width > height:
-        new_width = max_size
-        new_height = int(height * (max_size / width))
-    else:
-        new_height = max_size
-        new_width = int(width * (max_size / height))
-
-    return image.resize((new_width, new_height), Image.LANCZOS)
-
-
-@st.cache_data
-def process_image(image_bytes):
-    """Rotate image 180 degrees with caching"""
+TRANSFORMS = {
+    "Rotate 180°": ["rotate_180"],
+    "Rotate 90° clockwise": ["rotate_90"],
+    "Rotate 90° counter-clockwise": ["rotate_270"],
+    "Flip horizontally": ["flip_horizontal"],
+    "Flip vertically": ["flip_vertical"],
+}
+EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+
+
+def process_image(image_bytes, operations, encoder=None):
+    """
+    Rotate/flip the image; returns (Transformed, cached).
+    JPEGs only get their orientation rewritten (or a jpegtran block transform),
+    which is cheaper than a cache lookup, so only the pixel path is cached.
+    """
+    encoder = encoder or OutputEncoder()
     try:
-        image = Image.open(BytesIO(image_bytes))
-        resized = resize_image(image, MAX_IMAGE_SIZE)
-        rotated = resized.rotate(180, expand=True)
-        return image, rotated
+        if is_jpeg(image_bytes):
+            return transform_bytes(image_bytes, operations, encoder, jpeg_mode), False
+        cache = get_result_cache()
+        key = cache.key(image_bytes, "transform", operations=operations, encoder=encoder.params())
+        data, cached = cache.get_or_compute(
+            key, lambda: transform_bytes(image_bytes, operations, encoder, jpeg_mode).data
+        )
+        return Transformed(data, encoder.format, "pixels"), cached
     except Exception as e:
         st.error(f"Error processing image: {str(e)}")
-        return None, None
+        return None, False
 
 
 def fix_image(upload):
@@ -79,30 +74,34 @@ def fix_image(upload):
         status_text.text("Rotating image...")
         progress_bar.progress(40)
 
-        image, rotated = process_image(image_bytes)
-        if image is None or rotated is None:
+        rotated, cached = process_image(image_bytes, operations, encoder)
+        if rotated is None:
             return
 
         progress_bar.progress(80)
         status_text.text("Displaying results...")
 
         col1.write("Original Image 📷")
-        col1.image(image)
+        col1.image(image_bytes)
 
-        col2.write("Rotated Image 🔄 (180°)")
-        col2.image(rotated)
+        col2.write(f"Rotated Image 🔄 ({transform_name})")
+        # The exif method only changes the orientation tag, so apply it for the preview;
+        # the download keeps the lossless bytes
+        col2.image(ImageOps.exif_transpose(Image.open(BytesIO(rotated.data))))
 
         st.sidebar.markdown("\n")
         st.sidebar.download_button(
             "Download rotated image",
-            convert_image(rotated),
-            "rotated.png",
-            "image/png"
+            rotated.data,
+            "rotated" + EXTENSIONS[rotated.format],
+            f"image/{rotated.format}"
         )
 
         progress_bar.progress(100)
         elapsed = time.time() - start_time
-        status_text.text(f"Completed in {elapsed:.2f} seconds")
+        status_text.text(
+            f"Completed in {elapsed:.2f} seconds ({rotated.method}" + (", cached)" if cached else ")")
+        )
 
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
@@ -110,18 +109,61 @@ def fix_image(upload):
         print(traceback.format_exc())
 
 
+def fix_batch(uploads):
+    """Transform several images in parallel and offer them as one ZIP"""
+    start_time = time.time()
+    results = transform_many([(u.name, u.getvalue()) for u in uploads], operations, encoder, jpeg_mode)
+    buf = BytesIO()
+    rows = []
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, result in results:
+            if isinstance(result, Exception):
+                rows.append({"image": name, "method": "error", "error": str(result)})
+                continue
+            zf.writestr(os.path.splitext(name)[0] + EXTENSIONS[result.format], result.data)
+            rows.append({"image": name, "method": result.method, "size (KB)": round(len(result.data) / 1024)})
+    st.write(f"Transformed {len(uploads)} images in {time.time() - start_time:.2f} seconds")
+    st.dataframe(rows, use_container_width=True)
+    st.sidebar.download_button("Download all (ZIP)", buf.getvalue(), "rotated_images.zip", "application/zip")
+
+
 # UI Layout
 col1, col2 = st.columns(2)
 my_upload = st.sidebar.file_uploader("Upload an image", type=["png", "jpg", "jpeg"])
+batch_uploads = st.sidebar.file_uploader(
+    "Batch: upload several images", type=["png", "jpg", "jpeg"], accept_multiple_files=True,
+)
+transform_name = st.sidebar.selectbox("Transform", list(TRANSFORMS))
+operations = TRANSFORMS[transform_name]
+jpeg_mode = st.sidebar.selectbox(
+    "JPEG method", JPEG_MODES,
+    help="jpegtran moves the pixels losslessly (if installed); exif only rewrites the orientation tag",
+)
+output_format = st.sidebar.selectbox(
+    "Output format", OUTPUT_FORMATS, index=OUTPUT_FORMATS.index(OUTPUT_FORMAT),
+    help="For PNG input; both are lossless, WebP files are usually smaller. JPEGs stay JPEG.",
+)
+encoder = OutputEncoder(output_format)
+cache_stats = get_result_cache().summary()
+st.sidebar.caption(
+    f"Result cache: {cache_stats['hit_rate']:.0%} hits · "
+    f"{cache_stats['memory_bytes'] / 1024 / 1024:.0f}MB in memory · {cache_stats['disk_bytes'] / 1024 / 1024:.0f}MB on disk"
+)
 
 with st.sidebar.expander("ℹ️ Image Guidelines"):
     st.write("""
     - Maximum file size: 10MB
-    - Large images are resized automatically
+    - Images keep their full resolution
     - Supported formats: PNG, JPG, JPEG
     """)
 
-if my_upload is not None:
+if batch_uploads:
+    too_large = [u.name for u in batch_uploads if u.size > MAX_FILE_SIZE]
+    if too_large:
+        st.error(f"These files are larger than {MAX_FILE_SIZE/1024/1024:.1f}MB: {', '.join(too_large)}")
+    else:
+        fix_batch(batch_uploads)
+elif my_upload is not None:
     if my_upload.size > MAX_FILE_SIZE:
         st.error(
             f"The uploaded file is too large. "
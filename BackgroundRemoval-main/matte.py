@@ -0,0 +1,106 @@
+"""
+Full-resolution background removal from a low-resolution mask.
+
+The segmentation models work on small inputs (320px for u2net, 1024px for isnet),
+so running them on a 2000px+ image only makes the resize and normalization slower.
+Here the mask is predicted on a small proxy image, only the alpha matte is
+upsampled, and it is applied to the original pixels with NumPy.
+
+Edge refinement options:
+- "none":    bilinear upsampling only
+- "sharpen": smoothstep contrast curve that tightens the soft edge of the upsampled mask
+- "guided":  fast guided filter - the filter coefficients are computed at proxy size and
+             upsampled, so the alpha edges follow the full-resolution image edges
+"""
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+MASK_PROXY_SIZE = int(os.getenv("MASK_PROXY_SIZE", "1024"))  # long side of the proxy image
+REFINE_MODES = ["none", "sharpen", "guided"]
+GUIDED_RADIUS = 8       # in proxy pixels
+GUIDED_EPS = 1e-3
+
+
+def make_proxy(image, max_size=MASK_PROXY_SIZE):
+    """Downscaled RGB copy for inference (the original is left untouched)"""
+    proxy = image.convert("RGB")
+    if max(proxy.size) > max_size:
+        # reduce() is a fast integer box downscale; finish with one bilinear resize
+        factor = max(1, max(proxy.size) // (max_size * 2))
+        if factor > 1:
+            proxy = proxy.reduce(factor)
+        proxy.thumbnail((max_size, max_size), Image.BILINEAR)
+    return proxy
+
+
+def predict_mask(session, proxy):
+    """Run the model on the proxy and merge the predicted masks into one 0..1 float array"""
+    masks = session.predict(proxy)
+    alpha = np.asarray(masks[0], dtype=np.float32)
+    for mask in masks[1:]:
+        alpha = np.maximum(alpha, np.asarray(mask, dtype=np.float32))
+    return alpha / 255.0
+
+
+def _box(x, r):
+    """Mean filter with a (2r+1) square window using cumulative sums (edges use the valid part)"""
+    h, w = x.shape
+    padded = np.pad(x.astype(np.float64), ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    y0 = np.clip(np.arange(h) - r, 0, h)
+    y1 = np.clip(np.arange(h) + r + 1, 0, h)
+    x0 = np.clip(np.arange(w) - r, 0, w)
+    x1 = np.clip(np.arange(w) + r + 1, 0, w)
+    total = (padded[y1][:, x1] - padded[y0][:, x1] - padded[y1][:, x0] + padded[y0][:, x0])
+    area = (y1 - y0)[:, None] * (x1 - x0)[None, :]
+    return total / area
+
+
+def _resize_float(array, size):
+    return np.asarray(Image.fromarray(array.astype(np.float32)).resize(size, Image.BILINEAR))
+
+
+def _gray(image):
+    return np.asarray(image.convert("L"), dtype=np.float32) / 255.0
+
+
+def upsample_alpha(alpha, proxy, image, refine="none"):
+    """Proxy-size alpha (0..1) → full-size uint8 alpha"""
+    size = image.size
+    if refine == "guided":
+        # Fast guided filter (He & Sun, 2015): linear model alpha ≈ a * I + b per window
+        guide = _gray(proxy)
+        mean_i = _box(guide, GUIDED_RADIUS)
+        mean_p = _box(alpha, GUIDED_RADIUS)
+        cov_ip = _box(guide * alpha, GUIDED_RADIUS) - mean_i * mean_p
+        var_i = _box(guide * guide, GUIDED_RADIUS) - mean_i * mean_i
+        a = cov_ip / (var_i + GUIDED_EPS)
+        b = mean_p - a * mean_i
+        a = _box(a, GUIDED_RADIUS)
+        b = _box(b, GUIDED_RADIUS)
+        full = _resize_float(a, size) * _gray(image) + _resize_float(b, size)
+    else:
+        full = _resize_float(alpha, size)
+        if refine == "sharpen":
+            t = np.clip((full - 0.25) / 0.5, 0.0, 1.0)
+            full = t * t * (3.0 - 2.0 * t)
+    return (np.clip(full, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def apply_alpha(image, alpha):
+    """Attach the alpha matte to the original-resolution RGB pixels"""
+    rgb = np.asarray(image.convert("RGB"))
+    return Image.fromarray(np.dstack([rgb, alpha]))
+
+
+def remove_fullres(image, pool, proxy_size=MASK_PROXY_SIZE, refine="none"):
+    """
+    Background removal at the original resolution.
+    pool is a rembg_sessions.SessionPool; the model only sees the proxy image.
+    """
+    image = ImageOps.exif_transpose(image)
+    proxy = make_proxy(image, proxy_size)
+    with pool.session() as session:
+        alpha = predict_mask(session, proxy)
+    return apply_alpha(image, upsample_alpha(alpha, proxy, image, refine))
@@ -0,0 +1,146 @@
+"""
+Process-wide pool of preloaded rembg inference sessions.
+
+rembg's `remove(image)` without a session creates (and on first use downloads)
+the model and an ONNX Runtime session on the request path. This module builds the
+sessions once, warms them with a dummy inference and hands them out to callers.
+
+    python rembg_sessions.py --model u2netp --runs 5      # cold vs. warm latency
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import onnxruntime as ort
+from PIL import Image
+from rembg import remove
+from rembg.sessions import sessions_class, sessions_names
+
+# Model and threading settings (override with environment variables)
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")
+REMBG_POOL_SIZE = int(os.getenv("REMBG_POOL_SIZE", "0"))                  # 0 = derive from cores
+REMBG_INTRA_OP_THREADS = int(os.getenv("REMBG_INTRA_OP_THREADS", "0"))    # 0 = cores / pool size
+REMBG_PROVIDERS = [p for p in os.getenv("REMBG_PROVIDERS", "").split(",") if p] or None
+
+# Models offered in the UI (all ship with rembg)
+AVAILABLE_MODELS = [m for m in ("u2net", "u2netp", "isnet-general-use", "silueta", "u2net_human_seg")
+                    if m in sessions_names]
+
+
+def thread_layout(pool_size=REMBG_POOL_SIZE, intra_op_threads=REMBG_INTRA_OP_THREADS):
+    """
+    Split the CPU cores between sessions so that pool_size * intra_op_threads <= cores.
+    By default two sessions share the cores, which lets two images run at once
+    without oversubscribing the machine.
+    """
+    cores = os.cpu_count() or 1
+    if not pool_size:
+        pool_size = 2 if cores >= 4 else 1
+    if not intra_op_threads:
+        intra_op_threads = max(1, cores // pool_size)
+    return pool_size, intra_op_threads
+
+
+def create_session(model_name, intra_op_threads, providers=REMBG_PROVIDERS):
+    """Build a rembg session with explicit ONNX Runtime threading options"""
+    session_class = next((sc for sc in sessions_class if sc.name() == model_name), None)
+    if session_class is None:
+        raise ValueError(f"Unknown rembg model: {model_name}")
+    sess_opts = ort.SessionOptions()
+    sess_opts.intra_op_num_threads = intra_op_threads
+    sess_opts.inter_op_num_threads = 1
+    sess_opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return session_class(model_name, sess_opts, providers)
+
+
+class SessionPool:
+    """
+    A fixed set of warmed sessions for one model.
+    Each caller borrows a session for one inference, so up to pool_size images
+    are processed concurrently and any extra callers wait for a free session.
+    """
+
+    def __init__(self, model_name=REMBG_MODEL, pool_size=REMBG_POOL_SIZE, intra_op_threads=REMBG_INTRA_OP_THREADS):
+        self.model_name = model_name
+        self.pool_size, self.intra_op_threads = thread_layout(pool_size, intra_op_threads)
+        self._sessions = queue.Queue()
+        self._lock = threading.Lock()
+        self.cold_seconds = []    # session creation + first inference, per session
+        self.warm_seconds = []    # later inferences (most recent 200)
+        for _ in range(self.pool_size):
+            start = time.perf_counter()
+            session = create_session(model_name, self.intra_op_threads)
+            # The first run allocates ONNX Runtime buffers; do it now instead of on a user request
+            remove(Image.new("RGB", (64, 64)), session=session)
+            self.cold_seconds.append(time.perf_counter() - start)
+            self._sessions.put(session)
+
+    @contextmanager
+    def session(self):
+        session = self._sessions.get()
+        start = time.perf_counter()
+        try:
+            yield session
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.warm_seconds = (self.warm_seconds + [elapsed])[-200:]
+            self._sessions.put(session)
+
+    def remove(self, image, **kwargs):
+        """rembg.remove with a pooled session"""
+        with self.session() as session:
+            return remove(image, session=session, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            warm = sorted(self.warm_seconds)
+        return {
+            "model": self.model_name,
+            "pool_size": self.pool_size,
+            "intra_op_threads": self.intra_op_threads,
+            "cold_seconds": max(self.cold_seconds) if self.cold_seconds else 0.0,
+            "warm_seconds": warm[len(warm) // 2] if warm else 0.0,
+            "warm_runs": len(warm),
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(model_name=REMBG_MODEL):
+    """One pool per model for the whole process (shared by the UI and batch mode)"""
+    with _pools_lock:
+        pool = _pools.get(model_name)
+        if pool is None:
+            pool = _pools[model_name] = SessionPool(model_name)
+        return pool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cold vs. warm rembg latency")
+    parser.add_argument("--model", default=REMBG_MODEL, choices=AVAILABLE_MODELS)
+    parser.add_argument("--image", default="zebra.jpg")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    image = Image.open(args.image)
+    image.load()
+
+    # Old path: remove() without a session builds a new one on every call
+    start = time.perf_counter()
+    remove(image, session=create_session(args.model, thread_layout(1)[1]))
+    print(f"cold (new session per request): {time.perf_counter() - start:.2f}s")
+
+    pool = get_session_pool(args.model)
+    for _ in range(args.runs):
+        pool.remove(image)
+    stats = pool.stats()
+    print(f"pool warm-up per session:       {stats['cold_seconds']:.2f}s (once, at startup)")
+    print(f"warm (pooled session) median:   {stats['warm_seconds']:.2f}s over {stats['warm_runs']} runs")
+    print(f"pool: {stats['pool_size']} sessions x {stats['intra_op_threads']} intra-op threads")
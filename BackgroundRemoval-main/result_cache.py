@@ -0,0 +1,199 @@
+"""
+Bounded, content-addressed cache of encoded results for the image tools.
+
+Keys are a hash of the input bytes plus the operation and its parameters
+(model, refinement, output encoder, ...). Values are the final encoded bytes
+ready for st.image and the download button, so a hit skips decoding, inference
+and encoding.
+
+Two tiers, both evicted least-recently-used by total byte size:
+- memory: an OrderedDict for the current process
+- disk:   one file per key under RESULT_CACHE_DIR, shared by processes and restarts
+          (lookups check the directory itself and eviction re-scans it, so files
+          written by other processes are found and count toward RESULT_CACHE_DISK_MB)
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+# Cache and encoder settings (override with environment variables)
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "bg_tools"))
+RESULT_CACHE_MEMORY_MB = int(os.getenv("RESULT_CACHE_MEMORY_MB", "128"))
+RESULT_CACHE_DISK_MB = int(os.getenv("RESULT_CACHE_DISK_MB", "1024"))     # 0 disables the disk tier
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "png")                          # png or webp (lossless)
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", "6"))             # 0-9, 1 is much faster on large images
+WEBP_METHOD = int(os.getenv("WEBP_METHOD", "4"))                           # 0-6, higher is smaller and slower
+
+OUTPUT_FORMATS = ["png", "webp"]
+
+
+class OutputEncoder:
+    """Lossless encoder for the processed image"""
+
+    def __init__(self, fmt=OUTPUT_FORMAT, png_compress_level=PNG_COMPRESS_LEVEL, webp_method=WEBP_METHOD):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        self.format = fmt
+        self.png_compress_level = png_compress_level
+        self.webp_method = webp_method
+
+    @property
+    def extension(self):
+        return "." + self.format
+
+    @property
+    def mime(self):
+        return f"image/{self.format}"
+
+    def params(self):
+        """Part of the cache key: a different encoder gives different bytes"""
+        if self.format == "png":
+            return {"format": "png", "compress_level": self.png_compress_level}
+        return {"format": "webp", "method": self.webp_method}
+
+    def encode(self, image):
+        buf = BytesIO()
+        if self.format == "png":
+            image.save(buf, format="PNG", compress_level=self.png_compress_level)
+        else:
+            image.save(buf, format="WEBP", lossless=True, method=self.webp_method)
+        return buf.getvalue()
+
+
+class ResultCache:
+    def __init__(self, directory=RESULT_CACHE_DIR, memory_bytes=RESULT_CACHE_MEMORY_MB * 1024 * 1024,
+                 disk_bytes=RESULT_CACHE_DISK_MB * 1024 * 1024):
+        self.directory = directory
+        self.memory_limit = memory_bytes
+        self.disk_limit = disk_bytes
+        self._memory = OrderedDict()   # key → bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()     # key → size, oldest first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if self.disk_limit:
+            os.makedirs(directory, exist_ok=True)
+            self._disk, self._disk_size = self._scan_disk()
+
+    def _scan_disk(self):
+        """(key → size oldest first, total bytes) for every entry in the directory"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+        return disk, sum(disk.values())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".bin")
+
+    @staticmethod
+    def key(data, operation, **params):
+        """Content hash of the input bytes + operation + parameters"""
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps([operation, params], sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+        if self.disk_limit:
+            # check the file itself: another process may have written (or evicted) it
+            try:
+                with open(self._path(key), "rb") as f:
+                    value = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                    self._disk_size += len(value) - self._disk.pop(key, 0)
+                    self._disk[key] = len(value)
+                    self._put_memory(key, value)
+                return value
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._put_memory(key, value)
+        if self.disk_limit and len(value) <= self.disk_limit:
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(value)
+                os.replace(tmp_path, self._path(key))
+            except OSError:
+                return
+            # budget the whole directory, not just this process's writes
+            disk, disk_size = self._scan_disk()
+            with self._lock:
+                self._disk, self._disk_size = disk, disk_size
+                self._evict_disk()
+
+    def get_or_compute(self, key, compute):
+        """(bytes, hit) - compute() returns the encoded bytes on a miss"""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def _put_memory(self, key, value):
+        if len(value) > self.memory_limit:
+            return
+        self._memory_size += len(value) - len(self._memory.pop(key, b""))
+        self._memory[key] = value
+        while self._memory_size > self.memory_limit:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_limit:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def summary(self):
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """One cache per process (shared by bg_remove.py and img_rotate.py)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
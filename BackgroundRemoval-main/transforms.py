@@ -0,0 +1,272 @@
+"""
+Lossless rotate/flip engine for img_rotate.py.
+
+A 90° step or a flip only permutes pixels, so the image never needs to be
+resized or re-encoded with a loss:
+
+- JPEG, "jpegtran": lossless DCT block transform with jpegtran (if installed);
+  the pixels really move and the EXIF orientation is reset to 1
+- JPEG, "exif":     rewrite the EXIF orientation tag only (a few bytes; the
+  compressed image data is copied unchanged)
+- other formats:    Image.transpose at full resolution, then a lossless encode
+
+    python transforms.py zebra.jpg --ops rotate_180 --runs 10   # bytes/latency vs. the old path
+"""
+import argparse
+import shutil
+import struct
+import subprocess
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from result_cache import OutputEncoder
+
+JPEG_MODES = ["auto", "jpegtran", "exif"]   # auto = jpegtran if installed, else exif
+JPEGTRAN = shutil.which("jpegtran")
+
+ORIENTATION_TAG = 0x0112
+
+# Transforms as 2x2 matrices on (x, y) pixel coordinates (x right, y down).
+# Composing transforms is a matrix product, which is how new EXIF orientations are found.
+IDENTITY = ((1, 0), (0, 1))
+OPERATIONS = {
+    "rotate_90": ((0, -1), (1, 0)),       # clockwise
+    "rotate_180": ((-1, 0), (0, -1)),
+    "rotate_270": ((0, 1), (-1, 0)),      # clockwise (= 90° counter-clockwise)
+    "flip_horizontal": ((-1, 0), (0, 1)),
+    "flip_vertical": ((1, 0), (0, -1)),
+}
+
+# Matrix → Image.transpose method
+PIL_METHODS = {
+    OPERATIONS["rotate_90"]: Image.Transpose.ROTATE_270,
+    OPERATIONS["rotate_180"]: Image.Transpose.ROTATE_180,
+    OPERATIONS["rotate_270"]: Image.Transpose.ROTATE_90,
+    OPERATIONS["flip_horizontal"]: Image.Transpose.FLIP_LEFT_RIGHT,
+    OPERATIONS["flip_vertical"]: Image.Transpose.FLIP_TOP_BOTTOM,
+    ((0, 1), (1, 0)): Image.Transpose.TRANSPOSE,
+    ((0, -1), (-1, 0)): Image.Transpose.TRANSVERSE,
+}
+
+# Matrix → jpegtran arguments (jpegtran rotates clockwise)
+JPEGTRAN_ARGS = {
+    OPERATIONS["rotate_90"]: ["-rotate", "90"],
+    OPERATIONS["rotate_180"]: ["-rotate", "180"],
+    OPERATIONS["rotate_270"]: ["-rotate", "270"],
+    OPERATIONS["flip_horizontal"]: ["-flip", "horizontal"],
+    OPERATIONS["flip_vertical"]: ["-flip", "vertical"],
+    ((0, 1), (1, 0)): ["-transpose"],
+    ((0, -1), (-1, 0)): ["-transverse"],
+}
+
+# EXIF orientation value → transform that displays the stored pixels upright
+ORIENTATIONS = {
+    1: IDENTITY,
+    2: OPERATIONS["flip_horizontal"],
+    3: OPERATIONS["rotate_180"],
+    4: OPERATIONS["flip_vertical"],
+    5: ((0, 1), (1, 0)),
+    6: OPERATIONS["rotate_90"],
+    7: ((0, -1), (-1, 0)),
+    8: OPERATIONS["rotate_270"],
+}
+ORIENTATION_OF = {matrix: value for value, matrix in ORIENTATIONS.items()}
+
+Transformed = namedtuple("Transformed", ["data", "format", "method"])
+
+
+def _multiply(a, b):
+    """a ∘ b: apply b first, then a"""
+    return tuple(
+        tuple(sum(a[i][k] * b[k][j] for k in range(2)) for j in range(2))
+        for i in range(2)
+    )
+
+
+def compose(operations):
+    """One matrix for a sequence of operation names (applied in order)"""
+    matrix = IDENTITY
+    for name in operations:
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown transform: {name}")
+        matrix = _multiply(OPERATIONS[name], matrix)
+    return matrix
+
+
+def is_jpeg(data):
+    return data[:3] == b"\xff\xd8\xff"
+
+
+# 1. EXIF orientation in JPEG bytes
+def _find_exif(data):
+    """(segment start, segment end) of the Exif APP1 segment, or None"""
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker in (0xDA, 0xD9):  # start of scan / end of image: no more metadata
+            break
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b"Exif\x00\x00":
+            return pos, pos + 2 + length
+        pos += 2 + length
+    return None
+
+
+def _orientation_offset(data, segment):
+    """Absolute offset of the orientation value in IFD0 and the byte order, or (None, None)"""
+    tiff = segment[0] + 10
+    order = {b"II": "<", b"MM": ">"}.get(bytes(data[tiff:tiff + 2]))
+    if order is None:
+        return None, None
+    ifd = tiff + struct.unpack(order + "I", data[tiff + 4:tiff + 8])[0]
+    if ifd + 2 > segment[1]:
+        return None, None
+    count = struct.unpack(order + "H", data[ifd:ifd + 2])[0]
+    for i in range(count):
+        entry = ifd + 2 + i * 12
+        if entry + 12 > segment[1]:
+            break
+        tag, kind = struct.unpack(order + "HH", data[entry:entry + 4])
+        if tag == ORIENTATION_TAG and kind == 3:  # SHORT
+            return entry + 8, order
+    return None, None
+
+
+def get_orientation(data):
+    segment = _find_exif(data)
+    if segment is None:
+        return 1
+    offset, order = _orientation_offset(data, segment)
+    if offset is None:
+        return 1
+    value = struct.unpack(order + "H", data[offset:offset + 2])[0]
+    return value if value in ORIENTATIONS else 1
+
+
+def set_orientation(data, value):
+    """JPEG bytes with the orientation tag set; the image data is copied unchanged"""
+    segment = _find_exif(data)
+    if segment is not None:
+        offset, order = _orientation_offset(data, segment)
+        if offset is not None:
+            # Patch the existing 2-byte value in place
+            out = bytearray(data)
+            struct.pack_into(order + "H", out, offset, value)
+            return bytes(out)
+        # Exif without an orientation entry: let Pillow rebuild the Exif block
+        exif = Image.Exif()
+        exif.load(data[segment[0] + 4:segment[1]])
+        exif[ORIENTATION_TAG] = value
+        payload = exif.tobytes()
+        return data[:segment[0]] + b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload + data[segment[1]:]
+    if value == 1:
+        return data
+    # No Exif at all: insert a minimal block (one IFD0 entry) after SOI/JFIF
+    payload = (b"Exif\x00\x00" + b"MM\x00\x2a" + struct.pack(">I", 8)
+               + struct.pack(">H", 1) + struct.pack(">HHIHH", ORIENTATION_TAG, 3, 1, value, 0)
+               + struct.pack(">I", 0))
+    pos = 2
+    if data[2:4] == b"\xff\xe0":  # keep the JFIF APP0 segment first
+        pos = 4 + struct.unpack(">H", data[4:6])[0]
+    return data[:pos] + b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload + data[pos:]
+
+
+# 2. Transform paths
+def _jpegtran(data, matrix):
+    """Lossless block transform, or None if jpegtran is missing or the size is not MCU aligned"""
+    if JPEGTRAN is None:
+        return None
+    if matrix == IDENTITY:
+        return data
+    result = subprocess.run(
+        [JPEGTRAN, "-copy", "all", "-perfect", *JPEGTRAN_ARGS[matrix]],
+        input=data, capture_output=True,
+    )
+    return result.stdout if result.returncode == 0 and result.stdout else None
+
+
+def transform_pixels(data, matrix, encoder=None):
+    """Decode, apply the orientation tag, transpose at full resolution, encode losslessly"""
+    encoder = encoder or OutputEncoder()
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    if matrix != IDENTITY:
+        image = image.transpose(PIL_METHODS[matrix])
+    return encoder.encode(image)
+
+
+def transform_bytes(data, operations, encoder=None, jpeg_mode="auto"):
+    """
+    Apply rotate/flip operations (names from OPERATIONS, in order) to encoded image bytes.
+    Returns Transformed(data, format, method) with method "jpegtran", "exif" or "pixels".
+    """
+    matrix = compose(operations)
+    if is_jpeg(data):
+        orientation = get_orientation(data)
+        # Display transform after the edit: the requested operations on top of the current orientation
+        target = _multiply(matrix, ORIENTATIONS[orientation])
+        if jpeg_mode in ("auto", "jpegtran"):
+            out = _jpegtran(data, target)
+            if out is not None:
+                # jpegtran copied the old tag; the pixels are upright now
+                return Transformed(set_orientation(out, 1) if orientation != 1 else out, "jpeg", "jpegtran")
+        return Transformed(set_orientation(data, ORIENTATION_OF[target]), "jpeg", "exif")
+    encoder = encoder or OutputEncoder()
+    return Transformed(transform_pixels(data, matrix, encoder), encoder.format, "pixels")
+
+
+def transform_many(items, operations, encoder=None, jpeg_mode="auto", workers=4):
+    """items: iterable of (name, bytes) → list of (name, Transformed or Exception), in input order"""
+    def one(item):
+        name, data = item
+        try:
+            return name, transform_bytes(data, operations, encoder, jpeg_mode)
+        except Exception as e:
+            return name, e
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(one, items))
+
+
+def legacy_rotate_180(data, max_size=2000):
+    """The previous img_rotate.py path (decode, LANCZOS resize, rotate, PNG), for comparison"""
+    image = Image.open(BytesIO(data))
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    buf = BytesIO()
+    image.rotate(180, expand=True).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare lossless transforms with the old rotate path")
+    parser.add_argument("image", nargs="?", default="zebra.jpg")
+    parser.add_argument("--ops", nargs="+", default=["rotate_180"], choices=list(OPERATIONS))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        data = f.read()
+
+    def bench(label, fn):
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            out = fn()
+        elapsed = (time.perf_counter() - start) / args.runs
+        size = len(out.data if isinstance(out, Transformed) else out)
+        print(f"{label:28s} {elapsed * 1000:9.1f} ms {size / 1024:10.0f} KB")
+
+    print(f"input {len(data) / 1024:.0f} KB, ops {' → '.join(args.ops)}")
+    if args.ops == ["rotate_180"]:
+        bench("old (resize + rotate + PNG)", lambda: legacy_rotate_180(data))
+    if is_jpeg(data):
+        bench("exif tag", lambda: transform_bytes(data, args.ops, jpeg_mode="exif"))
+        if JPEGTRAN:
+            bench("jpegtran", lambda: transform_bytes(data, args.ops, jpeg_mode="jpegtran"))
+        else:
+            print("jpegtran not installed")
+    matrix = compose(args.ops)
+    bench("pixels (PNG)", lambda: transform_pixels(data, matrix, OutputEncoder("png")))
+    bench("pixels (PNG, level 1)", lambda: transform_pixels(data, matrix, OutputEncoder("png", png_compress_level=1)))
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+# 의미 기반 답변 캐시 설정 (환경 변수로 변경 가능)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # 코사인 유사도 기준
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))              # 유효 시간(초)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# kind: "exact"(같은 질문) / "semantic"(비슷한 질문) / None(미스)
+CacheLookup = namedtuple("CacheLookup", ["answer", "kind", "similarity", "vector"])
+
+
+def _normalize_question(question):
+    return normalize_text(question).lower().rstrip("?？. ")
+
+
+class SemanticAnswerCache:
+    """
+    질문 임베딩 기반 답변 캐시.
+    - 정규화한 질문이 완전히 같으면 임베딩 호출 없이 바로 반환 (exact)
+    - 아니면 질문을 임베딩해 저장된 질문들과 코사인 유사도를 비교 (semantic)
+    - 캐시는 (인덱스 버전, 프롬프트 버전)에 묶여 있어 둘 중 하나가 바뀌면 전부 비운다.
+    - TTL 이 지난 항목은 무시하고, 최대 개수를 넘으면 가장 오래 안 쓴 항목부터 삭제(LRU)
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        ttl=ANSWER_CACHE_TTL,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # 정규화 질문 → (단위 벡터, 답변, 저장 시각)
+        self._namespace = None
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+
+    def _sync(self, index_version, prompt_version):
+        """인덱스/프롬프트 버전이 바뀌었으면 캐시 전체 무효화"""
+        namespace = (index_version, prompt_version)
+        if namespace != self._namespace:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._namespace = namespace
+
+    def _expired(self, created):
+        return self.ttl and time.time() - created > self.ttl
+
+    def lookup(self, question, index_version, prompt_version):
+        key = _normalize_question(question)
+        with self._lock:
+            self._sync(index_version, prompt_version)
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[2]):
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return CacheLookup(entry[1], "exact", 1.0, entry[0])
+
+        # 임베딩 호출은 락 밖에서 수행
+        vector = np.asarray(self.embeddings.embed_query(question), dtype="float32")
+        vector /= np.linalg.norm(vector) or 1.0
+
+        with self._lock:
+            self._sync(index_version, prompt_version)
+            live = [(k, e) for k, e in self._entries.items() if not self._expired(e[2])]
+            if live:
+                matrix = np.vstack([e[0] for _, e in live])
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    best_key, best_entry = live[best]
+                    self._entries.move_to_end(best_key)
+                    self.stats["semantic_hits"] += 1
+                    return CacheLookup(best_entry[1], "semantic", float(scores[best]), vector)
+            self.stats["misses"] += 1
+            return CacheLookup(None, None, 0.0, vector)
+
+    def store(self, question, answer, index_version, prompt_version, vector=None):
+        """답변 저장 (lookup 에서 받은 vector 를 넘기면 임베딩을 다시 하지 않는다)"""
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(question), dtype="float32")
+            vector /= np.linalg.norm(vector) or 1.0
+        key = _normalize_question(question)
+        with self._lock:
+            self._sync(index_version, prompt_version)
+            self._entries[key] = (vector, answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,11 +1,11 @@
 import streamlit as st
-from openai import OpenAI
 from dotenv import load_dotenv
-import os
+from clients import get_openai_client
 
 # 환경변수 로드
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# 프로세스 공유 클라이언트 (재실행(rerun)마다 새로 만들지 않고 연결 풀을 재사용)
+client = get_openai_client()
 
 # 페이지 설정
 st.title("💬 ylee's 첫 챗봇")
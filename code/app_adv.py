@@ -1,11 +1,12 @@
 import streamlit as st
-from openai import OpenAI
 from dotenv import load_dotenv
-import os
+from chat_core import AUTO_MODEL, DEFAULT_SYSTEM_PROMPT, get_router, new_history, prepare_chat
 
 # 환경변수 로드
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# 대화 기록 요약, 모델 라우팅은 chat_core.py 에 있다 (HTTP 서버 server.py 와 같은 코드를 사용)
+router = get_router()
 
 # 페이지 설정
 st.set_page_config(
@@ -21,10 +22,11 @@ with st.sidebar:
     st.header("⚙️ 설정")
     
     # 모델 선택
+    # 자동: 질문 길이/내용과 모델별 지연 시간을 보고 빠르면서 충분한 모델 선택
     model = st.selectbox(
         "모델 선택",
-        ["gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo"],
-        index=1
+        [AUTO_MODEL, "gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo"],
+        index=0
     )
     
     # 온도 설정
@@ -41,7 +43,7 @@ with st.sidebar:
     st.subheader("시스템 프롬프트")
     system_prompt = st.text_area(
         "AI의 역할과 성격을 정의하세요",
-        value="당신은 친절하고 도움이 되는 AI 어시스턴트입니다. 사용자의 질문에 명확하고 정확하게 답변해주세요.",
+        value=DEFAULT_SYSTEM_PROMPT,
         height=150
     )
     
@@ -50,6 +52,8 @@ with st.sidebar:
     # 대화 초기화 버튼
     if st.button("🗑️ 대화 초기화", use_container_width=True):
         st.session_state.messages = []
+        st.session_state.pop("history", None)
+        st.session_state.pop("prompt_tokens", None)
         st.rerun()
     
     st.divider()
@@ -57,11 +61,24 @@ with st.sidebar:
     # 통계 표시
     if "messages" in st.session_state:
         msg_count = len([m for m in st.session_state.messages if m["role"] == "user"])
-        st.metric("대화 횟수", msg_count)
+        col_count, col_tokens = st.columns(2)
+        col_count.metric("대화 횟수", msg_count)
+        col_tokens.metric("프롬프트 토큰", st.session_state.get("prompt_tokens", 0))
+
+    # 모델별 지연 시간 (최근 구간)
+    for name, entry in router.stats().items():
+        if "ttft_p95" in entry:
+            st.caption(
+                f"{name}: 첫 토큰 p50 {entry['ttft_p50']:.2f}s / p95 {entry['ttft_p95']:.2f}s · "
+                f"요청 {entry['requests']} · 오류 {entry['errors']}"
+            )
 
 # 세션 상태 초기화
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "history" not in st.session_state:
+    # 토큰 예산 기반 대화 기록 관리자 (메시지별 토큰 수 캐시 + 오래된 대화 요약)
+    st.session_state.history = new_history()
 
 # 기존 대화 표시
 for message in st.session_state.messages:
@@ -80,26 +97,24 @@ if prompt := st.chat_input("메시지를 입력하세요..."):
         message_placeholder = st.empty()
         full_response = ""
         
-        # 시스템 프롬프트 포함한 메시지 구성
-        messages_with_system = [
-            {"role": "system", "content": system_prompt}
-        ] + st.session_state.messages
-        
-        # 스트리밍 응답
         try:
-            stream = client.chat.completions.create(
-                model=model,
-                messages=messages_with_system,
-                temperature=temperature,
-                stream=True
+            # 시스템 프롬프트 + (이전 대화 요약) + 토큰 예산 안의 최근 대화로 메시지 구성 후 모델 선택
+            # (예산을 넘으면 요약 모델을 호출하므로 오류 처리 안에서 실행)
+            messages_with_system, prompt_tokens, decision = prepare_chat(
+                st.session_state.history, system_prompt, st.session_state.messages, model
             )
+            st.session_state.prompt_tokens = prompt_tokens
             
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    full_response += chunk.choices[0].delta.content
-                    message_placeholder.markdown(full_response + "▌")
+            # 스트리밍 응답 (첫 토큰 전에 타임아웃/오류가 나면 대체 모델로 재시도)
+            for text in router.stream(decision, messages_with_system, temperature):
+                full_response += text
+                message_placeholder.markdown(full_response + "▌")
             
             message_placeholder.markdown(full_response)
+            route_info = f"모델: {decision.used} · {decision.reason}"
+            if decision.fallback_reason:
+                route_info += f" · 대체: {decision.fallback_reason}"
+            st.caption(route_info)
             
         except Exception as e:
             st.error(f"오류 발생: {str(e)}")
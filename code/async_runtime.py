@@ -0,0 +1,109 @@
+import asyncio
+import queue
+import threading
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop():
+    """
+    프로세스 전체가 함께 쓰는 이벤트 루프 (백그라운드 스레드에서 계속 실행).
+    비동기 HTTP 클라이언트의 연결 풀은 만들어진 루프에 묶이므로,
+    호출할 때마다 asyncio.run 으로 새 루프를 만들지 않고 이 루프 하나를 재사용한다.
+    """
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-runtime", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run(coro, timeout=None):
+    """동기 코드(Streamlit 스크립트 등)에서 코루틴을 공유 루프에 실행하고 결과를 기다린다"""
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("공유 이벤트 루프 안에서는 await 를 사용하세요")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def iterate(agen_factory):
+    """
+    동기 코드에서 공유 루프의 비동기 이터레이터를 소비하는 제너레이터.
+    agen_factory() 는 공유 루프 안에서 호출된다.
+    """
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen_factory():
+                items.put(("item", item))
+            items.put(("done", None))
+        except Exception as exc:
+            items.put(("error", exc))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "item":
+                yield value
+            elif kind == "done":
+                return
+            else:
+                raise value
+    finally:
+        future.cancel()
+
+
+async def call(coro):
+    """다른 이벤트 루프(예: uvicorn)에서 코루틴을 공유 루프에 실행하고 await"""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_loop()))
+
+
+async def relay(agen_factory):
+    """
+    다른 이벤트 루프에서 공유 루프의 비동기 이터레이터를 소비한다.
+    agen_factory() 는 공유 루프 안에서 호출되며, 항목은 호출한 루프로 전달된다.
+    """
+    caller = asyncio.get_running_loop()
+    items = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for item in agen_factory():
+                caller.call_soon_threadsafe(items.put_nowait, ("item", item))
+            caller.call_soon_threadsafe(items.put_nowait, ("done", None))
+        except Exception as exc:
+            caller.call_soon_threadsafe(items.put_nowait, ("error", exc))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            kind, value = await items.get()
+            if kind == "item":
+                yield value
+            elif kind == "done":
+                return
+            else:
+                raise value
+    finally:
+        future.cancel()
+
+
+async def iterate_in_thread(iterable):
+    """동기 이터레이터(예: OpenAI SDK 스트림)를 스레드에서 돌려 이벤트 루프를 막지 않고 소비"""
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
@@ -0,0 +1,235 @@
+"""
+부하/지연 벤치마크 - 로컬 가짜 OpenAI 서버로 비용 없이 처리량과 지연 시간을 측정
+
+    python bench.py                                   # 전체 시나리오 (ingest, rag, chat, memory)
+    python bench.py --scenarios rag chat --concurrency 8 --requests 64
+    python bench.py --latency 0.3 --tokens-per-second 40 --json result.json
+    python bench.py --baseline result.json            # 기준 결과보다 p95 가 tolerance 이상 나빠지면 종료 코드 1
+
+시나리오
+- ingest: PDF 파싱/분할/임베딩/인덱스 저장 (pages/s, chunks/s)
+- rag:    build_rag_chain + stream_rag_answer (rag_chatbot.py 와 같은 경로)
+- chat:   prepare_chat + 라우터 스트리밍 (app_adv.py 와 같은 경로)
+- memory: 사용자별 연속 대화 턴 ask + record_turn (memory.py 와 같은 경로)
+보고: 지연 p50/p95/p99, 첫 토큰 시간(TTFT), 스트림당/전체 tokens/s, RSS
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_openai_server import FakeOpenAIConfig, start_server
+from metrics import percentile
+
+DEFAULT_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "Samsung_Card_Manual_Korean_1.3.pdf")
+QUESTIONS = ["카드 분실 신고 방법", "연회비는 얼마인가요", "해외 결제 수수료", "포인트 적립 기준", "결제일 변경"]
+
+
+def summarize(latencies, ttfts=None, tokens=0, elapsed=0.0):
+    result = {"requests": len(latencies)}
+    for q in (50, 95, 99):
+        result[f"p{q}"] = percentile(latencies, q)
+    if ttfts:
+        for q in (50, 95, 99):
+            result[f"ttft_p{q}"] = percentile(ttfts, q)
+    if tokens:
+        stream_time = sum(latencies)
+        result["tokens_per_second_per_stream"] = tokens / stream_time if stream_time else 0.0
+        result["tokens_per_second"] = tokens / elapsed if elapsed else 0.0
+    result["requests_per_second"] = len(latencies) / elapsed if elapsed else 0.0
+    return result
+
+
+def run_concurrently(fn, n, concurrency):
+    """fn(i) → (지연, ttft, 토큰 수) 를 concurrency 개 스레드로 n 번 실행"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fn, range(n)))
+    elapsed = time.perf_counter() - start
+    latencies = [r[0] for r in results]
+    ttfts = [r[1] for r in results if r[1] is not None]
+    return summarize(latencies, ttfts, sum(r[2] for r in results), elapsed)
+
+
+# 1. 시나리오
+def bench_ingest(args, work_dir):
+    import rag_core
+    from doc_registry import DocumentIndex
+    from clients import get_embeddings
+
+    with open(args.pdf, "rb") as f:
+        data = f.read()
+    doc_index = DocumentIndex(os.path.join(work_dir, "faiss_index"), get_embeddings())
+    stats = {}
+    start = time.perf_counter()
+    # 청크를 모으지 않고 파싱과 임베딩을 배치 단위로 이어서 처리 (파싱 시간은 stats 에서 따로 집계)
+    docs = rag_core.load_and_split_docs(data, os.path.basename(args.pdf), tmp_dir=work_dir, stats=stats)
+    rag_core.create_vectorstore(doc_index, docs, os.path.basename(args.pdf))
+    elapsed = time.perf_counter() - start
+    parsed = stats["open"] + stats["parse"] + stats["split"]
+    pages, chunks = stats["pages"], stats["chunks"]
+    return doc_index, {
+        "pages": pages,
+        "chunks": chunks,
+        "parse_seconds": parsed,
+        "total_seconds": elapsed,
+        "pages_per_second": pages / parsed if parsed else 0.0,
+        "chunks_per_second": chunks / elapsed if elapsed else 0.0,
+    }
+
+
+def bench_rag(args, doc_index):
+    import rag_core
+
+    snapshot = doc_index.snapshot()
+    rag_chain = rag_core.build_rag_chain(snapshot)
+
+    def one(i):
+        timings, tokens = {}, 0
+        # 질문마다 번호를 붙여 single-flight 로 합쳐지지 않게 한다 (합쳐지는 효과는 --coalesce 로 측정)
+        question = f"{QUESTIONS[i % len(QUESTIONS)]} {'' if args.coalesce else i}".strip()
+        key = ("rag", snapshot.version, question)
+        for kind, _ in rag_core.stream_rag_answer(rag_chain, question, timings, key=key, user=f"user{i % 50}"):
+            tokens += kind == "token"
+        return timings["total"], timings.get("ttft"), tokens
+
+    return run_concurrently(one, args.requests, args.concurrency)
+
+
+def bench_chat(args):
+    import chat_core
+
+    router = chat_core.get_router()
+
+    def one(i):
+        history = chat_core.new_history()
+        messages = [{"role": "user", "content": f"{QUESTIONS[i % len(QUESTIONS)]} {i}"}]
+        start = time.perf_counter()
+        api_messages, _, decision = chat_core.prepare_chat(history, chat_core.DEFAULT_SYSTEM_PROMPT, messages)
+        ttft, tokens = None, 0
+        for _ in router.stream(decision, api_messages, 0.7):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            tokens += 1
+        return time.perf_counter() - start, ttft, tokens
+
+    return run_concurrently(one, args.requests, args.concurrency)
+
+
+def bench_memory(args):
+    import memory_core
+
+    turns = max(1, args.requests // args.concurrency)
+
+    def user_session(u):
+        thread_id = f"bench-user-{u}"
+        results = []
+        for t in range(turns):
+            question = f"{QUESTIONS[t % len(QUESTIONS)]} {t}"
+            start = time.perf_counter()
+            answer = memory_core.ask(thread_id, question)
+            latency = time.perf_counter() - start
+            memory_core.record_turn(thread_id, question, answer)
+            results.append((latency, None, 0))
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = [r for session in pool.map(user_session, range(args.concurrency)) for r in session]
+    elapsed = time.perf_counter() - start
+    memory_core.get_summary_worker().flush(wait=True)
+    return summarize([r[0] for r in results], elapsed=elapsed)
+
+
+# 2. 보고/비교
+def print_report(report):
+    for name, result in report["scenarios"].items():
+        print(f"[{name}]")
+        for key, value in result.items():
+            print(f"  {key:30s} {value:10.3f}" if isinstance(value, float) else f"  {key:30s} {value:>10}")
+    print(f"RSS {report['rss_bytes'] / 1024 / 1024:.0f}MB (증가 {report['rss_delta_bytes'] / 1024 / 1024:.0f}MB)")
+
+
+def compare(report, baseline, tolerance):
+    """지연(p95, ttft_p95)이 기준보다 tolerance 비율 이상 늘어난 항목 목록"""
+    regressions = []
+    for name, result in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name, {})
+        for key in ("p95", "ttft_p95"):
+            if key in result and base.get(key):
+                change = result[key] / base[key] - 1
+                if change > tolerance:
+                    regressions.append(f"{name}.{key}: {base[key]:.3f}s → {result[key]:.3f}s (+{change:.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가짜 OpenAI 서버로 챗봇 지연/처리량 측정")
+    parser.add_argument("--scenarios", nargs="+", default=["ingest", "rag", "chat", "memory"],
+                        choices=["ingest", "rag", "chat", "memory"])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.1, help="가짜 서버 첫 토큰/임베딩 지연(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="가짜 서버 토큰 생성 속도")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--pdf", default=DEFAULT_PDF)
+    parser.add_argument("--coalesce", action="store_true", help="rag 시나리오에서 같은 질문을 반복해 중복 제거 효과 측정")
+    parser.add_argument("--json", help="결과를 JSON 으로 저장")
+    parser.add_argument("--baseline", help="비교할 이전 결과(JSON)")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    for name in ("pdf", "json", "baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    server, base_url = start_server(FakeOpenAIConfig(
+        latency=args.latency,
+        answer_tokens=args.answer_tokens,
+        tokens_per_second=args.tokens_per_second,
+    ))
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    # core 모듈은 import 시점에 환경 변수를 읽으므로 설정을 먼저 바꾼 뒤 불러온다
+    os.environ.update({
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_KEY": "fake",
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embedding_cache.sqlite"),
+        "SESSION_DB_PATH": os.path.join(work_dir, "sessions.sqlite"),
+    })
+    os.chdir(work_dir)
+    from shared_store import current_rss_bytes  # doc_registry 등 core 모듈을 함께 불러온다
+
+    rss_before = current_rss_bytes()
+    scenarios = {}
+    doc_index = None
+    if "ingest" in args.scenarios or "rag" in args.scenarios:
+        doc_index, scenarios["ingest"] = bench_ingest(args, work_dir)
+    if "rag" in args.scenarios:
+        scenarios["rag"] = bench_rag(args, doc_index)
+    if "chat" in args.scenarios:
+        scenarios["chat"] = bench_chat(args)
+    if "memory" in args.scenarios:
+        scenarios["memory"] = bench_memory(args)
+    server.shutdown()
+
+    from request_scheduler import get_scheduler
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "scenarios": scenarios,
+        "scheduler": get_scheduler().stats(),
+        "rss_bytes": current_rss_bytes(),
+        "rss_delta_bytes": current_rss_bytes() - rss_before,
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,54 @@
+"""
+OpenAI 클라이언트 재사용 효과 측정 (가짜 서버 사용, 비용 없음)
+
+    python bench_clients.py --requests 50 --latency 0.02
+
+- cold: 요청마다 새 OpenAI 클라이언트 생성 (기존 app.py 처럼 재실행마다 새로 만드는 경우)
+- warm: clients.get_openai_client() 로 만든 공유 클라이언트 재사용 (keep-alive 연결 풀)
+가짜 서버는 평문 HTTP 라서 TCP 연결 비용만 드러난다. 실제 API 는 TLS 핸드셰이크가 더해져 차이가 더 크다.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from openai import OpenAI
+
+import clients
+from fake_openai_server import FakeOpenAIConfig, start_server
+from metrics import percentile
+
+
+def run(label, make_client, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        client = make_client()
+        client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "연결 재사용 테스트"}],
+        )
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{label:5s} mean {statistics.mean(latencies) * 1000:7.2f} ms | "
+        f"p50 {percentile(latencies, 50) * 1000:7.2f} ms | "
+        f"p95 {percentile(latencies, 95) * 1000:7.2f} ms"
+    )
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI 클라이언트 cold/warm 지연 비교")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server, base_url = start_server(FakeOpenAIConfig(latency=args.latency, answer_tokens=20))
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+    cold = run("cold", lambda: OpenAI(base_url=base_url, api_key="fake"), args.requests)
+    warm = run("warm", clients.get_openai_client, args.requests)
+    saved = statistics.mean(cold) - statistics.mean(warm)
+    print(f"요청당 절약: {saved * 1000:.2f} ms (서버 지연 {args.latency * 1000:.0f} ms 제외한 오버헤드 기준)")
+    server.shutdown()
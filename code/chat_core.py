@@ -0,0 +1,57 @@
+"""
+일반 채팅 파이프라인 (Streamlit 화면 app_adv.py 와 HTTP 서버 server.py 가 함께 사용)
+"""
+from clients import get_openai_client, shared
+from history import HistoryManager
+from model_router import ModelRouter, OpenAIChatBackend
+
+AUTO_MODEL = "자동 (라우팅)"
+DEFAULT_SYSTEM_PROMPT = "당신은 친절하고 도움이 되는 AI 어시스턴트입니다. 사용자의 질문에 명확하고 정확하게 답변해주세요."
+
+
+# 오래된 대화를 요약하는 함수 (토큰 예산을 넘을 때만 호출됨)
+def summarize_history(old_summary, messages):
+    conversation = "\n".join(
+        f"{'사용자' if m['role'] == 'user' else 'AI'}: {m['content']}" for m in messages
+    )
+    response = get_openai_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{
+            "role": "user",
+            "content": (
+                "다음 이전 요약과 대화를 하나의 간결한 요약으로 합쳐줘. "
+                "사용자의 요청, 중요한 사실, 결정 사항을 빠뜨리지 마.\n\n"
+                f"[이전 요약]\n{old_summary or '없음'}\n\n[대화]\n{conversation}"
+            ),
+        }],
+        temperature=0,
+    )
+    return response.choices[0].message.content.strip()
+
+
+def get_router():
+    """모델 라우터 (모델별 지연 통계를 모든 세션/요청이 공유)"""
+    return shared("chat_router", lambda: ModelRouter(OpenAIChatBackend(get_openai_client())))
+
+
+def new_history():
+    """토큰 예산 기반 대화 기록 관리자 (메시지별 토큰 수 캐시 + 오래된 대화 요약)"""
+    return HistoryManager(summarize_fn=summarize_history)
+
+
+def prepare_chat(history, system_prompt, messages, model=AUTO_MODEL):
+    """
+    시스템 프롬프트 + (이전 대화 요약) + 토큰 예산 안의 최근 대화로 메시지를 구성하고 모델을 고른다.
+    반환값: (API 메시지 목록, 프롬프트 토큰 수, RouteDecision)
+    답변은 get_router().stream(decision, API 메시지, temperature) 로 스트리밍한다.
+    """
+    router = get_router()
+    history.model = router.fast_model if model == AUTO_MODEL else model
+    api_messages, prompt_tokens = history.build(system_prompt, messages)
+    # 자동이면 라우터가 분류, 직접 선택이면 실패 시 대체 모델만 지정
+    decision = router.route(
+        messages[-1]["content"],
+        context_tokens=prompt_tokens,
+        requested=None if model == AUTO_MODEL else model,
+    )
+    return api_messages, prompt_tokens, decision
@@ -0,0 +1,95 @@
+import os
+import threading
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from openai import OpenAI
+
+# 연결 풀/타임아웃/재시도 설정 (환경 변수로 변경 가능)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+
+# factory 안에서 다른 shared() 를 부르는 경우가 있어(get_openai_client → get_http_client) 재진입 가능한 락을 쓴다
+_lock = threading.RLock()
+_instances = {}
+
+
+def shared(key, factory):
+    """key 별로 한 번만 만들어 프로세스 전체에서 재사용 (Streamlit 재실행, 서버 요청 모두 같은 객체)"""
+    instance = _instances.get(key)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(key)
+            if instance is None:
+                instance = factory()
+                _instances[key] = instance
+    return instance
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout():
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+# 1. HTTP 연결 풀 (keep-alive 로 TLS/연결 설정을 재사용)
+def get_http_client():
+    return shared("http", lambda: httpx.Client(limits=_limits(), timeout=_timeout()))
+
+
+def get_async_http_client():
+    """비동기 클라이언트는 async_runtime 의 공유 이벤트 루프에서만 사용한다"""
+    return shared("http_async", lambda: httpx.AsyncClient(limits=_limits(), timeout=_timeout()))
+
+
+def _base_url():
+    return os.getenv("OPENAI_BASE_URL") or None
+
+
+# 2. 공유 클라이언트 팩토리
+def get_openai_client():
+    """OpenAI SDK 클라이언트 (app.py, app_adv.py 용)"""
+    return shared("openai", lambda: OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=_base_url(),
+        http_client=get_http_client(),
+        max_retries=OPENAI_MAX_RETRIES,
+        timeout=_timeout(),
+    ))
+
+
+def get_chat_model(model="gpt-4o-mini", temperature=0, **kwargs):
+    """LangChain ChatOpenAI (rag_chatbot.py, memory.py 용) - 같은 설정이면 같은 객체를 반환"""
+    key = ("chat", model, temperature, tuple(sorted(kwargs.items())))
+    return shared(key, lambda: ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        base_url=_base_url(),
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        max_retries=OPENAI_MAX_RETRIES,
+        timeout=_timeout(),
+        **kwargs,
+    ))
+
+
+def get_embeddings(model="text-embedding-ada-002"):
+    """LangChain OpenAIEmbeddings (모델 이름은 임베딩 캐시 키와 기존 인덱스에 맞춰 유지)"""
+    return shared(("embeddings", model), lambda: OpenAIEmbeddings(
+        model=model,
+        base_url=_base_url(),
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        max_retries=OPENAI_MAX_RETRIES,
+        timeout=_timeout(),
+    ))
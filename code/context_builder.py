@@ -0,0 +1,133 @@
+import os
+
+from tokenizer import encoding_for
+
+# 프롬프트에 넣을 참고 문서의 최대 토큰 수
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+NEAR_DUPLICATE_THRESHOLD = 0.8  # 문자 5-gram 자카드 유사도가 이 값 이상이면 중복으로 본다
+MIN_OVERLAP = 20                # 이보다 짧게 겹치면 이어 붙이지 않는다
+MAX_OVERLAP = 200               # 청크 중첩(100자)보다 넉넉하게 확인
+
+
+# 1. 같은 페이지에서 겹치는 청크 이어 붙이기
+def _overlap_length(left, right):
+    """left 의 끝부분과 right 의 앞부분이 겹치는 길이 (없으면 0)"""
+    for k in range(min(len(left), len(right), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+
+def _group_key(doc):
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+
+def merge_overlapping(docs):
+    """
+    같은 출처/페이지의 청크 중 중첩(overlap)으로 이어지는 것들을 하나로 합친다.
+    합쳐진 청크는 가장 높은 순위 청크의 자리에 놓인다.
+    반환값: [{"text", "metadata", "rank"}, ...] (순위 순)
+    """
+    merged = []
+    for rank, doc in enumerate(docs):
+        text = doc.page_content
+        for item in merged:
+            if _group_key(doc) != (item["metadata"].get("source"), item["metadata"].get("page")):
+                continue
+            if text in item["text"]:
+                break  # 이미 포함된 내용
+            if item["text"] in text:
+                item["text"] = text
+                break
+            k = _overlap_length(item["text"], text)
+            if k:
+                item["text"] += text[k:]
+                break
+            k = _overlap_length(text, item["text"])
+            if k:
+                item["text"] = text + item["text"][k:]
+                break
+        else:
+            merged.append({"text": text, "metadata": doc.metadata, "rank": rank})
+    return merged
+
+
+# 2. 거의 같은 내용 제거
+def _shingles(text, n=5):
+    text = "".join(text.split())
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+
+def remove_near_duplicates(items, threshold=NEAR_DUPLICATE_THRESHOLD):
+    kept, kept_shingles = [], []
+    for item in items:
+        shingles = _shingles(item["text"])
+        if any(len(shingles & s) / len(shingles | s) >= threshold for s in kept_shingles):
+            continue
+        kept.append(item)
+        kept_shingles.append(shingles)
+    return kept
+
+
+# 3. 토큰 예산 안에 담기
+def _format(item):
+    meta = item["metadata"]
+    source = os.path.basename(str(meta.get("source", "")))
+    page = meta.get("page")
+    header = f"[출처: {source}" + (f" p.{page + 1}]" if isinstance(page, int) else "]")
+    return f"{header}\n{item['text']}"
+
+
+def _truncate(encoding, text, max_tokens):
+    """
+    max_tokens 안으로 자른다. 토큰 경계가 한글 글자(여러 바이트)의 중간일 수 있으므로
+    바이트로 디코드해 잘린 글자를 버리고, 가능하면 마지막 줄바꿈/공백에서 끊는다.
+    """
+    tokens = encoding.encode(text, disallowed_special=())[:max_tokens]
+    cut = encoding.decode_bytes(tokens).decode("utf-8", errors="ignore")
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    return cut[:boundary] if boundary > len(cut) * 0.8 else cut
+
+
+def build_context(docs, max_tokens=RAG_CONTEXT_TOKENS, model="gpt-4o-mini"):
+    """
+    검색된 청크 → (겹침 병합 → 중복 제거 → 토큰 예산 패킹) → 프롬프트용 문자열.
+    토큰 수는 답변 모델(model)의 토크나이저로 센다.
+    반환값: {"text": 문맥 문자열, "docs": 원본 청크, "stats": 토큰 통계}
+    stats.saved_tokens 는 청크를 그대로 이어 붙였을 때 대비 줄어든 토큰 수.
+    """
+    encoding = encoding_for(model)
+
+    def count_tokens(text):
+        return len(encoding.encode(text, disallowed_special=()))
+
+    raw_tokens = count_tokens("\n\n".join(doc.page_content for doc in docs))
+    items = remove_near_duplicates(merge_overlapping(docs))
+
+    parts, used = [], 0
+    for item in items:
+        block = _format(item)
+        tokens = count_tokens(block) + (2 if parts else 0)
+        if used + tokens > max_tokens:
+            remaining = max_tokens - used - 2
+            if remaining > 50:
+                # 마지막 청크는 남은 예산만큼 잘라서 넣는다
+                parts.append(_truncate(encoding, block, remaining))
+                used += remaining + 2
+            break
+        parts.append(block)
+        used += tokens
+
+    text = "\n\n".join(parts)
+    context_tokens = count_tokens(text)
+    return {
+        "text": text,
+        "docs": docs,
+        "stats": {
+            "chunks": len(docs),
+            "blocks": len(parts),
+            "raw_tokens": raw_tokens,
+            "context_tokens": context_tokens,
+            "saved_tokens": max(0, raw_tokens - context_tokens),
+        },
+    }
@@ -0,0 +1,344 @@
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 스레드 잠금만 사용
+    fcntl = None
+
+from embedding_cache import CachedEmbeddings, text_hash
+from embedding_pipeline import EmbeddingPipeline
+from lexical_index import LEXICAL_FILE, LexicalIndex
+from faiss_index import (
+    FAISS_INDEX_TYPE,
+    copy_vectorstore,
+    load_params,
+    load_vectorstore,
+    needs_retrain,
+    new_vectorstore,
+    rebuild_without,
+    save_params,
+    supports_remove,
+)
+
+# 인덱스 폴더 안의 파일 이름
+CURRENT_FILE = "CURRENT"          # 현재 사용 중인 버전 폴더 이름을 기록
+REGISTRY_FILE = "registry.json"   # 문서별 페이지/청크 ID 기록
+LOCK_FILE = ".write.lock"         # 여러 프로세스(서버 워커)의 동시 수정 방지
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # 한 번에 임베딩/추가할 청크 수
+
+
+# 1. 인덱스 버전 경로 도우미
+def current_index_path(index_dir):
+    """
+    인덱스 폴더는 다음과 같이 버전별 하위 폴더로 저장된다.
+        faiss_index/CURRENT        → "v3"
+        faiss_index/v3/index.faiss, index.pkl, registry.json
+    CURRENT 파일이 없으면(이전 형식) 인덱스 폴더 자체를 사용한다.
+    """
+    pointer = os.path.join(index_dir, CURRENT_FILE)
+    if os.path.exists(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            return os.path.join(index_dir, f.read().strip())
+    return index_dir
+
+
+def index_version(index_dir):
+    """현재 인덱스 버전 문자열 (인덱스가 없으면 None)"""
+    path = current_index_path(index_dir)
+    if not os.path.exists(os.path.join(path, "index.faiss")):
+        return None
+    if path == index_dir:
+        # 이전 형식: 파일 수정 시각을 버전으로 사용
+        return f"legacy-{os.path.getmtime(os.path.join(path, 'index.faiss')):.0f}"
+    return os.path.basename(path)
+
+
+# 2. 문서 청크 ID 생성
+def iter_chunk_ids(source, docs):
+    """
+    (청크 ID, 청크) 를 하나씩 내보낸다. 청크 ID = 출처:페이지:내용해시.
+    내용이 같은 청크는 항상 같은 ID를 가지므로, 문서를 교체할 때
+    바뀐 청크만 삭제/추가하면 된다. (같은 페이지의 동일 내용은 번호로 구분)
+    """
+    seen = {}
+    for doc in docs:
+        base = f"{source}:{doc.metadata.get('page', 0)}:{text_hash(doc.page_content)[:16]}"
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        yield (base if n == 0 else f"{base}#{n}"), doc
+
+
+def make_chunk_ids(source, docs):
+    return [chunk_id for chunk_id, _ in iter_chunk_ids(source, docs)]
+
+
+# 3. 문서 레지스트리 + 증분 인덱싱
+# 읽는 쪽이 보는 커밋된 버전 (한 번에 통째로 교체되며 안의 객체는 바뀌지 않는다)
+IndexSnapshot = namedtuple("IndexSnapshot", ["version", "vectordb", "lexical", "documents", "index_params"])
+
+
+class _Draft:
+    """수정 중인 비공개 사본 - _commit 에서 새 스냅샷이 된다"""
+
+    def __init__(self, vectordb, lexical, documents, index_params):
+        self.vectordb = vectordb
+        self.lexical = lexical
+        self.documents = documents
+        self.index_params = index_params
+
+
+class DocumentIndex:
+    """
+    FAISS 인덱스와 문서 레지스트리(출처 파일 → 페이지, 청크 ID)를 함께 관리한다.
+    - add_document / remove_document / replace_document 로 변경분만 임베딩·삭제
+    - 각 작업 결과는 새 버전 폴더에 저장한 뒤 CURRENT 파일을 교체하여
+      읽는 쪽이 항상 완전한 인덱스만 보도록 한다.
+    - 인덱스 종류(flat/ivf/hnsw/pq/sq)는 처음 만들 때 정해지고 index_params.json 에 저장된다.
+      읽기 전용으로는 메모리 맵으로 열고, 수정할 때만 메모리로 다시 읽는다.
+    - 수정은 copy-on-write: FAISS 인덱스/BM25 역색인/레지스트리의 사본(_Draft)을 고친 뒤
+      _commit 에서 스냅샷을 통째로 바꾼다. 검색 중인 체인은 자기 스냅샷을 계속 쓰므로
+      쓰기와 동시에 읽어도 안전하고, 커밋되지 않은(또는 실패한) 변경은 보이지 않는다.
+    - 수정은 파일 잠금으로 한 번에 한 프로세스만 하며, 다른 프로세스가 먼저
+      새 버전을 저장했으면 그 버전을 다시 읽은 뒤 변경을 적용한다.
+    - add/replace 의 docs 는 제너레이터여도 되며 INGEST_BATCH_SIZE 청크씩 임베딩·추가한다.
+    """
+
+    def __init__(self, index_dir, embeddings, cache=None, index_type=None, mmap=True):
+        self.index_dir = index_dir
+        self.embeddings = embeddings
+        self.cached = CachedEmbeddings(embeddings, cache=cache, pipeline=EmbeddingPipeline(embeddings))
+        self.index_type = index_type or FAISS_INDEX_TYPE
+        self.mmap = mmap
+        self._snapshot = IndexSnapshot(None, None, LexicalIndex(), {}, None)
+        self._writable = True
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        path = current_index_path(self.index_dir)
+        version = index_version(self.index_dir)
+        if not os.path.exists(os.path.join(path, "index.faiss")):
+            self._snapshot = IndexSnapshot(version, None, LexicalIndex(), {}, None)
+            return
+        index_params = load_params(path)
+        self.index_type = index_params["index_type"]
+        vectordb = load_vectorstore(path, self.embeddings, mmap=self.mmap)
+        # BM25 역색인 (이전 인덱스에 없으면 docstore 청크로 새로 만든다)
+        if os.path.exists(os.path.join(path, LEXICAL_FILE)):
+            lexical = LexicalIndex.load(path)
+        else:
+            lexical = LexicalIndex.from_vectorstore(vectordb)
+        documents = {}
+        registry_path = os.path.join(path, REGISTRY_FILE)
+        if os.path.exists(registry_path):
+            with open(registry_path, "r", encoding="utf-8") as f:
+                documents = json.load(f)["documents"]
+        self._writable = not self.mmap
+        self._snapshot = IndexSnapshot(version, vectordb, lexical, documents, index_params)
+
+    # 읽기: 커밋된 스냅샷 (여러 값을 함께 쓸 때는 snapshot() 으로 한 번에 받는다)
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def loaded_version(self):
+        return self._snapshot.version
+
+    @property
+    def vectordb(self):
+        return self._snapshot.vectordb
+
+    @property
+    def lexical(self):
+        return self._snapshot.lexical
+
+    @property
+    def documents(self):
+        return self._snapshot.documents
+
+    @property
+    def index_params(self):
+        return self._snapshot.index_params
+
+    @property
+    def version(self):
+        return index_version(self.index_dir)
+
+    def list_documents(self):
+        return dict(self.documents)
+
+    @contextmanager
+    def _writing(self):
+        """
+        스레드 잠금 + 프로세스 간 파일 잠금을 잡고, 디스크의 최신 버전을 복사한 _Draft 를 넘긴다.
+        도중에 실패하면 사본만 버려지고 스냅샷은 그대로다.
+        """
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(os.path.join(self.index_dir, LOCK_FILE), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if self.version != self.loaded_version:
+                        # 다른 워커가 커밋한 버전을 기준으로 삼는다 (오래된 레지스트리로 덮어쓰지 않음)
+                        self._load()
+                    yield self._draft()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _draft(self):
+        snapshot = self._snapshot
+        vectordb = snapshot.vectordb
+        if vectordb is not None:
+            if self._writable:
+                vectordb = copy_vectorstore(vectordb)
+            else:
+                # 메모리 맵(읽기 전용)으로 연 인덱스는 파일에서 메모리로 읽은 것이 곧 사본이다
+                path = current_index_path(self.index_dir)
+                if snapshot.version and snapshot.version.startswith("v"):
+                    path = os.path.join(self.index_dir, snapshot.version)
+                vectordb = load_vectorstore(path, self.embeddings, mmap=False)
+        return _Draft(vectordb, snapshot.lexical.copy(), dict(snapshot.documents), snapshot.index_params)
+
+    def _embed_and_add(self, draft, ids, docs):
+        texts = [doc.page_content for doc in docs]
+        vectors = self.cached.embed_documents(texts)
+        metadatas = [dict(doc.metadata, chunk_id=i) for i, doc in zip(ids, docs)]
+        if draft.vectordb is None:
+            # 첫 문서의 벡터로 인덱스를 학습 (IVF/PQ/SQ)
+            draft.vectordb, draft.index_params = new_vectorstore(self.embeddings, vectors, self.index_type)
+        draft.vectordb.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+        for chunk_id, text in zip(ids, texts):
+            draft.lexical.add(chunk_id, text)
+        if needs_retrain(draft.index_params, draft.vectordb.index.ntotal):
+            # 학습 당시보다 벡터가 충분히 늘었으면 전체 벡터로 nlist/코드북을 다시 학습
+            self._rebuild(draft, [])
+
+    def _rebuild(self, draft, exclude_ids):
+        draft.vectordb, draft.index_params = rebuild_without(
+            draft.vectordb, exclude_ids, self.index_type, draft.index_params, embed=self.cached.embed_documents,
+        )
+
+    def _delete(self, draft, ids):
+        for chunk_id in ids:
+            draft.lexical.remove(chunk_id)
+        if supports_remove(self.index_type):
+            draft.vectordb.delete(ids)
+        else:
+            # HNSW/IVF 계열은 개별 삭제 후 위치와 id 가 어긋나므로 남은 벡터로 다시 만든다
+            self._rebuild(draft, ids)
+
+    def _record(self, draft, source, ids, pages):
+        draft.documents[source] = {
+            "chunk_ids": ids,
+            "pages": sorted(pages),
+            "updated_at": time.time(),
+        }
+
+    def _add_stream(self, draft, source, docs, existing=()):
+        """
+        청크를 INGEST_BATCH_SIZE 개씩 모아 임베딩·추가한다 (existing 에 있는 ID 는 건너뜀).
+        문서 전체 청크를 메모리에 모으지 않는다. 반환값: (전체 청크 ID, 페이지 집합, 추가한 수)
+        """
+        ids, pages, added = [], set(), 0
+        batch_ids, batch_docs = [], []
+        for chunk_id, doc in iter_chunk_ids(source, docs):
+            ids.append(chunk_id)
+            pages.add(doc.metadata.get("page", 0))
+            if chunk_id in existing:
+                continue
+            batch_ids.append(chunk_id)
+            batch_docs.append(doc)
+            if len(batch_ids) >= INGEST_BATCH_SIZE:
+                self._embed_and_add(draft, batch_ids, batch_docs)
+                added += len(batch_ids)
+                batch_ids, batch_docs = [], []
+        if batch_ids:
+            self._embed_and_add(draft, batch_ids, batch_docs)
+            added += len(batch_ids)
+        return ids, pages, added
+
+    def add_document(self, source, docs):
+        """새 문서를 인덱스에 추가 (이미 등록된 출처면 ValueError)"""
+        with self._writing() as draft:
+            if source in draft.documents:
+                raise ValueError(f"이미 등록된 문서입니다: {source}")
+            ids, pages, added = self._add_stream(draft, source, docs)
+            self._record(draft, source, ids, pages)
+            return {"added": added, "removed": 0, "version": self._commit(draft)}
+
+    def remove_document(self, source):
+        """문서의 모든 청크를 인덱스에서 삭제 (쓰기 잠금 안에서 최신 버전에 없으면 KeyError)"""
+        with self._writing() as draft:
+            if source not in draft.documents:
+                raise KeyError(source)
+            ids = draft.documents.pop(source)["chunk_ids"]
+            if ids:
+                self._delete(draft, ids)
+            return {"added": 0, "removed": len(ids), "version": self._commit(draft)}
+
+    def replace_document(self, source, docs):
+        """
+        문서를 새 버전으로 교체 (등록되지 않은 출처면 추가).
+        기존 청크 ID와 비교해 사라진 청크만 삭제하고 새 청크만 임베딩한다.
+        """
+        with self._writing() as draft:
+            old_ids = set(draft.documents.get(source, {}).get("chunk_ids", []))
+            # 새 청크를 먼저 추가하고(ID 가 같은 청크는 그대로 둠), 사라진 청크는 마지막에 삭제
+            new_ids, pages, added = self._add_stream(draft, source, docs, existing=old_ids)
+            new_set = set(new_ids)
+            to_remove = [i for i in old_ids if i not in new_set]
+
+            if not to_remove and not added and source in draft.documents:
+                return {"added": 0, "removed": 0, "version": self.loaded_version}
+
+            if to_remove:
+                self._delete(draft, to_remove)
+            self._record(draft, source, new_ids, pages)
+            return {"added": added, "removed": len(to_remove), "version": self._commit(draft)}
+
+    def _commit(self, draft):
+        """
+        새 버전 폴더에 사본을 저장하고 CURRENT 를 원자적으로 교체한 뒤,
+        사본을 새 스냅샷으로 바꿔 단다 (이후 이 사본은 수정하지 않는다). 반환값: 새 버전 이름
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        current = self.version
+        number = int(current[1:]) + 1 if current and current.startswith("v") else 1
+        new_name = f"v{number}"
+        new_path = os.path.join(self.index_dir, new_name)
+        if os.path.exists(new_path):
+            shutil.rmtree(new_path)
+
+        if draft.vectordb is not None:
+            draft.vectordb.save_local(new_path)
+            save_params(new_path, draft.index_params or {"index_type": self.index_type})
+            draft.lexical.save(new_path)
+        else:
+            os.makedirs(new_path)
+        with open(os.path.join(new_path, REGISTRY_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": new_name, "documents": draft.documents}, f, ensure_ascii=False)
+
+        tmp_pointer = os.path.join(self.index_dir, CURRENT_FILE + ".tmp")
+        with open(tmp_pointer, "w", encoding="utf-8") as f:
+            f.write(new_name)
+        os.replace(tmp_pointer, os.path.join(self.index_dir, CURRENT_FILE))
+        self._writable = True
+        self._snapshot = IndexSnapshot(new_name, draft.vectordb, draft.lexical, draft.documents, draft.index_params)
+
+        self._cleanup(keep={new_name, current})
+        return new_name
+
+    def _cleanup(self, keep):
+        """현재/직전 버전을 제외한 오래된 버전 폴더 삭제 (읽는 중인 프로세스를 위해 직전 버전은 유지)"""
+        for name in os.listdir(self.index_dir):
+            path = os.path.join(self.index_dir, name)
+            if name.startswith("v") and name[1:].isdigit() and name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+# 임베딩 캐시 파일 경로와 최대 저장 개수 (환경 변수로 변경 가능)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+
+# 1. 텍스트 정규화 및 해시 함수
+def normalize_text(text):
+    """
+    같은 내용의 청크가 공백/유니코드 표기 차이 때문에 다른 키가 되지 않도록 정규화한다.
+    - 유니코드 NFC 정규화 (한글 자모 조합형/완성형 통일)
+    - 연속 공백을 하나로 줄이고 앞뒤 공백 제거
+    """
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text):
+    """정규화된 텍스트의 SHA-256 해시 (캐시 키로 사용)"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+# 2. 디스크 기반 임베딩 캐시 (SQLite)
+class EmbeddingCache:
+    """
+    (모델 이름, 텍스트 해시) → 임베딩 벡터를 저장하는 영구 캐시.
+    - 마지막 사용 시각(last_used)을 기록해 최대 개수를 넘으면 오래된 항목부터 삭제(LRU)
+    - 적중(hit)/미스(miss) 횟수를 기록해 캐시 효율을 확인할 수 있다.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model     TEXT NOT NULL,
+                hash      TEXT NOT NULL,
+                vector    BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """해시 목록 중 캐시에 있는 항목만 {hash: vector} 형태로 반환"""
+        found = {}
+        if not hashes:
+            return found
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model, items):
+        """{hash: vector} 항목들을 저장하고 최대 개수를 넘으면 오래된 항목을 삭제"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, array("f", vec).tobytes(), now) for h, vec in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self):
+        """캐시 적중률 통계"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 3. 캐시를 거쳐 임베딩하는 Embeddings 래퍼
+class CachedEmbeddings(Embeddings):
+    """
+    기존 임베딩 모델(OpenAIEmbeddings 등)을 감싸서
+    캐시에 없는 청크만 실제로 임베딩 API에 요청한다.
+    수정된 문서를 다시 인덱싱할 때 바뀐 청크만 비용이 발생한다.
+    pipeline(EmbeddingPipeline)을 주면 미스 청크를 배치/병렬로 임베딩하고,
+    배치가 끝날 때마다 캐시에 저장한다.
+    """
+
+    def __init__(self, underlying, cache=None, model_name=None, pipeline=None):
+        self.underlying = underlying
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.model_name = model_name or getattr(underlying, "model", type(underlying).__name__)
+        self.pipeline = pipeline
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(self.model_name, hashes)
+
+        # 캐시에 없는 텍스트만 (중복 제거 후) 임베딩
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = t
+        if missing:
+            keys = list(missing.keys())
+            if self.pipeline is not None:
+                # 배치가 끝날 때마다 캐시에 저장 (중간 실패 시 재실행하면 이어서 진행)
+                def on_batch(indices, vectors):
+                    self.cache.put_many(self.model_name, {keys[i]: v for i, v in zip(indices, vectors)})
+
+                vectors = self.pipeline.embed(list(missing.values()), on_batch=on_batch)
+                found.update(zip(keys, vectors))
+            else:
+                vectors = self.underlying.embed_documents(list(missing.values()))
+                new_items = dict(zip(keys, vectors))
+                self.cache.put_many(self.model_name, new_items)
+                found.update(new_items)
+
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text):
+        # 질문 임베딩은 매번 다르므로 캐시하지 않고 그대로 전달
+        return self.underlying.embed_query(text)
+
+
+# 4. 오프라인 테스트용 결정적(deterministic) 가짜 임베딩
+class HashEmbeddings(Embeddings):
+    """
+    API 호출 없이 텍스트 해시로 벡터를 만드는 가짜 임베딩.
+    같은 텍스트는 항상 같은 벡터가 나오며, 호출된 텍스트 수(calls)를 센다.
+    """
+
+    def __init__(self, size=64, model="hash-embedding"):
+        self.size = size
+        self.model = model
+        self.calls = 0
+
+    def _embed(self, text):
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+        values = [(digest[i % len(digest)] / 255.0) * 2 - 1 for i in range(self.size)]
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return [v / norm for v in values]
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._embed(text)
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import random
+import time
+
+import async_runtime
+from tokenizer import count_tokens
+
+# 배치/동시성 기본값 (환경 변수로 변경 가능)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))             # 요청 1회당 최대 청크 수
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))     # 동시에 보낼 요청 수
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "250000"))  # 요청 1회당 최대 토큰 수
+EMBED_TOKENS_PER_MINUTE = int(os.getenv("EMBED_TOKENS_PER_MINUTE", "0"))  # 0이면 분당 토큰 제한 없음
+
+# 재시도 대상 HTTP 상태 코드 (요청 한도 초과, 일시적 서버 오류)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+# 1. 배치 나누기
+def make_batches(texts, batch_size=EMBED_BATCH_SIZE, max_tokens=EMBED_MAX_BATCH_TOKENS):
+    """
+    텍스트 목록을 (청크 수, 토큰 수) 두 가지 한도를 넘지 않는 배치로 나눈다.
+    반환값은 [(인덱스 목록, 배치 토큰 수), ...] 형태이며 입력 순서를 유지한다.
+    """
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        n = count_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + n > max_tokens):
+            batches.append((current, current_tokens))
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += n
+    if current:
+        batches.append((current, current_tokens))
+    return batches
+
+
+# 2. 재시도 판단 및 대기 시간 계산
+def is_retryable(exc):
+    """요청 한도 초과(429), 일시적 서버 오류, 타임아웃/연결 오류면 재시도"""
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return any(word in name for word in ("RateLimit", "Timeout", "Connection"))
+
+
+def retry_after_seconds(exc):
+    """서버가 Retry-After 헤더를 보냈다면 그 값을 사용"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# 3. 분당 토큰 제한(TPM)을 지키는 토큰 버킷
+class TokenRateLimiter:
+    def __init__(self, tokens_per_minute):
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = tokens_per_minute
+        self.available = tokens_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep((tokens - self.available) / self.rate)
+
+
+# 4. 비동기 배치 임베딩 파이프라인
+class EmbeddingPipeline:
+    """
+    임베딩 요청을 배치로 나눠 제한된 동시성으로 병렬 전송한다.
+    - 배치 크기와 배치당 토큰 수(tiktoken) 한도 적용
+    - 429/일시 오류 시 지수 백오프 재시도 (한 요청이 한도에 걸리면 모든 작업자가 함께 대기)
+    - 배치가 끝날 때마다 on_batch 콜백 호출 → 임베딩 캐시에 바로 저장되어
+      중간에 실패해도 다시 실행하면 완료된 배치는 건너뛴다(체크포인트/재개).
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_MAX_CONCURRENCY,
+        max_batch_tokens=EMBED_MAX_BATCH_TOKENS,
+        tokens_per_minute=EMBED_TOKENS_PER_MINUTE,
+        max_retries=6,
+        base_delay=1.0,
+        max_delay=60.0,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_batch_tokens = max_batch_tokens
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"batches": 0, "retries": 0, "tokens": 0, "elapsed": 0.0}
+
+    async def _embed_batch(self, texts, tokens, state):
+        attempt = 0
+        while True:
+            # 다른 작업자가 요청 한도에 걸렸다면 같이 대기
+            pause = state["paused_until"] - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            if state["limiter"] is not None:
+                await state["limiter"].acquire(tokens)
+            try:
+                return await self.embeddings.aembed_documents(texts)
+            except Exception as exc:
+                if attempt >= self.max_retries or not is_retryable(exc):
+                    raise
+                delay = retry_after_seconds(exc)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                    delay *= random.uniform(0.5, 1.0)  # 지터(jitter)로 동시 재시도 분산
+                state["paused_until"] = max(state["paused_until"], time.monotonic() + delay)
+                self.stats["retries"] += 1
+                attempt += 1
+
+    async def aembed(self, texts, on_batch=None):
+        """
+        texts 전체를 임베딩해 입력 순서대로 벡터 목록을 반환한다.
+        on_batch(indices, vectors): 배치 하나가 끝날 때마다 호출 (indices 는 texts 기준)
+        """
+        start = time.perf_counter()
+        vectors = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        state = {
+            "paused_until": 0.0,
+            "limiter": TokenRateLimiter(self.tokens_per_minute) if self.tokens_per_minute else None,
+        }
+
+        async def run(indices, tokens):
+            async with semaphore:
+                result = await self._embed_batch([texts[i] for i in indices], tokens, state)
+            for i, vec in zip(indices, result):
+                vectors[i] = vec
+            self.stats["batches"] += 1
+            self.stats["tokens"] += tokens
+            if on_batch is not None:
+                on_batch(indices, result)
+
+        batches = make_batches(texts, self.batch_size, self.max_batch_tokens)
+        await asyncio.gather(*(run(indices, tokens) for indices, tokens in batches))
+        self.stats["elapsed"] += time.perf_counter() - start
+        return vectors
+
+    def embed(self, texts, on_batch=None):
+        """
+        동기 코드(Streamlit 스크립트 등)에서 호출하는 래퍼.
+        공유 HTTP 연결 풀이 묶인 프로세스 공용 이벤트 루프(async_runtime)에서 실행한다.
+        """
+        return async_runtime.run(self.aembed(texts, on_batch))
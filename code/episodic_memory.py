@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from history import count_message_tokens
+from session_store import SESSION_DB_PATH
+
+EPISODIC_MAX_ITEMS = int(os.getenv("EPISODIC_MAX_ITEMS", "300"))      # 사용자당 최대 기억 수
+EPISODIC_TOKEN_BUDGET = int(os.getenv("EPISODIC_TOKEN_BUDGET", "600"))  # 프롬프트에 넣을 기억 토큰 수
+EPISODIC_KEEP_SUMMARIES = 5     # 압축 시 남길 최근 요약 수
+EPISODIC_CACHE_THREADS = 200    # 메모리에 올려 둘 사용자별 벡터 인덱스 수
+
+
+class EpisodicMemory:
+    """
+    사용자(thread_id)별 장기기억 벡터 인덱스.
+    - 대화 턴과 요약을 임베딩해 SQLite 에 저장하고, 사용자별 작은 벡터 행렬로 메모리에 올린다.
+    - 질문마다 관련도가 높은 기억만 토큰 예산 안에서 골라 프롬프트에 넣으므로
+      대화 기록이 길어져도 프롬프트 크기는 일정하다.
+    - 사용자당 기억이 max_items 를 넘으면 오래된 대화 턴(이미 요약에 반영됨)부터 정리한다.
+    - 다른 프로세스도 같은 DB 에 쓰므로, 캐시를 쓰기 전에 사용자의 (마지막 id, 기억 수)를 확인한다.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        path=SESSION_DB_PATH,
+        max_items=EPISODIC_MAX_ITEMS,
+        token_budget=EPISODIC_TOKEN_BUDGET,
+    ):
+        self.embeddings = embeddings
+        self.max_items = max_items
+        self.token_budget = token_budget
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()  # thread_id → ((마지막 id, 기억 수), (ids, 행렬, 텍스트, 토큰 수))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="episodic")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS memories (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id  TEXT NOT NULL,
+                kind       TEXT NOT NULL,
+                text       TEXT NOT NULL,
+                tokens     INTEGER NOT NULL,
+                vector     BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_memories_thread ON memories(thread_id, id);
+            """
+        )
+        self._conn.commit()
+
+    # 1. 저장
+    def add(self, thread_id, text, kind="turn"):
+        """기억 하나를 임베딩해 저장 (kind: "turn" 대화 턴 / "summary" 요약)"""
+        vector = np.asarray(self.embeddings.embed_query(text), dtype="float32")
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO memories (thread_id, kind, text, tokens, vector, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, kind, text, count_message_tokens(text), vector.tobytes(), time.time()),
+            )
+            self._conn.commit()
+            self._cache.pop(thread_id, None)
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM memories WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            if count > self.max_items:
+                self.compact(thread_id)
+
+    def add_async(self, thread_id, text, kind="turn"):
+        """임베딩 호출이 답변을 막지 않도록 백그라운드에서 저장"""
+        return self._executor.submit(self.add, thread_id, text, kind)
+
+    # 2. 압축
+    def compact(self, thread_id):
+        """
+        - 요약은 최근 EPISODIC_KEEP_SUMMARIES 개만 남긴다.
+        - 대화 턴은 오래된 것부터 지워 전체를 max_items 의 80% 로 줄인다.
+        """
+        with self._lock:
+            self._conn.execute(
+                """
+                DELETE FROM memories WHERE thread_id = ? AND kind = 'summary' AND id NOT IN (
+                    SELECT id FROM memories WHERE thread_id = ? AND kind = 'summary'
+                    ORDER BY id DESC LIMIT ?
+                )
+                """,
+                (thread_id, thread_id, EPISODIC_KEEP_SUMMARIES),
+            )
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM memories WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            overflow = count - int(self.max_items * 0.8)
+            if overflow > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM memories WHERE id IN (
+                        SELECT id FROM memories WHERE thread_id = ? AND kind = 'turn'
+                        ORDER BY id ASC LIMIT ?
+                    )
+                    """,
+                    (thread_id, overflow),
+                )
+            self._conn.commit()
+            self._cache.pop(thread_id, None)
+
+    # 3. 검색
+    def _load(self, thread_id):
+        # 추가(마지막 id)와 정리(기억 수) 모두 감지된다
+        stamp = self._conn.execute(
+            "SELECT MAX(id), COUNT(*) FROM memories WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        cached = self._cache.get(thread_id)
+        if cached is not None and cached[0] == stamp:
+            entry = cached[1]
+        else:
+            rows = self._conn.execute(
+                "SELECT id, text, tokens, vector FROM memories WHERE thread_id = ? ORDER BY id",
+                (thread_id,),
+            ).fetchall()
+            matrix = (
+                np.vstack([np.frombuffer(r[3], dtype="float32") for r in rows])
+                if rows else np.zeros((0, 1), dtype="float32")
+            )
+            entry = ([r[0] for r in rows], matrix, [r[1] for r in rows], [r[2] for r in rows])
+            self._cache[thread_id] = (stamp, entry)
+        self._cache.move_to_end(thread_id)
+        while len(self._cache) > EPISODIC_CACHE_THREADS:
+            self._cache.popitem(last=False)
+        return entry
+
+    def retrieve(self, thread_id, query, token_budget=None):
+        """질문과 관련도가 높은 기억을 토큰 예산 안에서 골라 반환 (시간 순 정렬)"""
+        budget = token_budget or self.token_budget
+        with self._lock:
+            ids, matrix, texts, tokens = self._load(thread_id)
+        if not ids:
+            return []
+        vector = np.asarray(self.embeddings.embed_query(query), dtype="float32")
+        vector /= np.linalg.norm(vector) or 1.0
+        order = np.argsort(-(matrix @ vector))
+
+        picked, used = [], 0
+        for i in order:
+            if used + tokens[i] > budget:
+                continue
+            picked.append(i)
+            used += tokens[i]
+        return [texts[i] for i in sorted(picked)]
+
+    def format(self, thread_id, query):
+        memories = self.retrieve(thread_id, query)
+        return "\n---\n".join(memories) if memories else "관련된 이전 기억 없음"
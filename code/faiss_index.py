@@ -0,0 +1,300 @@
+"""
+FAISS 인덱스 종류 선택 / 메모리 맵 로드 / 정확도-지연시간 비교 모듈
+
+지원하는 인덱스 종류 (FAISS_INDEX_TYPE 환경 변수 또는 DocumentIndex(index_type=...))
+- flat : 전수 비교 (정확, 기본값)
+- ivf  : 클러스터(nlist)로 나눠 일부(nprobe)만 검색
+- hnsw : 그래프 기반 근사 검색
+- pq   : IVF + Product Quantization (벡터 압축)
+- sq   : 8비트 Scalar Quantization (메모리 1/4)
+
+ivf/pq 는 처음 학습한 벡터 수의 RETRAIN_GROWTH 배로 늘어날 때마다 전체 벡터로 다시 학습한다
+(기본 nlist 에 필요한 학습 벡터 수를 채운 뒤에는 더 이상 재학습하지 않음).
+
+    python faiss_index.py report --index-dir faiss_index --k 4
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import pickle
+import time
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_RETRAIN_GROWTH = float(os.getenv("FAISS_RETRAIN_GROWTH", "2"))  # ivf/pq 재학습 기준 (학습 벡터 수 대비 배수)
+PARAMS_FILE = "index_params.json"
+MIN_POINTS_PER_CENTROID = 39
+
+logger = logging.getLogger(__name__)
+
+# 인덱스 종류별 기본 빌드/검색 파라미터
+DEFAULT_PARAMS = {
+    "flat": {},
+    "ivf": {"nlist": 256, "nprobe": 16},
+    "hnsw": {"m": 32, "ef_construction": 80, "ef_search": 64},
+    "pq": {"nlist": 256, "nprobe": 16, "m": 64, "nbits": 8},
+    "sq": {"qtype": "SQ8"},
+}
+
+
+# 1. 인덱스 생성
+def _largest_divisor(d, upper):
+    for m in range(min(upper, d), 0, -1):
+        if d % m == 0:
+            return m
+    return 1
+
+
+def factory_string(index_type, d, n, params):
+    """인덱스 종류와 데이터 크기에 맞는 faiss.index_factory 문자열 생성"""
+    if index_type == "flat":
+        return "Flat"
+    if index_type in ("ivf", "pq"):
+        # 클러스터당 학습 벡터가 최소 39개는 되도록 nlist 조정
+        nlist = max(1, min(params["nlist"], n // MIN_POINTS_PER_CENTROID))
+        if index_type == "ivf":
+            return f"IVF{nlist},Flat"
+        m = _largest_divisor(d, params["m"])
+        # 코드북 학습에는 2^nbits 개 이상의 벡터가 필요하므로 데이터가 적으면 nbits 를 낮춘다
+        nbits = min(params["nbits"], int(math.log2(max(n, 1))))
+        if nbits < 1:
+            # 벡터가 1개면 PQ 를 학습할 수 없다 - 압축 없이 두고 벡터가 늘면 needs_retrain 으로 다시 학습
+            return f"IVF{nlist},Flat"
+        # np: polysemous 학습 생략 (polysemous 검색은 쓰지 않으며, 학습이 PQ 학습보다 수십 배 오래 걸린다)
+        return f"IVF{nlist},PQ{m}x{nbits}np"
+    if index_type == "hnsw":
+        return f"HNSW{params['m']}"
+    if index_type == "sq":
+        return params["qtype"]
+    raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type}")
+
+
+def apply_search_params(index, index_type, params):
+    """검색 파라미터(nprobe, efSearch)는 저장되지 않으므로 로드할 때마다 적용"""
+    space = faiss.ParameterSpace()
+    if index_type in ("ivf", "pq"):
+        space.set_index_parameter(index, "nprobe", params["nprobe"])
+    elif index_type == "hnsw":
+        space.set_index_parameter(index, "efSearch", params["ef_search"])
+
+
+def build_faiss_index(vectors, index_type=FAISS_INDEX_TYPE, params=None):
+    """
+    학습 벡터(vectors)로 빈 인덱스를 만들고 학습(train)까지 마친 뒤
+    (index, 실제 사용한 파라미터)를 반환한다. 벡터 추가는 호출하는 쪽에서 한다.
+    """
+    params = {**DEFAULT_PARAMS[index_type], **(params or {})}
+    x = np.asarray(vectors, dtype="float32")
+    n, d = x.shape
+    spec = factory_string(index_type, d, n, params)
+    index = faiss.index_factory(d, spec)
+    if index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = params["ef_construction"]
+    if not index.is_trained:
+        index.train(x)
+    apply_search_params(index, index_type, params)
+    return index, {**params, "index_type": index_type, "factory": spec, "dimension": d, "trained_on": n}
+
+
+def needs_retrain(params, ntotal):
+    """
+    ivf/pq 는 학습 당시 벡터 수로 nlist/nbits 가 정해진다.
+    작은 첫 문서로 학습한 인덱스가 계속 쓰이지 않도록, 벡터 수가 충분히 늘면 다시 학습한다.
+    """
+    if not params or params.get("index_type") not in ("ivf", "pq"):
+        return False
+    trained_on = params.get("trained_on", 0)
+    full = params.get("nlist", DEFAULT_PARAMS["ivf"]["nlist"]) * MIN_POINTS_PER_CENTROID
+    return trained_on < full and ntotal >= max(trained_on, 1) * FAISS_RETRAIN_GROWTH
+
+
+def new_vectorstore(embeddings, vectors, index_type=FAISS_INDEX_TYPE, params=None):
+    """학습된 빈 인덱스로 LangChain FAISS 벡터스토어를 만든다"""
+    index, used = build_faiss_index(vectors, index_type, params)
+    return FAISS(embeddings, index, InMemoryDocstore(), {}), used
+
+
+def copy_vectorstore(vectordb):
+    """
+    수정용 사본 (인덱스, docstore, 위치 → ID 매핑 복사).
+    원본은 검색 중인 체인이 계속 쓰므로 add/delete 는 사본에만 한다.
+    """
+    return FAISS(
+        vectordb.embedding_function,
+        faiss.clone_index(vectordb.index),
+        InMemoryDocstore(dict(vectordb.docstore._dict)),
+        dict(vectordb.index_to_docstore_id),
+    )
+
+
+# 2. 저장/로드
+def save_params(path, params):
+    with open(os.path.join(path, PARAMS_FILE), "w", encoding="utf-8") as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
+
+
+def load_params(path):
+    params_path = os.path.join(path, PARAMS_FILE)
+    if not os.path.exists(params_path):
+        return {"index_type": "flat"}
+    with open(params_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def mmap_flags(index_type):
+    """
+    (읽기 플래그, 프로세스 간 메모리 공유 여부)
+    - ivf/pq : IO_FLAG_MMAP 이 역색인 리스트(벡터 코드)를 메모리 맵으로 연다
+    - flat/sq: IndexFlatCodes 를 매핑하는 IO_FLAG_MMAP_IFC 가 있는 faiss 버전에서만 공유된다
+    - hnsw   : 그래프와 벡터를 프로세스마다 메모리로 읽는다
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    if index_type in ("ivf", "pq"):
+        return flags, True
+    ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if ifc is not None and index_type in ("flat", "sq"):
+        return flags | ifc, True
+    return flags, False
+
+
+def read_index(path, mmap=True, index_type="flat"):
+    """
+    index.faiss 를 가능하면 메모리 맵으로 읽는다. 여러 작업 프로세스가 같은 파일을 열면
+    OS 페이지 캐시를 공유하므로 프로세스마다 인덱스 복사본을 두지 않는다.
+    메모리 맵을 지원하지 않는 인덱스/버전이면 일반 로드로 대체한다.
+    """
+    filename = os.path.join(path, "index.faiss")
+    if mmap:
+        flags, shared = mmap_flags(index_type)
+        try:
+            index = faiss.read_index(filename, flags)
+            if not shared:
+                logger.info("%s 인덱스는 메모리 맵으로 공유되지 않아 프로세스마다 메모리에 읽습니다", index_type)
+            return index
+        except RuntimeError:
+            logger.info("%s 인덱스를 메모리 맵으로 열 수 없어 일반 로드로 대체합니다", index_type)
+    return faiss.read_index(filename)
+
+
+def load_vectorstore(path, embeddings, mmap=True):
+    """FAISS.load_local 과 같은 파일 구성을 읽되, 지원되는 인덱스는 메모리 맵으로 연다"""
+    params = load_params(path)
+    index = read_index(path, mmap=mmap, index_type=params["index_type"])
+    apply_search_params(index, params["index_type"], {**DEFAULT_PARAMS[params["index_type"]], **params})
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+# 3. 개별 삭제가 안전하지 않은 인덱스(HNSW, IVF 계열)용 재구성
+def supports_remove(index_type):
+    """
+    LangChain FAISS.delete 는 삭제 후 위치를 0..n-1 로 다시 매기므로,
+    remove_ids 가 남은 벡터를 앞으로 당기는 flat/sq 에서만 사용할 수 있다.
+    (IVF 계열은 저장된 id 를 그대로 두어 위치와 어긋나고, HNSW 는 삭제를 지원하지 않는다)
+    """
+    return index_type in ("flat", "sq")
+
+
+def reconstruct_all(index):
+    """인덱스에 저장된 벡터 전체를 복원 (IVF 계열은 direct map 이 필요)"""
+    try:
+        faiss.extract_index_ivf(index).make_direct_map()
+    except RuntimeError:
+        pass  # IVF 가 아닌 인덱스
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def rebuild_without(vectordb, ids, index_type, params, embed=None):
+    """
+    ids 를 제외한 나머지 벡터로 같은 종류의 인덱스를 다시 만들고(재학습 포함)
+    (벡터스토어, 사용한 파라미터)를 반환한다. 남는 벡터가 없으면 (None, params).
+    embed(texts) 를 주면 인덱스에서 복원하는 대신 원본 벡터를 다시 얻는다
+    (PQ/SQ 는 복원값이 근사치이므로 임베딩 캐시에서 받는 편이 정확하다).
+    """
+    remove = set(ids)
+    keep = [(pos, doc_id) for pos, doc_id in sorted(vectordb.index_to_docstore_id.items()) if doc_id not in remove]
+    if not keep:
+        return None, params
+    docs = {doc_id: vectordb.docstore.search(doc_id) for _, doc_id in keep}
+    if embed is not None:
+        vectors = np.asarray(embed([docs[doc_id].page_content for _, doc_id in keep]), dtype="float32")
+    else:
+        vectors = reconstruct_all(vectordb.index)[[pos for pos, _ in keep]]
+    index, used = build_faiss_index(vectors, index_type, params)
+    index.add(vectors)
+    mapping = {i: doc_id for i, (_, doc_id) in enumerate(keep)}
+    return FAISS(vectordb.embedding_function, index, InMemoryDocstore(docs), mapping), used
+
+
+# 4. 정확도(recall) - 지연시간 비교 리포트
+def recall_report(vectors, queries, k=4, index_types=("flat", "ivf", "hnsw", "pq", "sq"), params=None):
+    """
+    같은 벡터로 인덱스 종류별로 만들어 flat(정답) 대비 recall@k 와 질의당 검색 시간을 비교한다.
+    """
+    x = np.asarray(vectors, dtype="float32")
+    q = np.asarray(queries, dtype="float32")
+    baseline = faiss.IndexFlatL2(x.shape[1])
+    baseline.add(x)
+    _, truth = baseline.search(q, k)
+
+    rows = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index, used = build_faiss_index(x, index_type, (params or {}).get(index_type))
+        index.add(x)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, found = index.search(q, k)
+        search_seconds = time.perf_counter() - start
+
+        hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+        rows.append({
+            "index_type": index_type,
+            "factory": used["factory"],
+            "recall_at_k": hits / (len(q) * k),
+            "latency_ms": search_seconds / len(q) * 1000,
+            "build_seconds": build_seconds,
+            "bytes": faiss.serialize_index(index).nbytes,
+        })
+    return rows
+
+
+def _report_main(args):
+    from doc_registry import current_index_path
+
+    path = current_index_path(args.index_dir)
+    vectors = reconstruct_all(read_index(path, mmap=False))
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    # 저장된 벡터에 약간의 잡음을 더해 질의로 사용
+    queries = vectors[picks] + rng.normal(0, 0.01, size=vectors[picks].shape).astype("float32")
+
+    rows = recall_report(vectors, queries, k=args.k)
+    print(f"{'type':<6} {'factory':<18} {'recall@k':>9} {'ms/query':>9} {'build s':>8} {'MB':>8}")
+    for r in rows:
+        print(
+            f"{r['index_type']:<6} {r['factory']:<18} {r['recall_at_k']:>9.3f} "
+            f"{r['latency_ms']:>9.3f} {r['build_seconds']:>8.2f} {r['bytes'] / 1024 / 1024:>8.2f}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="flat 기준 recall/지연시간 비교")
+    report.add_argument("--index-dir", default="faiss_index")
+    report.add_argument("--k", type=int, default=4)
+    report.add_argument("--queries", type=int, default=200)
+    report.add_argument("--output", default="")
+    _report_main(parser.parse_args())
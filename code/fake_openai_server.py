@@ -0,0 +1,230 @@
+"""
+OpenAI 호환 가짜(stub) 서버 - 오프라인 테스트/벤치마크용
+
+실제 API 대신 이 서버에 요청을 보내면 비용 없이 임베딩 파이프라인과 채팅 호출을 시험할 수 있다.
+    python fake_openai_server.py --port 8009 --latency 0.2 --max-rps 5
+
+    embeddings = OpenAIEmbeddings(openai_api_base="http://127.0.0.1:8009/v1", openai_api_key="fake")
+    OPENAI_BASE_URL=http://127.0.0.1:8009/v1 streamlit run app_adv.py   # clients.py 가 이 주소를 사용
+
+지원 경로: /v1/embeddings, /v1/chat/completions (stream=true 면 SSE 로 토큰 단위 전송)
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIConfig:
+    def __init__(
+        self,
+        latency=0.05,
+        max_rps=0,
+        error_rate=0.0,
+        dimensions=1536,
+        answer_tokens=50,
+        tokens_per_second=0,
+    ):
+        self.latency = latency        # 요청당 지연 시간(초) - 채팅 응답에서는 첫 토큰까지의 시간
+        self.max_rps = max_rps        # 초당 최대 요청 수 (넘으면 429 응답, 0이면 제한 없음)
+        self.error_rate = error_rate  # 무작위 500 오류 비율
+        self.dimensions = dimensions  # 임베딩 차원
+        self.answer_tokens = answer_tokens            # 채팅 답변 토큰 수
+        self.tokens_per_second = tokens_per_second    # 채팅 토큰 생성 속도 (0이면 지연 없음)
+        self.requests = 0
+        self.rejected = 0
+        self._window = []
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """초당 요청 수 제한 확인 (슬라이딩 윈도우 1초)"""
+        with self._lock:
+            self.requests += 1
+            if not self.max_rps:
+                return True
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.max_rps:
+                self.rejected += 1
+                return False
+            self._window.append(now)
+            return True
+
+
+def fake_vector(item, dimensions):
+    """입력(문자열 또는 토큰 배열)에서 결정적인 단위 벡터 생성"""
+    seed = hashlib.sha256(json.dumps(item, ensure_ascii=False).encode("utf-8")).digest()
+    rng = random.Random(seed)
+    values = [rng.uniform(-1, 1) for _ in range(dimensions)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+def fake_answer_tokens(question, count):
+    """질문에서 결정적인 가짜 답변 토큰 목록 생성 (토큰마다 앞에 공백 포함)"""
+    words = question.split() or ["응답"]
+    return [f" {words[i % len(words)]}" for i in range(count)]
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # 요청 로그 생략
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_POST(self):
+            payload = self._read_json()
+            if not config.admit():
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached", "type": "requests"}},
+                    {"Retry-After": "1"},
+                )
+                return
+            time.sleep(config.latency)
+            if config.error_rate and random.random() < config.error_rate:
+                self._send_json(500, {"error": {"message": "Internal error", "type": "server_error"}})
+                return
+
+            path = self.path.rstrip("/")
+            if path.endswith("/embeddings"):
+                self._handle_embeddings(payload)
+            elif path.endswith("/chat/completions"):
+                self._handle_chat(payload)
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def _handle_embeddings(self, payload):
+            inputs = payload.get("input", [])
+            # 단일 문자열 또는 단일 토큰 배열도 허용
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            dimensions = payload.get("dimensions") or config.dimensions
+            data = [
+                {"object": "embedding", "index": i, "embedding": fake_vector(item, dimensions)}
+                for i, item in enumerate(inputs)
+            ]
+            tokens = sum(len(item) if isinstance(item, list) else len(item.split()) for item in inputs)
+            self._send_json(200, {
+                "object": "list",
+                "data": data,
+                "model": payload.get("model", "fake-embedding"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+        def _handle_chat(self, payload):
+            model = payload.get("model", "fake-chat")
+            question = ""
+            for message in payload.get("messages", []):
+                if message.get("role") == "user":
+                    question = str(message.get("content", ""))
+            tokens = fake_answer_tokens(question, config.answer_tokens)
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in payload.get("messages", []))
+            created = int(time.time())
+            if payload.get("stream"):
+                self._stream_chat(model, created, tokens)
+                return
+            if config.tokens_per_second:
+                time.sleep(len(tokens) / config.tokens_per_second)
+            self._send_json(200, {
+                "id": f"chatcmpl-fake-{created}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens),
+                },
+            })
+
+        def _stream_chat(self, model, created, tokens):
+            """OpenAI 스트리밍 형식(SSE, chunked)으로 토큰을 하나씩 전송"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(data):
+                body = f"data: {data}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(body):X}\r\n".encode("ascii") + body + b"\r\n")
+                self.wfile.flush()
+
+            def chunk(delta, finish_reason=None):
+                return json.dumps({
+                    "id": f"chatcmpl-fake-{created}",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }, ensure_ascii=False)
+
+            send(chunk({"role": "assistant", "content": ""}))
+            for token in tokens:
+                if config.tokens_per_second:
+                    time.sleep(1.0 / config.tokens_per_second)
+                send(chunk({"content": token}))
+            send(chunk({}, "stop"))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """백그라운드 스레드로 서버를 띄우고 (server, base_url) 반환 (port=0 이면 빈 포트 자동 선택)"""
+    config = config or FakeOpenAIConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI 호환 가짜 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-rps", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--answer-tokens", type=int, default=50)
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(
+        args.latency, args.max_rps, args.error_rate, args.dimensions,
+        args.answer_tokens, args.tokens_per_second,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Fake OpenAI server: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,84 @@
+import os
+
+from tokenizer import encoding_for
+
+# 대화 기록에 쓸 최대 토큰 수 (시스템 프롬프트/요약 제외)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+# 예산을 넘으면 최근 대화를 예산의 이 비율까지만 남기고 나머지를 요약 (매 턴 요약하지 않도록 여유를 둠)
+HISTORY_KEEP_RATIO = 0.6
+MESSAGE_OVERHEAD = 4  # 메시지 하나당 role/구분자에 쓰이는 토큰 (OpenAI 채팅 형식 기준 근사값)
+
+
+def count_message_tokens(content, model="gpt-4o-mini"):
+    return len(encoding_for(model).encode(content, disallowed_special=())) + MESSAGE_OVERHEAD
+
+
+class HistoryManager:
+    """
+    토큰 예산 기반 대화 기록 관리자.
+    - 메시지별 토큰 수를 한 번만 계산해 저장 (매 턴 전체를 다시 세지 않음)
+    - 최근 대화는 예산 안에서 그대로 보내고, 예산을 넘는 오래된 대화는 요약으로 합친다.
+    summarize_fn(이전 요약, 요약할 메시지 목록) -> 새 요약 문자열
+    """
+
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, summarize_fn=None, model="gpt-4o-mini"):
+        self.budget = budget
+        self.summarize_fn = summarize_fn
+        self.model = model
+        self.summary = ""
+        self.summarized_upto = 0   # 이 인덱스 이전 메시지는 요약에 반영됨
+        self._counts = []          # messages 와 같은 순서의 토큰 수 캐시
+        self._summary_tokens = 0
+        self._system_cache = (None, 0)
+
+    def reset(self):
+        self.summary = ""
+        self.summarized_upto = 0
+        self._counts = []
+        self._summary_tokens = 0
+
+    def _sync_counts(self, messages):
+        # 대화가 초기화되었거나 줄어들었으면 처음부터 다시 센다
+        if len(messages) < len(self._counts):
+            self.reset()
+        for message in messages[len(self._counts):]:
+            self._counts.append(count_message_tokens(message["content"], self.model))
+
+    def _system_tokens(self, system_prompt):
+        if self._system_cache[0] != system_prompt:
+            self._system_cache = (system_prompt, count_message_tokens(system_prompt, self.model))
+        return self._system_cache[1]
+
+    def _window_start(self, end, budget):
+        """끝에서부터 budget 안에 들어가는 첫 메시지 인덱스 (마지막 메시지는 항상 포함)"""
+        used, start = 0, end
+        while start > self.summarized_upto:
+            if used + self._counts[start - 1] > budget and start < end:
+                break
+            used += self._counts[start - 1]
+            start -= 1
+        return start
+
+    def build(self, system_prompt, messages):
+        """
+        API 에 보낼 메시지 목록과 예상 프롬프트 토큰 수를 반환한다.
+        [시스템 프롬프트] + [이전 대화 요약(있으면)] + [예산 안의 최근 대화]
+        """
+        self._sync_counts(messages)
+        end = len(messages)
+        start = self._window_start(end, self.budget)
+
+        if start > self.summarized_upto and self.summarize_fn is not None:
+            # 예산 초과: 최근 대화를 더 줄여서 남기고 나머지를 요약에 합친다
+            start = self._window_start(end, int(self.budget * HISTORY_KEEP_RATIO))
+            self.summary = self.summarize_fn(self.summary, messages[self.summarized_upto:start])
+            self.summarized_upto = start
+            self._summary_tokens = count_message_tokens(self.summary, self.model) if self.summary else 0
+
+        api_messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            api_messages.append({"role": "system", "content": f"[이전 대화 요약]\n{self.summary}"})
+        api_messages.extend({"role": m["role"], "content": m["content"]} for m in messages[start:])
+
+        prompt_tokens = self._system_tokens(system_prompt) + self._summary_tokens + sum(self._counts[start:])
+        return api_messages, prompt_tokens
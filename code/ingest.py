@@ -0,0 +1,238 @@
+"""
+문서 수집(ingestion) 모듈
+- 업로드된 파일을 작업 폴더에 저장하지 않고 메모리 버퍼에서 바로 파싱
+- 페이지/청크를 제너레이터로 하나씩 내보내 큰 PDF 에서도 메모리 사용량을 제한
+- 큰 PDF 는 세션별 임시 파일(메모리 맵)로 한 번만 옮긴 뒤 페이지 범위를 프로세스 풀로 병렬 파싱
+
+    python ingest.py ../data/Samsung_Card_Manual_Korean_1.3.pdf --workers 4 --check
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_community.document_loaders.parsers import PyPDFParser
+from langchain_core.documents import Document
+from langchain_core.documents.base import Blob
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+# 청크 설정 (기존 인덱스와 같은 결과가 나오도록 rag_chatbot 과 동일한 값 사용)
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+# 병렬 처리 설정
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "8"))
+
+
+def make_splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+# 1. 기존(직렬) 방식: PyPDFLoader 로 전체 로드 후 분할 (결과 비교용)
+def load_and_split_serial(path):
+    if path.endswith(".pdf"):
+        documents = PyPDFLoader(path).load()
+    else:
+        documents = TextLoader(path, encoding="utf-8").load()
+    return make_splitter().split_documents(documents)
+
+
+# 2. 메모리 버퍼에서 페이지/청크를 하나씩 읽는 제너레이터
+def iter_pdf_pages(data, name):
+    """PyPDFLoader 와 같은 파서(PyPDFParser)로 메모리 버퍼의 PDF 를 페이지 단위로 읽는다"""
+    yield from PyPDFParser().lazy_parse(Blob.from_data(data, path=name))
+
+
+def iter_text_docs(data, name):
+    """TextLoader 와 같은 형식의 Document 하나를 만든다"""
+    yield Document(page_content=data.decode("utf-8"), metadata={"source": name})
+
+
+def iter_chunks(docs):
+    """
+    문서를 하나씩 받아 바로 분할해서 내보낸다.
+    split_documents 는 문서(페이지)마다 독립적으로 분할하므로 전체를 모아서 분할한 결과와 같다.
+    """
+    splitter = make_splitter()
+    for doc in docs:
+        yield from splitter.split_documents([doc])
+
+
+# 3. 세션별 임시 파일 (병렬 파싱용)
+@contextmanager
+def spooled_upload(data, name, tmp_dir=None):
+    """
+    업로드 데이터를 세션 임시 폴더의 고유한 파일에 한 번만 기록하고 경로를 돌려준다.
+    같은 파일 이름을 여러 사용자가 올려도 서로 덮어쓰지 않으며, 사용 후 바로 삭제된다.
+    """
+    suffix = os.path.splitext(name)[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        yield path
+    finally:
+        os.remove(path)
+
+
+@contextmanager
+def _open_mmap_reader(path):
+    """임시 파일을 메모리 맵으로 열어 PdfReader 생성 (작업 프로세스끼리 페이지 캐시를 공유), 끝나면 닫는다"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PdfReader(mapped)
+
+
+# 4. 작업 프로세스에서 실행되는 함수: 페이지 범위 파싱 + 분할
+def _parse_page_range(path, start, end, base_metadata, with_label):
+    """
+    PyPDFParser 와 같은 방식(page.extract_text)으로 페이지 텍스트를 추출하고
+    페이지 단위로 분할한다.
+    """
+    t0 = time.perf_counter()
+    pages = []
+    with _open_mmap_reader(path) as reader:
+        for number in range(start, end):
+            metadata = dict(base_metadata, page=number)
+            if with_label:
+                metadata["page_label"] = reader.page_labels[number]
+            pages.append(Document(page_content=reader.pages[number].extract_text().strip(), metadata=metadata))
+    t1 = time.perf_counter()
+    chunks = make_splitter().split_documents(pages)
+    t2 = time.perf_counter()
+    return chunks, t1 - t0, t2 - t1
+
+
+def iter_pdf_chunks(path, name, workers=INGEST_WORKERS, pages_per_task=PAGES_PER_TASK, stats=None):
+    """
+    PDF 파일을 페이지 범위(pages_per_task 단위)로 나눠 프로세스 풀에서 파싱/분할하고,
+    결과 청크를 페이지 순서대로 yield 한다. (metadata 의 source 는 name 으로 기록)
+    """
+    stats = stats if stats is not None else {}
+    t0 = time.perf_counter()
+
+    # 첫 페이지는 PyPDFParser 로 직접 읽어 문서 메타데이터 형식을 그대로 가져온다
+    with _open_mmap_reader(path) as reader:
+        total_pages = len(reader.pages)
+    first = next(PyPDFParser().lazy_parse(Blob.from_path(path, metadata={"source": name})), None)
+    stats["open"] = stats.get("open", 0.0) + time.perf_counter() - t0
+    if first is None:
+        return
+    with_label = "page_label" in first.metadata
+    base_metadata = {k: v for k, v in first.metadata.items() if k not in ("page", "page_label")}
+
+    t0 = time.perf_counter()
+    first_chunks = make_splitter().split_documents([first])
+    stats["split"] = stats.get("split", 0.0) + time.perf_counter() - t0
+    stats["pages"] = stats.get("pages", 0) + 1
+    stats["chunks"] = stats.get("chunks", 0) + len(first_chunks)
+    yield from first_chunks
+
+    ranges = [(s, min(s + pages_per_task, total_pages)) for s in range(1, total_pages, pages_per_task)]
+    if len(ranges) <= 1:
+        # 작업이 하나뿐이면 프로세스를 띄우지 않고 여기서 바로 파싱
+        for s, e in ranges:
+            chunks, parse_time, split_time = _parse_page_range(path, s, e, base_metadata, with_label)
+            stats["parse"] = stats.get("parse", 0.0) + parse_time
+            stats["split"] += split_time
+            stats["pages"] += e - s
+            stats["chunks"] += len(chunks)
+            yield from chunks
+        return
+    # 이 프로세스에는 이미 스레드(비동기 루프, 세션 저장 스레드 등)가 돌고 있어
+    # fork 하면 잠긴 락이 복제될 수 있으므로 spawn 으로 새 인터프리터를 띄운다
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(workers, len(ranges))), mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+        # map 은 제출 순서대로 결과를 돌려주므로 페이지 순서가 유지된다
+        results = pool.map(
+            _parse_page_range,
+            [path] * len(ranges),
+            [s for s, _ in ranges],
+            [e for _, e in ranges],
+            [base_metadata] * len(ranges),
+            [with_label] * len(ranges),
+        )
+        for (s, e), (chunks, parse_time, split_time) in zip(ranges, results):
+            stats["parse"] = stats.get("parse", 0.0) + parse_time
+            stats["split"] += split_time
+            stats["pages"] += e - s
+            stats["chunks"] += len(chunks)
+            yield from chunks
+
+
+# 5. 업로드 수집 진입점
+def iter_upload_chunks(data, name, workers=INGEST_WORKERS, tmp_dir=None, stats=None):
+    """
+    업로드된 파일의 바이트(data)를 파싱/분할해 청크를 하나씩 yield 한다.
+    - TXT, PDF (workers == 1): 메모리 버퍼에서 페이지 단위로 바로 스트리밍
+    - PDF (workers > 1): 세션 임시 파일(tmp_dir)로 옮겨 메모리 맵으로 열고, 그 리더로 센 페이지 수가
+      PAGES_PER_TASK 를 넘으면 페이지 범위를 병렬 파싱 (PDF 를 페이지 수 때문에 두 번 파싱하지 않음)
+    stats(dict)를 넘기면 단계별 소요 시간이 기록된다.
+        open: 파일 열기/메타데이터, parse: 텍스트 추출, split: 청크 분할, total: 전체 경과 시간
+    """
+    stats = stats if stats is not None else {}
+    stats.update({"open": 0.0, "parse": 0.0, "split": 0.0, "total": 0.0, "pages": 0, "chunks": 0})
+    start = time.perf_counter()
+
+    if name.endswith(".pdf"):
+        if workers > 1:
+            with spooled_upload(data, name, tmp_dir) as path:
+                yield from iter_pdf_chunks(path, name, workers=workers, stats=stats)
+            stats["total"] = time.perf_counter() - start
+            return
+        docs = iter_pdf_pages(data, name)
+    else:
+        docs = iter_text_docs(data, name)
+
+    # 직렬 스트리밍: 페이지를 하나 읽고 바로 분할
+    splitter = make_splitter()
+    while True:
+        t0 = time.perf_counter()
+        doc = next(docs, None)
+        stats["parse"] += time.perf_counter() - t0
+        if doc is None:
+            break
+        t0 = time.perf_counter()
+        chunks = splitter.split_documents([doc])
+        stats["split"] += time.perf_counter() - t0
+        stats["pages"] += 1
+        stats["chunks"] += len(chunks)
+        yield from chunks
+    stats["total"] = time.perf_counter() - start
+
+
+# 6. 직렬/스트리밍 결과 비교 (기존 인덱스 호환성 확인용)
+def check_parity(path, workers=INGEST_WORKERS):
+    serial = load_and_split_serial(path)
+    with open(path, "rb") as f:
+        streamed = list(iter_upload_chunks(f.read(), path, workers=workers))
+    if len(serial) != len(streamed):
+        return False
+    return all(
+        a.page_content == b.page_content and a.metadata.get("page") == b.metadata.get("page")
+        for a, b in zip(serial, streamed)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="문서 수집 (스트리밍/병렬)")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--check", action="store_true", help="직렬 방식과 결과가 같은지 확인")
+    args = parser.parse_args()
+
+    stats = {}
+    with open(args.path, "rb") as f:
+        chunks = list(iter_upload_chunks(f.read(), args.path, workers=args.workers, stats=stats))
+    print(f"청크 {len(chunks)}개")
+    for stage, value in stats.items():
+        print(f"  {stage}: {value:.3f}s" if isinstance(value, float) else f"  {stage}: {value}")
+    if args.check:
+        print("직렬 결과와 동일:", check_parity(args.path, workers=args.workers))
@@ -0,0 +1,174 @@
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+LEXICAL_FILE = "lexical.json"
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))  # 각 검색기에서 가져올 후보 수
+RRF_K = 60                                              # Reciprocal Rank Fusion 상수
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_HANGUL = re.compile(r"[가-힣]")
+
+
+# 1. 한국어 토큰화 (형태소 분석기 없이 문자 n-gram 사용)
+def tokenize(text):
+    """
+    - 단어(공백/기호 기준)는 그대로 하나의 토큰으로 사용 (카드 상품명, 수수료 코드 등 정확 일치)
+    - 한글이 들어간 단어는 문자 2-gram 도 추가 ("연회비는" → 연회, 회비, 비는)
+      조사가 붙어도 어간 부분이 일치하므로 형태소 분석 없이도 검색된다.
+    """
+    text = unicodedata.normalize("NFC", text).lower()
+    tokens = []
+    for word in _WORD.findall(text):
+        tokens.append(word)
+        if len(word) > 2 and _HANGUL.search(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+# 2. BM25 역색인
+class LexicalIndex:
+    """
+    청크 ID → 토큰 빈도를 보관하는 BM25 역색인.
+    청크 단위로 추가/삭제할 수 있어 FAISS 인덱스와 함께 증분 갱신된다.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = {}                 # chunk_id → {term: tf}
+        self.postings = defaultdict(dict)   # term → {chunk_id: tf}
+        self.doc_length = {}                # chunk_id → 토큰 수
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, chunk_id, text):
+        if chunk_id in self.doc_terms:
+            self.remove(chunk_id)
+        terms = Counter(tokenize(text))
+        self.doc_terms[chunk_id] = dict(terms)
+        for term, tf in terms.items():
+            self.postings[term][chunk_id] = tf
+        self.doc_length[chunk_id] = sum(terms.values())
+        self.total_length += self.doc_length[chunk_id]
+
+    def remove(self, chunk_id):
+        terms = self.doc_terms.pop(chunk_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.doc_length.pop(chunk_id)
+
+    def search(self, query, k=HYBRID_FETCH_K):
+        """BM25 점수 상위 k 개의 (chunk_id, score) 목록"""
+        n = len(self.doc_terms)
+        if n == 0:
+            return []
+        avg_len = self.total_length / n
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, tf in posting.items():
+                length = self.doc_length[chunk_id]
+                denom = tf + self.k1 * (1 - self.b + self.b * length / avg_len)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / denom
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def copy(self):
+        """수정용 사본 (postings 의 청크 목록은 제자리에서 바뀌므로 함께 복사)"""
+        index = type(self)(self.k1, self.b)
+        index.doc_terms = dict(self.doc_terms)
+        index.postings = defaultdict(dict, {term: dict(posting) for term, posting in self.postings.items()})
+        index.doc_length = dict(self.doc_length)
+        index.total_length = self.total_length
+        return index
+
+    # 저장/로드 (FAISS 인덱스와 같은 버전 폴더에 저장)
+    def save(self, path):
+        with open(os.path.join(path, LEXICAL_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_terms": self.doc_terms}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, LEXICAL_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        for chunk_id, terms in data["doc_terms"].items():
+            index.doc_terms[chunk_id] = terms
+            for term, tf in terms.items():
+                index.postings[term][chunk_id] = tf
+            index.doc_length[chunk_id] = sum(terms.values())
+            index.total_length += index.doc_length[chunk_id]
+        return index
+
+    @classmethod
+    def from_vectorstore(cls, vectordb):
+        """lexical.json 이 없는 이전 인덱스용: FAISS docstore 의 청크로 새로 만든다"""
+        index = cls()
+        for chunk_id in vectordb.index_to_docstore_id.values():
+            doc = vectordb.docstore.search(chunk_id)
+            if isinstance(doc, Document):
+                index.add(chunk_id, doc.page_content)
+        return index
+
+
+# 3. 벡터 + BM25 결합 검색기
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """여러 순위 목록을 RRF 점수(Σ 1/(k + 순위))로 합친다"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    FAISS(의미 검색)와 BM25(단어 검색) 결과를 RRF 로 합쳐 상위 k 개 청크를 반환한다.
+    상품명·조항 번호처럼 정확한 단어가 중요한 질문도 같은 k 안에 들어오게 한다.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectordb: object
+    lexical: LexicalIndex
+    k: int = 4
+    fetch_k: int = HYBRID_FETCH_K
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        dense = self.vectordb.similarity_search(query, k=self.fetch_k)
+        docs = {}
+        dense_ranking = []
+        for doc in dense:
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            docs[key] = doc
+            dense_ranking.append(key)
+
+        lexical_ranking = []
+        for chunk_id, _ in self.lexical.search(query, k=self.fetch_k):
+            doc = self.vectordb.docstore.search(chunk_id)
+            if not isinstance(doc, Document):
+                continue
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            docs.setdefault(key, doc)
+            lexical_ranking.append(key)
+
+        fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking])
+        return [docs[key] for key in fused[:self.k]]
@@ -1,18 +1,19 @@
-import os
 import streamlit as st
 from dotenv import load_dotenv
-from datetime import datetime
-from langchain_openai import ChatOpenAI
-from langchain_classic.memory import ConversationBufferMemory
-from langchain_core.prompts  import PromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from memory_core import (
+    ask,
+    get_session_store,
+    get_summary_worker,
+    load_summary,
+    record_turn,
+)
+from request_scheduler import SchedulerBusy, get_scheduler
 
 # 환경 변수 로드 (.env 파일에서 OPENAI_API_KEY 불러옴)
 load_dotenv(".env")
 
-# 요약 저장 디렉토리 생성
-SUMMARY_DIR = "summaries"
-os.makedirs(SUMMARY_DIR, exist_ok=True)
+# 세션 저장소, 장기기억, 체인, 요약 작업자는 memory_core.py 에 있다
+# (HTTP 서버 server.py 와 같은 코드를 사용하고, 이 파일은 화면만 담당)
 
 # Streamlit UI 설정
 st.set_page_config(page_title="요약 기반 기억 챗봇")
@@ -20,55 +21,12 @@ st.title("요약 기반 기억 챗봇")
 
 # 사용자 식별자(thread_id)
 thread_id = st.text_input("사용자 ID를 입력하세요:", value="default_user")
-summary_path = os.path.join(SUMMARY_DIR, f"{thread_id}.txt")
 
+store = get_session_store()
 # 이전 요약 불러오기 (없으면 빈 문자열)
-if os.path.exists(summary_path):
-    with open(summary_path, "r", encoding="utf-8") as f:
-        longterm_summary = f.read().strip()
-else:
-    longterm_summary = ""
-
-# ConversationBufferMemory를 전역 변수처럼 한 번만 생성
-try:
-    memory
-except NameError:
-    memory = ConversationBufferMemory(memory_key="history", return_messages=True)
-
-# LLM 초기화
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-# LCEL 기반 프롬프트
-main_prompt = PromptTemplate.from_template(
-    """
-    너는 사용자의 과거 요약 기억과 최근 대화를 참고해 대화하는 AI야.
-
-    [이전 요약된 기억]
-    {longterm_summary}
-
-    [최근 대화]
-    {history}
-
-    [사용자 질문]
-    {input}
-
-    위 내용을 참고해서 자연스럽고 일관된 답변을 해줘.
-    """
-)
-
-# LCEL 체인 (Runnable 구성)
-def get_chain(memory_obj, longterm_summary):
-    return (
-        {
-            "input": RunnablePassthrough(),
-            "history": RunnableLambda(lambda x: memory_obj.load_memory_variables({}).get("history", "")),
-            "longterm_summary": RunnableLambda(lambda x: longterm_summary)
-        }
-        | main_prompt
-        | llm
-    )
-
-conversation_chain = get_chain(memory, longterm_summary)
+longterm_summary = load_summary(thread_id)
+summary_worker = get_summary_worker()
+scheduler = get_scheduler()
 
 # 사용자 질문 입력 (엔터로 제출 가능)
 question = st.text_input("질문을 입력하세요:")
@@ -78,56 +36,35 @@ submit_button = st.button("답변 생성")
 
 if submit_button and question.strip() != "":
     with st.spinner("답변 생성 중..."):
-        result = conversation_chain.invoke(question)
-        answer = result.content
+        # 같은 사용자의 같은 질문이 이미 처리 중이면(버튼 연타, 재실행) 그 결과를 함께 받는다
+        try:
+            answer = ask(thread_id, question)
+        except SchedulerBusy as e:
+            st.warning(str(e))
+            st.stop()
         st.write("### 답변:")
         st.write(answer)
 
-        # 메모리에 대화 저장
-        memory.save_context({"input": question}, {"output": answer})
-
-        # ------------------------------
-        # 요약 업데이트
-        # ------------------------------
-        summarizer_prompt = PromptTemplate.from_template(
-            """
-            다음은 최근 대화 내용이야.
-            이를 참고해 전체 요약을 갱신해줘.
-
-            [이전 요약]
-            {old_summary}
-
-            [새로운 대화]
-            {recent_chat}
-
-            새로운 통합 요약:
-            """
-        )
-
-        recent_chat = ""
-        for msg in memory.chat_memory.messages[-6:]:
-            role = "사용자" if msg.type == "human" else "AI"
-            recent_chat += f"{role}: {msg.content}\n"
-
-        summary_input = summarizer_prompt.format(
-            old_summary=longterm_summary or "이전 요약 없음",
-            recent_chat=recent_chat
-        )
-
-        summary_result = llm.invoke(summary_input)
-        new_summary = summary_result.content.strip()
-
-        with open(summary_path, "w", encoding="utf-8") as f:
-            f.write(new_summary)
+        # 대화 저장 + 요약 갱신 예약 + 장기기억 추가 (모두 백그라운드로 처리)
+        record_turn(thread_id, question, answer)
 
         st.write("---")
         st.write("**요약된 기억(장기기억):**")
-        st.write(new_summary)
+        st.write(longterm_summary or "아직 요약된 기억이 없습니다.")
+        pending = summary_worker.pending_turns(thread_id)
+        if pending:
+            st.caption(f"요약 대기 중인 대화 {pending}턴 (백그라운드에서 반영됩니다)")
+        sched = scheduler.stats()
+        st.caption(
+            f"대기열 {sched['queue_depth']} · 실행 중 {sched['running']} · "
+            f"대기 p95 {sched['wait_p95']:.2f}s · 합쳐진 요청 {sched['coalesced']}"
+        )
 
 # 최근 대화 출력
-if memory.chat_memory.messages:
+recent_messages = store.get_messages(thread_id, limit=10)
+if recent_messages:
     st.write("---")
     st.write("**최근 대화 기록:**")
-    for msg in memory.chat_memory.messages[-10:]:
-        role = "사용자" if msg.type == "human" else "AI"
-        st.write(f"{role}: {msg.content}")
+    for msg_type, content in recent_messages:
+        role = "사용자" if msg_type == "human" else "AI"
+        st.write(f"{role}: {content}")
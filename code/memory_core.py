@@ -0,0 +1,169 @@
+"""
+요약 기반 기억 챗봇 파이프라인 (Streamlit 화면 memory.py 와 HTTP 서버 server.py 가 함께 사용)
+"""
+import os
+
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from clients import get_chat_model, get_embeddings, shared
+from episodic_memory import EpisodicMemory
+from request_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, get_scheduler
+from session_store import SQLiteSessionStore
+from summary_worker import SummaryWorker
+
+# 이전 버전의 요약 파일 폴더 (세션 저장소에 요약이 없을 때 한 번 가져온다)
+SUMMARY_DIR = "summaries"
+# 프롬프트에 넣을 최근 대화 메시지 수
+RECENT_MESSAGES = 10
+MEMORY_MODEL = "gpt-4o-mini"
+
+
+# 1. 프로세스 공유 리소스
+def get_session_store():
+    """세션 저장소 (SQLite, 프로세스당 하나를 모든 사용자가 공유하되 thread_id 로 분리)"""
+    return shared("memory_store", SQLiteSessionStore)
+
+
+def get_episodic_memory():
+    """사용자별 장기기억 벡터 인덱스 (대화 턴과 요약을 임베딩해 관련된 것만 검색)"""
+    return shared("memory_episodic", lambda: EpisodicMemory(get_embeddings()))
+
+
+def get_llm():
+    """LLM (프로세스 공유 객체라 재실행/요청마다 연결을 새로 맺지 않음)"""
+    return get_chat_model(MEMORY_MODEL, temperature=0)
+
+
+def get_summary_worker():
+    """요약 작업자는 프로세스당 하나만 띄운다"""
+    return shared("memory_summary_worker", lambda: SummaryWorker(summarize_turns, load_summary, save_summary))
+
+
+# 2. 요약 읽기/쓰기 함수
+def load_summary(thread_id):
+    store = get_session_store()
+    summary = store.get_summary(thread_id)
+    if not summary:
+        # 이전 버전의 요약 파일이 있으면 저장소로 옮긴다
+        path = os.path.join(SUMMARY_DIR, f"{thread_id}.txt")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                summary = f.read().strip()
+            store.set_summary(thread_id, summary)
+    return summary
+
+
+def save_summary(thread_id, summary):
+    get_session_store().set_summary(thread_id, summary)
+    get_episodic_memory().add_async(thread_id, summary, kind="summary")
+
+
+def format_history(thread_id):
+    """저장소의 최근 대화를 프롬프트용 문자열로 변환"""
+    lines = []
+    for role, content in get_session_store().get_messages(thread_id, limit=RECENT_MESSAGES):
+        lines.append(f"{'사용자' if role == 'human' else 'AI'}: {content}")
+    return "\n".join(lines)
+
+
+# 3. LCEL 기반 프롬프트와 체인
+main_prompt = PromptTemplate.from_template(
+    """
+    너는 사용자의 과거 요약 기억과 최근 대화를 참고해 대화하는 AI야.
+
+    [관련된 이전 기억]
+    {memories}
+
+    [최근 대화]
+    {history}
+
+    [사용자 질문]
+    {input}
+
+    위 내용을 참고해서 자연스럽고 일관된 답변을 해줘.
+    """
+)
+
+
+def get_chain(thread_id):
+    episodic = get_episodic_memory()
+    return (
+        {
+            "input": RunnablePassthrough(),
+            "history": RunnableLambda(lambda x: format_history(thread_id)),
+            # 요약 전체 대신 질문과 관련된 기억만 토큰 예산 안에서 검색
+            "memories": RunnableLambda(lambda x: episodic.format(thread_id, x))
+        }
+        | main_prompt
+        | get_llm()
+    )
+
+
+# 4. 요약 업데이트 (백그라운드)
+summarizer_prompt = PromptTemplate.from_template(
+    """
+    다음은 최근 대화 내용이야.
+    이를 참고해 전체 요약을 갱신해줘.
+
+    [이전 요약]
+    {old_summary}
+
+    [새로운 대화]
+    {recent_chat}
+
+    새로운 통합 요약:
+    """
+)
+
+
+def summarize_turns(old_summary, turns):
+    """여러 턴을 모아 한 번의 LLM 호출로 요약을 갱신"""
+    recent_chat = ""
+    for user_text, ai_text in turns:
+        recent_chat += f"사용자: {user_text}\nAI: {ai_text}\n"
+    summary_input = summarizer_prompt.format(
+        old_summary=old_summary or "이전 요약 없음",
+        recent_chat=recent_chat
+    )
+    # 요약은 화면에서 기다리는 답변보다 낮은 우선순위로 실행
+    llm = get_llm()
+    result = get_scheduler().run(lambda: llm.ainvoke(summary_input), priority=PRIORITY_BACKGROUND)
+    return result.content.strip()
+
+
+# 5. 질문 처리
+def record_turn(thread_id, question, answer):
+    """답변 후 처리: 대화 저장, 요약 갱신 예약, 장기기억 추가 (모두 답변을 기다리게 하지 않음)"""
+    get_session_store().append_messages(thread_id, [("human", question), ("ai", answer)])
+    get_summary_worker().submit(thread_id, question, answer)
+    get_episodic_memory().add_async(thread_id, f"사용자: {question}\nAI: {answer}")
+
+
+def ask(thread_id, question):
+    """
+    답변 문자열을 반환한다 (대화 기록은 저장하지 않음 → record_turn).
+    같은 사용자의 같은 질문이 이미 처리 중이면(버튼 연타, 재실행) 그 결과를 함께 받는다.
+    """
+    chain = get_chain(thread_id)
+    result = get_scheduler().run(
+        lambda: chain.ainvoke(question),
+        key=("memory", thread_id, question),
+        user=thread_id,
+        priority=PRIORITY_INTERACTIVE,
+    )
+    return result.content
+
+
+async def astream_answer(thread_id, question):
+    """답변 토큰을 스트리밍한다 (async_runtime 공유 루프에서 실행, 서버용)"""
+    chain = get_chain(thread_id)
+    chunks = get_scheduler().stream(
+        lambda: chain.astream(question),
+        key=("memory-stream", thread_id, question),
+        user=thread_id,
+        priority=PRIORITY_INTERACTIVE,
+    )
+    async for chunk in chunks:
+        if chunk.content:
+            yield chunk.content
@@ -0,0 +1,34 @@
+import threading
+from collections import deque
+
+
+def percentile(values, q):
+    """q 백분위수 (nearest-rank). 값이 없으면 0.0"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class RollingWindow:
+    """최근 size 개의 측정값만 유지하는 이동 구간 (여러 스레드에서 기록 가능)"""
+
+    def __init__(self, size=500):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        with self._lock:
+            self._values.append(value)
+
+    def values(self):
+        with self._lock:
+            return list(self._values)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        values = self.values()
+        return {f"p{q}": percentile(values, q) for q in qs}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._values)
@@ -0,0 +1,229 @@
+"""
+모델 라우터 - 질문마다 충분히 빠른 모델을 고르고, 실패하면 다른 모델로 대체(fallback)
+
+    python model_router.py --requests 200     # 가짜 백엔드로 오프라인 시뮬레이션
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from history import count_message_tokens
+from metrics import RollingWindow
+
+ROUTER_FAST_MODEL = os.getenv("ROUTER_FAST_MODEL", "gpt-4o-mini")
+ROUTER_STRONG_MODEL = os.getenv("ROUTER_STRONG_MODEL", "gpt-4o")
+ROUTER_LONG_CONTEXT = int(os.getenv("ROUTER_LONG_CONTEXT", "2500"))        # 이 토큰 수를 넘으면 상위 모델
+ROUTER_TTFT_SLO = float(os.getenv("ROUTER_TTFT_SLO", "2.0"))               # 첫 토큰 p95 목표(초)
+ROUTER_FIRST_TOKEN_TIMEOUT = float(os.getenv("ROUTER_FIRST_TOKEN_TIMEOUT", "15"))
+ROUTER_MIN_SAMPLES = 20   # 지연 통계로 판단하기 위한 최소 측정 수
+
+# 상위 모델이 필요한 요청으로 보는 단서 (코드, 분석/비교/추론 요청)
+COMPLEX_HINTS = (
+    "```", "def ", "class ", "코드", "분석", "비교", "증명", "설계", "최적화", "단계별", "왜",
+    "step by step", "analyze", "compare", "prove", "explain why",
+)
+# 어느 모델로 보내도 똑같이 실패할 입력 오류 (대체하지 않고 그대로 올린다)
+INPUT_ERROR_STATUS = {400, 413, 422}
+
+
+def is_input_error(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    return status in INPUT_ERROR_STATUS or "context_length" in str(exc)
+
+
+class RouteDecision:
+    def __init__(self, model, fallbacks, reason):
+        self.model = model            # 처음 시도할 모델
+        self.fallbacks = fallbacks    # 실패 시 차례로 시도할 모델
+        self.reason = reason          # 화면에 보여 줄 선택 이유
+        self.used = None              # 실제로 답변한 모델
+        self.fallback_reason = None   # 대체가 일어난 이유
+
+
+# 1. 백엔드
+class OpenAIChatBackend:
+    """OpenAI SDK 클라이언트로 스트리밍 호출"""
+
+    def __init__(self, client):
+        # 재시도는 라우터의 대체(fallback)가 맡는다 - SDK 가 재시도하면 첫 토큰 타임아웃이 몇 배로 늘어난다
+        self.client = client.with_options(max_retries=0)
+
+    def stream(self, model, messages, temperature, timeout):
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            timeout=timeout,   # 청크 사이 최대 대기 시간 → 첫 토큰 타임아웃 역할
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class FakeChatBackend:
+    """오프라인 시험용 백엔드 (모델별 첫 토큰 지연/오류율 설정)"""
+
+    def __init__(self, latency=None, error_rate=None, tokens_per_second=200, answer_tokens=20):
+        self.latency = latency or {}
+        self.error_rate = error_rate or {}
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+
+    def stream(self, model, messages, temperature, timeout):
+        delay = self.latency.get(model, 0.05)
+        if delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"{model} first token timeout")
+        time.sleep(delay)
+        if random.random() < self.error_rate.get(model, 0.0):
+            raise ConnectionError(f"{model} unavailable")
+        for i in range(self.answer_tokens):
+            time.sleep(1.0 / self.tokens_per_second)
+            yield f" {model}-{i}"
+
+
+# 2. 라우터
+class ModelRouter:
+    """
+    - 입력 길이, 대화 기록 토큰, 간단한 단서로 요청을 분류해 빠른 모델/상위 모델을 고른다.
+    - 모델별 첫 토큰 시간(TTFT)과 전체 시간을 최근 구간(rolling window)으로 기록하고,
+      고른 모델의 p95 TTFT 가 목표(SLO)를 넘으면 목표를 지키는 다른 모델로 돌린다.
+    - 첫 토큰 전에 실패하면(타임아웃, 연결/서버 오류, 모델 권한 없음 등) 다음 모델로 대체한다.
+      입력 자체의 오류(400, 문맥 길이 초과)는 다른 모델에서도 같으므로 그대로 올린다.
+    """
+
+    def __init__(
+        self,
+        backend,
+        fast_model=ROUTER_FAST_MODEL,
+        strong_model=ROUTER_STRONG_MODEL,
+        long_context=ROUTER_LONG_CONTEXT,
+        ttft_slo=ROUTER_TTFT_SLO,
+        first_token_timeout=ROUTER_FIRST_TOKEN_TIMEOUT,
+        window=200,
+    ):
+        self.backend = backend
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.long_context = long_context
+        self.ttft_slo = ttft_slo
+        self.first_token_timeout = first_token_timeout
+        self._ttft = defaultdict(lambda: RollingWindow(window))
+        self._total = defaultdict(lambda: RollingWindow(window))
+        self._counts = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def _p95_ttft(self, model):
+        with self._lock:
+            window = self._ttft.get(model)
+        if window is None or len(window) < ROUTER_MIN_SAMPLES:
+            return None
+        return window.percentiles((95,))["p95"]
+
+    def classify(self, prompt, context_tokens=0):
+        """
+        (모델, 이유) - 토큰 계산과 문자열 검사만 하므로 비용이 거의 없다.
+        context_tokens: 시스템 프롬프트/대화 기록을 포함해 실제로 보낼 전체 토큰 수
+        """
+        prompt_tokens = count_message_tokens(prompt, self.fast_model)
+        total = max(prompt_tokens, context_tokens)
+        if total > self.long_context:
+            return self.strong_model, f"긴 입력 ({total} 토큰)"
+        lowered = prompt.lower()
+        for hint in COMPLEX_HINTS:
+            if hint in lowered:
+                return self.strong_model, f"복잡한 요청 ('{hint.strip()}')"
+        return self.fast_model, f"짧은 질문 ({prompt_tokens} 토큰)"
+
+    def route(self, prompt, context_tokens=0, requested=None):
+        """requested 가 있으면 그 모델을 쓰고 대체용 모델만 붙인다"""
+        if requested:
+            model, reason = requested, "직접 선택"
+        else:
+            model, reason = self.classify(prompt, context_tokens)
+            p95 = self._p95_ttft(model)
+            if p95 is not None and p95 > self.ttft_slo:
+                other = self.fast_model if model == self.strong_model else self.strong_model
+                other_p95 = self._p95_ttft(other)
+                if other_p95 is None or other_p95 <= self.ttft_slo:
+                    reason += f", {model} p95 {p95:.1f}s > 목표 {self.ttft_slo:.1f}s → {other}"
+                    model = other
+        fallback = self.strong_model if model == self.fast_model else self.fast_model
+        return RouteDecision(model, [fallback] if fallback != model else [], reason)
+
+    def stream(self, decision, messages, temperature=0.7):
+        """
+        decision 의 모델로 스트리밍하고, 첫 토큰 전에 실패하면(입력 오류 제외) fallbacks 로 넘어간다.
+        첫 토큰을 보낸 뒤의 오류는 답변이 섞이지 않도록 그대로 올린다.
+        """
+        candidates = [decision.model] + decision.fallbacks
+        for i, model in enumerate(candidates):
+            start = time.perf_counter()
+            ttft = None
+            try:
+                for text in self.backend.stream(model, messages, temperature, self.first_token_timeout):
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        with self._lock:
+                            self._ttft[model].add(ttft)
+                    yield text
+            except Exception as exc:
+                with self._lock:
+                    self._counts[model]["errors"] += 1
+                if ttft is not None or i == len(candidates) - 1 or is_input_error(exc):
+                    raise
+                decision.fallback_reason = f"{model} 실패 ({type(exc).__name__}) → {candidates[i + 1]}"
+                continue
+            with self._lock:
+                self._total[model].add(time.perf_counter() - start)
+                self._counts[model]["requests"] += 1
+            decision.used = model
+            return
+
+    def stats(self):
+        """모델별 요청 수, 오류 수, TTFT/전체 시간 백분위수"""
+        with self._lock:
+            models = sorted(set(self._ttft) | set(self._counts))
+            snapshot = {m: (self._ttft.get(m), self._total.get(m), dict(self._counts[m])) for m in models}
+        result = {}
+        for model, (ttft, total, counts) in snapshot.items():
+            entry = {"requests": counts.get("requests", 0), "errors": counts.get("errors", 0)}
+            if ttft is not None:
+                entry.update({f"ttft_{k}": v for k, v in ttft.percentiles().items()})
+            if total is not None:
+                entry.update({f"total_{k}": v for k, v in total.percentiles().items()})
+            result[model] = entry
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가짜 백엔드로 라우팅/대체 동작 시뮬레이션")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--fast-latency", type=float, default=0.05)
+    parser.add_argument("--strong-latency", type=float, default=0.3)
+    parser.add_argument("--fast-error-rate", type=float, default=0.05)
+    parser.add_argument("--slo", type=float, default=0.2)
+    args = parser.parse_args()
+
+    backend = FakeChatBackend(
+        latency={ROUTER_FAST_MODEL: args.fast_latency, ROUTER_STRONG_MODEL: args.strong_latency},
+        error_rate={ROUTER_FAST_MODEL: args.fast_error_rate},
+        answer_tokens=5,
+    )
+    router = ModelRouter(backend, ttft_slo=args.slo, first_token_timeout=1.0)
+    prompts = ["안녕하세요", "오늘 날씨 어때?", "이 코드를 분석해줘\n```python\nprint(1)\n```", "두 방식을 비교해줘"]
+    decisions = Counter()
+    for n in range(args.requests):
+        decision = router.route(prompts[n % len(prompts)])
+        "".join(router.stream(decision, [{"role": "user", "content": "hi"}]))
+        decisions[(decision.model, decision.used, decision.fallback_reason is not None)] += 1
+    for (model, used, fell_back), count in decisions.most_common():
+        print(f"{model:12s} → {used:12s} fallback={fell_back!s:5s} {count}")
+    for model, entry in router.stats().items():
+        print(model, {k: round(v, 3) if isinstance(v, float) else v for k, v in entry.items()})
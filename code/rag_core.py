@@ -0,0 +1,162 @@
+"""
+문서 RAG 파이프라인 (Streamlit 화면 rag_chatbot.py 와 HTTP 서버 server.py 가 함께 사용)
+"""
+import logging
+import time
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+import async_runtime
+from answer_cache import SemanticAnswerCache
+from clients import get_chat_model, get_embeddings, shared
+from context_builder import build_context
+from doc_registry import DocumentIndex
+from embedding_cache import text_hash
+from ingest import iter_upload_chunks
+from lexical_index import HybridRetriever
+from request_scheduler import PRIORITY_INTERACTIVE, get_scheduler
+from shared_store import SharedVectorStore
+
+logger = logging.getLogger("rag_chatbot")
+
+# 1. 벡터스토어(임베딩 데이터베이스) 저장 폴더 및 프롬프트 설정
+VECTORSTORE_DIR = "faiss_index"
+RAG_MODEL = "gpt-4o-mini"
+RAG_PROMPT_TEMPLATE = """
+        너는 문서를 기반으로 답변하는 AI야.
+        주어진 문서를 참고해 아래 질문에 정확하고 간결하게 답해:
+
+        질문: {question}
+
+        참고 문서:
+        {context}
+        """
+# 프롬프트나 모델이 바뀌면 답변 캐시가 자동으로 비워지도록 내용 해시를 버전으로 사용
+PROMPT_VERSION = text_hash(RAG_MODEL + RAG_PROMPT_TEMPLATE)[:12]
+
+
+# 2. 문서 로드 및 텍스트 분할 함수
+def load_and_split_docs(data, name, tmp_dir=None, stats=None):
+    """
+    업로드된 PDF 또는 TXT 문서(바이트)를 읽고
+    LangChain에서 처리 가능한 문서 객체를 하나씩 내보내는 제너레이터.
+    - 업로드 파일을 작업 폴더에 저장하지 않고 메모리 버퍼에서 바로 파싱 (ingest.py)
+    - 큰 PDF 는 tmp_dir 임시 폴더를 거쳐 페이지 범위별로 병렬 파싱
+    이후 RecursiveCharacterTextSplitter를 이용해 일정 단위로 분할한다.
+    create_vectorstore 에 그대로 넘기면 청크를 모두 모으지 않고 배치 단위로 임베딩한다.
+    (tmp_dir 은 제너레이터를 다 쓸 때까지 남아 있어야 한다)
+    stats(dict)를 넘기면 단계별 소요 시간이 기록된다.
+    """
+    # 문서를 500자 단위로 나누고, 100자 중첩(Overlapping) 적용
+    return iter_upload_chunks(data, name, tmp_dir=tmp_dir, stats=stats)
+
+
+# 3. 벡터스토어 생성/갱신 함수 (문서 업로드 시 실행)
+def create_vectorstore(doc_index, docs, source):
+    """
+    분할된 문서들을 OpenAI 임베딩으로 벡터화한 후,
+    FAISS(Vector Store)에 반영하는 함수.
+    - 처음 올린 문서는 추가, 같은 이름으로 다시 올린 문서는 교체
+      (replace_document 가 쓰기 잠금 안에서 등록 여부를 확인하므로 다른 워커와 동시에 올려도 안전)
+    - 바뀐 청크만 임베딩하며(디스크 캐시 사용), 결과는 새 버전 폴더에 저장된다.
+    - docs 는 리스트나 load_and_split_docs 의 제너레이터 (배치 단위로 처리)
+    """
+    stats = doc_index.replace_document(source, docs)
+    return doc_index.vectordb, stats
+
+
+# 4. 기존 벡터스토어 로드 함수
+def load_vectorstore():
+    """
+    로컬 인덱스 폴더와 문서 레지스트리를 불러오는 함수.
+    인덱스가 아직 없으면 빈 DocumentIndex 를 반환하고, 오류가 있으면 None 반환.
+    """
+    embeddings = get_embeddings()
+    try:
+        return DocumentIndex(VECTORSTORE_DIR, embeddings)
+    except Exception as e:
+        logger.warning("벡터스토어 로드 중 오류 발생: %s", e)
+        return None
+
+
+# 5. RAG (Retrieval-Augmented Generation) 체인 구성 함수
+def build_rag_chain(snapshot):
+    """
+    RAG 체인은 '검색 + 생성'을 결합한 구조.
+    snapshot 은 DocumentIndex.snapshot() - 체인은 이후 문서가 추가/삭제되어도
+    이 버전의 인덱스만 검색한다.
+    - retriever: 사용자의 질문과 유사한 문서 조각 검색 (의미 검색 + BM25 단어 검색 결합)
+    - prompt: 검색된 문맥(context)을 포함하여 모델에 질의
+    - llm: ChatOpenAI 모델이 최종 답변 생성
+    """
+    # 벡터스토어 + BM25 역색인 → 결합(hybrid) retriever 객체로 변환
+    retriever = HybridRetriever(vectordb=snapshot.vectordb, lexical=snapshot.lexical)
+
+    # 답변 프롬프트 템플릿 정의
+    prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
+
+    # ChatOpenAI 모델 호출 설정 (공유 연결 풀 사용)
+    llm = get_chat_model(RAG_MODEL, temperature=0)
+
+    # Runnable 체인 구성:
+    # 사용자의 질문을 retriever에 전달해 청크를 가져온 뒤,
+    # 겹치는/중복 청크를 정리하고 토큰 예산 안에서 context 문자열을 만든다.
+    # 그 결과를 prompt와 LLM으로 이어붙이고, 답변과 함께 context 통계도 반환한다.
+    rag_chain = (
+        RunnablePassthrough.assign(
+            context=RunnableLambda(lambda x: x["question"]) | retriever | RunnableLambda(lambda docs: build_context(docs, model=RAG_MODEL))
+        )
+        | RunnablePassthrough.assign(
+            answer=RunnableLambda(lambda x: {"question": x["question"], "context": x["context"]["text"]})
+            | prompt
+            | llm
+        )
+    )
+    return rag_chain
+
+
+# 6. 스트리밍 답변 생성 함수
+async def astream_rag_answer(rag_chain, question, timings, key=None, user=None):
+    """
+    RAG 체인을 스트리밍으로 실행한다 (async_runtime 공유 루프에서 실행).
+    - 검색이 끝나면 ("sources", context) 를 먼저 내보내고
+    - 이후 LLM 토큰이 생성될 때마다 ("token", 문자열) 을 내보낸다.
+    timings 에는 검색 시간(retrieval), 첫 토큰까지 시간(ttft), 전체 시간(total)이 기록된다.
+    요청 스케줄러를 거치므로 같은 key 의 요청이 진행 중이면 그 스트림을 함께 받는다.
+    """
+    start = time.perf_counter()
+    chunks = get_scheduler().stream(
+        lambda: rag_chain.astream({"question": question}),
+        key=key,
+        user=user,
+        priority=PRIORITY_INTERACTIVE,
+    )
+    async for chunk in chunks:
+        if "context" in chunk:
+            timings["retrieval"] = time.perf_counter() - start
+            yield "sources", chunk["context"]
+        if "answer" in chunk and chunk["answer"].content:
+            if "ttft" not in timings:
+                timings["ttft"] = time.perf_counter() - start
+            yield "token", chunk["answer"].content
+    timings["total"] = time.perf_counter() - start
+    logger.info(
+        "rag answer retrieval=%.3fs ttft=%.3fs total=%.3fs",
+        timings.get("retrieval", 0.0), timings.get("ttft", 0.0), timings["total"],
+    )
+
+
+def stream_rag_answer(rag_chain, question, timings, key=None, user=None):
+    """astream_rag_answer 의 동기 버전 (Streamlit 스크립트용)"""
+    return async_runtime.iterate(lambda: astream_rag_answer(rag_chain, question, timings, key, user))
+
+
+# 7. 프로세스 공유 리소스 (Streamlit 재실행과 서버 요청이 모두 같은 객체를 사용)
+def get_shared_store():
+    """인덱스 버전(CURRENT)이 바뀐 경우에만 다시 로드하고, 체인도 버전별로 한 번만 만든다"""
+    return shared("rag_store", lambda: SharedVectorStore(VECTORSTORE_DIR, load_vectorstore))
+
+
+def get_answer_cache():
+    return shared("rag_answer_cache", lambda: SemanticAnswerCache(get_embeddings()))
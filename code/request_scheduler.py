@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import async_runtime
+from metrics import RollingWindow
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))   # 프로세스 전체 동시 LLM 호출 수
+LLM_MAX_PER_USER = int(os.getenv("LLM_MAX_PER_USER", "2"))          # 사용자당 동시 호출 수
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "100"))              # 대기열 최대 길이 (넘으면 즉시 거절)
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))     # 대기열 최대 대기 시간(초)
+
+# 우선순위 (작을수록 먼저 실행)
+PRIORITY_INTERACTIVE = 0   # 사용자가 화면에서 기다리는 답변
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2    # 요약 갱신 등 백그라운드 작업
+
+
+class SchedulerBusy(Exception):
+    """대기열이 가득 찼거나 대기 시간이 초과된 경우 (타임아웃이 쌓이기 전에 빠르게 거절)"""
+
+
+class _Flight:
+    """진행 중인 요청 하나의 결과를 여러 구독자에게 나눠 주는 객체 (single-flight)"""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def push(self, item):
+        self.items.append(item)
+        self.notify()
+
+
+class RequestScheduler:
+    """
+    LLM 호출 앞단의 비동기 스케줄러 (async_runtime 공유 루프에서 동작).
+    - single-flight: 같은 key 의 요청이 진행 중이면 새로 호출하지 않고 그 결과(스트림)를 함께 받는다.
+      Streamlit 재실행이나 버튼 두 번 클릭으로 같은 질문이 다시 들어와도 LLM 호출은 한 번이다.
+    - 우선순위 대기열 + 전체/사용자별 동시 실행 수 제한
+    - 대기열이 가득 차거나 대기 시간이 길어지면 SchedulerBusy 로 빠르게 거절
+    - 대기열 길이, 대기 시간 백분위수 등 지표 제공
+    """
+
+    def __init__(
+        self,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_per_user=LLM_MAX_PER_USER,
+        max_queue=LLM_MAX_QUEUE,
+        queue_timeout=LLM_QUEUE_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # 아래 상태는 공유 루프 스레드에서만 변경한다
+        self._waiting = []                     # [priority, seq, user, granted future] 힙
+        self._seq = itertools.count()
+        self._running = 0
+        self._user_running = defaultdict(int)
+        self._flights = {}                     # key → _Flight
+        # 지표 (다른 스레드에서 읽음)
+        self._metrics_lock = threading.Lock()
+        self._counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+        self._max_queue_depth = 0
+        self.wait_times = RollingWindow()
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._counters[name] += 1
+
+    # 1. 실행 슬롯 (우선순위 + 동시성 제한)
+    def _dispatch(self):
+        skipped = []
+        while self._waiting and self._running < self.max_concurrency:
+            ticket = heapq.heappop(self._waiting)
+            _, _, user, granted = ticket
+            if granted.done():  # 대기 중 취소된 요청
+                continue
+            if user is not None and self._user_running[user] >= self.max_per_user:
+                skipped.append(ticket)
+                continue
+            self._running += 1
+            if user is not None:
+                self._user_running[user] += 1
+            granted.set_result(None)
+        for ticket in skipped:
+            heapq.heappush(self._waiting, ticket)
+
+    def _release(self, user):
+        self._running -= 1
+        if user is not None:
+            self._user_running[user] -= 1
+            if not self._user_running[user]:
+                del self._user_running[user]
+        self._dispatch()
+
+    @asynccontextmanager
+    async def _slot(self, user, priority):
+        if len(self._waiting) >= self.max_queue:
+            self._count("rejected")
+            raise SchedulerBusy("요청이 많아 잠시 후 다시 시도해 주세요")
+        granted = asyncio.get_running_loop().create_future()
+        ticket = [priority, next(self._seq), user, granted]
+        heapq.heappush(self._waiting, ticket)
+        with self._metrics_lock:
+            self._max_queue_depth = max(self._max_queue_depth, len(self._waiting))
+        enqueued = time.perf_counter()
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), self.queue_timeout)
+        except BaseException as exc:
+            if granted.done() and not granted.cancelled():
+                self._release(user)
+            else:
+                granted.cancel()
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+            if isinstance(exc, asyncio.TimeoutError):
+                self._count("timeouts")
+                raise SchedulerBusy("대기 시간이 초과되었습니다") from None
+            raise
+        self.wait_times.add(time.perf_counter() - enqueued)
+        try:
+            yield
+        finally:
+            self._release(user)
+
+    async def _produce(self, flight, key, factory, user, priority):
+        try:
+            async with self._slot(user, priority):
+                result = factory()
+                if hasattr(result, "__aiter__"):
+                    async for item in result:
+                        flight.push(item)
+                else:
+                    flight.push(await result)
+        except Exception as exc:
+            if not isinstance(exc, SchedulerBusy):
+                self._count("errors")
+            flight.error = exc
+        finally:
+            flight.done = True
+            flight.notify()
+            if key is not None and self._flights.get(key) is flight:
+                del self._flights[key]
+
+    # 2. 비동기 API
+    async def stream(self, factory, key=None, user=None, priority=PRIORITY_NORMAL):
+        """
+        factory() 가 반환하는 비동기 이터레이터(예: chain.astream(...))의 항목을 내보낸다.
+        같은 key 가 진행 중이면 지금까지의 항목을 먼저 재생한 뒤 이어서 함께 받는다.
+        구독자가 중간에 떠나도 원래 요청은 끝까지 실행되어 다른 구독자가 이어받을 수 있다.
+        """
+        self._count("submitted")
+        flight = self._flights.get(key) if key is not None else None
+        if flight is None:
+            flight = _Flight()
+            if key is not None:
+                self._flights[key] = flight
+            asyncio.ensure_future(self._produce(flight, key, factory, user, priority))
+        else:
+            self._count("coalesced")
+
+        i = 0
+        while True:
+            changed = flight.changed
+            while i < len(flight.items):
+                yield flight.items[i]
+                i += 1
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await changed.wait()
+
+    async def submit(self, factory, key=None, user=None, priority=PRIORITY_NORMAL):
+        """factory() 가 반환하는 awaitable(예: chain.ainvoke(...))의 결과를 반환"""
+        result = None
+        async for item in self.stream(factory, key, user, priority):
+            result = item
+        return result
+
+    # 3. 동기 API (Streamlit 스크립트, 백그라운드 스레드용)
+    def run(self, factory, key=None, user=None, priority=PRIORITY_NORMAL):
+        return async_runtime.run(self.submit(factory, key, user, priority))
+
+    def iter_stream(self, factory, key=None, user=None, priority=PRIORITY_NORMAL):
+        return async_runtime.iterate(lambda: self.stream(factory, key, user, priority))
+
+    # 4. 지표
+    def stats(self):
+        with self._metrics_lock:
+            stats = dict(self._counters)
+            stats["max_queue_depth"] = self._max_queue_depth
+        stats.update(
+            queue_depth=len(self._waiting),
+            running=self._running,
+            in_flight=len(self._flights),
+            **{f"wait_{name}": value for name, value in self.wait_times.percentiles().items()},
+        )
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """프로세스 전체가 공유하는 스케줄러 (memory.py 의 요약 작업자와 화면 요청이 같은 제한을 받는다)"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
@@ -0,0 +1,263 @@
+"""
+헤드리스 HTTP 서버 (FastAPI) - 채팅/RAG/문서 등록/기억 챗봇을 SSE 스트리밍 API 로 제공
+
+    uvicorn server:app --host 0.0.0.0 --port 8000 --workers 4
+
+- Streamlit 화면(app_adv.py, rag_chatbot.py, memory.py)과 같은 core 모듈을 사용한다.
+- 인덱스, OpenAI 클라이언트, 스케줄러는 워커 프로세스마다 하나씩 만들어 모든 요청이 공유한다.
+- 여러 워커가 같은 faiss_index/ 와 sessions.sqlite(WAL)를 함께 쓴다.
+  한 워커에서 문서를 등록하면 CURRENT 버전이 바뀌고, 다른 워커는 다음 요청 때 새 버전을 불러온다.
+  문서 수정은 파일 잠금으로 한 번에 한 워커만 하고, 대화 기록/기억 캐시는 DB 의 마지막 id 를 확인해 갱신한다.
+- /chat 의 대화 기록 요약(conversation_id)은 워커별로 보관된다. 요청마다 전체 messages 를 보내므로
+  다른 워커로 가도 답변은 맞지만, 요약은 그 워커에서 다시 만들어진다.
+- 스트리밍 응답은 text/event-stream (이벤트: route/sources/cached/token/done/error)
+
+    curl -N -X POST localhost:8000/rag/query -H 'Content-Type: application/json' -d '{"question": "요약해줘"}'
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+import async_runtime
+import chat_core
+import memory_core
+import rag_core
+from request_scheduler import SchedulerBusy, get_scheduler
+
+load_dotenv(".env")
+
+SERVER_MAX_CONVERSATIONS = int(os.getenv("SERVER_MAX_CONVERSATIONS", "1000"))  # 워커당 보관할 대화 기록 수
+UPLOAD_DIR = tempfile.mkdtemp(prefix="rag_server_upload_")
+
+
+# 1. 요청 본문
+class ChatRequest(BaseModel):
+    messages: list[dict]                # [{"role": "user"|"assistant", "content": "..."}, ...]
+    conversation_id: Optional[str] = None  # 같은 값이면 대화 기록 요약을 이어서 사용
+    system_prompt: str = chat_core.DEFAULT_SYSTEM_PROMPT
+    model: str = chat_core.AUTO_MODEL
+    temperature: float = 0.7
+
+
+class RagQuery(BaseModel):
+    question: str
+    user: Optional[str] = None
+
+
+class MemoryQuery(BaseModel):
+    question: str
+
+
+# 2. 공통 도우미
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    """이벤트 제너레이터를 SSE 응답으로 변환 (오류는 error 이벤트로 전달)"""
+
+    async def body():
+        try:
+            async for event, data in events:
+                yield sse(event, data)
+        except SchedulerBusy as e:
+            yield sse("error", {"message": str(e), "busy": True})
+        except Exception as e:
+            yield sse("error", {"message": str(e)})
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+_histories = OrderedDict()   # conversation_id → (HistoryManager, 잠금) (워커별 LRU)
+
+
+def get_history(conversation_id):
+    """(대화 기록, 잠금) - 같은 대화의 동시 요청이 기록/요약을 함께 고치지 않도록 잠금으로 순서를 지킨다"""
+    if conversation_id is None:
+        return chat_core.new_history(), threading.Lock()
+    entry = _histories.get(conversation_id)
+    if entry is None:
+        entry = _histories[conversation_id] = (chat_core.new_history(), threading.Lock())
+    _histories.move_to_end(conversation_id)
+    while len(_histories) > SERVER_MAX_CONVERSATIONS:
+        _histories.popitem(last=False)
+    return entry
+
+
+def doc_to_dict(doc):
+    return {"source": doc.metadata.get("source"), "page": doc.metadata.get("page")}
+
+
+# 3. 앱 (시작할 때 인덱스/클라이언트를 미리 준비해 첫 요청 지연을 줄임)
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.to_thread(rag_core.get_shared_store().get)
+    chat_core.get_router()
+    memory_core.get_summary_worker()
+    yield
+    await asyncio.to_thread(memory_core.get_session_store().flush)
+
+
+app = FastAPI(title="web chatbot", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "scheduler": get_scheduler().stats(),
+        "router": chat_core.get_router().stats(),
+        "rag_store": rag_core.get_shared_store().stats(),
+        "answer_cache": dict(rag_core.get_answer_cache().stats),
+    }
+
+
+# 4. 일반 채팅 (app_adv.py)
+@app.post("/chat")
+async def chat(req: ChatRequest):
+    if not req.messages:
+        raise HTTPException(400, "messages 가 비어 있습니다")
+    history, lock = get_history(req.conversation_id)
+
+    def prepare():
+        with lock:
+            return chat_core.prepare_chat(history, req.system_prompt, req.messages, req.model)
+
+    async def events():
+        api_messages, prompt_tokens, decision = await asyncio.to_thread(prepare)
+        yield "route", {"model": decision.model, "reason": decision.reason, "prompt_tokens": prompt_tokens}
+        router = chat_core.get_router()
+        async for text in async_runtime.iterate_in_thread(
+            router.stream(decision, api_messages, req.temperature)
+        ):
+            yield "token", {"text": text}
+        yield "done", {"model": decision.used, "fallback": decision.fallback_reason}
+
+    return sse_response(events())
+
+
+# 5. 문서 RAG (rag_chatbot.py)
+@app.post("/rag/query")
+async def rag_query(req: RagQuery):
+    store = rag_core.get_shared_store()
+    doc_index = await asyncio.to_thread(store.get)
+    if doc_index is None:
+        raise HTTPException(503, "벡터스토어를 불러오지 못했습니다")
+    rag_chain, version = store.get_versioned_chain(rag_core.build_rag_chain)
+    if rag_chain is None:
+        raise HTTPException(404, "등록된 문서가 없습니다")
+    answer_cache = rag_core.get_answer_cache()
+
+    async def events():
+        cached = await asyncio.to_thread(answer_cache.lookup, req.question, version, rag_core.PROMPT_VERSION)
+        if cached.answer is not None:
+            yield "cached", {"answer": cached.answer, "kind": cached.kind, "similarity": cached.similarity}
+            return
+        timings = {}
+        answer = ""
+        stream = async_runtime.relay(lambda: rag_core.astream_rag_answer(
+            rag_chain, req.question, timings, key=("rag", version, req.question), user=req.user,
+        ))
+        async for kind, value in stream:
+            if kind == "sources":
+                yield "sources", {"docs": [doc_to_dict(d) for d in value["docs"]], "stats": value["stats"]}
+            else:
+                answer += value
+                yield "token", {"text": value}
+        await asyncio.to_thread(
+            answer_cache.store, req.question, answer, version, rag_core.PROMPT_VERSION, cached.vector
+        )
+        yield "done", timings
+
+    return sse_response(events())
+
+
+@app.get("/rag/documents")
+async def list_documents():
+    doc_index = await asyncio.to_thread(rag_core.get_shared_store().get)
+    if doc_index is None:
+        raise HTTPException(503, "벡터스토어를 불러오지 못했습니다")
+    return {
+        "version": doc_index.loaded_version,
+        "documents": {source: len(info["chunk_ids"]) for source, info in doc_index.list_documents().items()},
+    }
+
+
+@app.post("/rag/documents")
+async def upload_document(request: Request, name: str):
+    """본문에 파일 바이트를 그대로 보낸다: curl --data-binary @a.pdf 'localhost:8000/rag/documents?name=a.pdf'"""
+    if not name.lower().endswith((".pdf", ".txt")):
+        raise HTTPException(400, "PDF 또는 TXT 파일만 등록할 수 있습니다")
+    data = await request.body()
+    doc_index = await asyncio.to_thread(rag_core.get_shared_store().get)
+    if doc_index is None:
+        raise HTTPException(503, "벡터스토어를 불러오지 못했습니다")
+
+    def ingest():
+        ingest_stats = {}
+        with tempfile.TemporaryDirectory(dir=UPLOAD_DIR) as tmp_dir:
+            docs = rag_core.load_and_split_docs(data, name, tmp_dir=tmp_dir, stats=ingest_stats)
+            _, stats = rag_core.create_vectorstore(doc_index, docs, name)
+        return {**stats, "ingest": ingest_stats}
+
+    # 파싱/임베딩은 스레드에서 실행해 다른 요청의 스트리밍을 막지 않는다
+    return await asyncio.to_thread(ingest)
+
+
+@app.delete("/rag/documents/{source:path}")
+async def delete_document(source: str):
+    """source 에 / 가 있어도 된다: DELETE /rag/documents/reports/2024/a.pdf"""
+    doc_index = await asyncio.to_thread(rag_core.get_shared_store().get)
+    if doc_index is None:
+        raise HTTPException(503, "벡터스토어를 불러오지 못했습니다")
+    # 등록 여부는 쓰기 잠금 안에서 최신 버전 기준으로 확인된다 (다른 요청/워커가 먼저 지웠으면 KeyError)
+    try:
+        stats = await asyncio.to_thread(doc_index.remove_document, source)
+    except KeyError:
+        raise HTTPException(404, "등록되지 않은 문서입니다")
+    return {"removed": source, "version": stats["version"]}
+
+
+# 6. 기억 챗봇 (memory.py)
+@app.post("/memory/{thread_id}/chat")
+async def memory_chat(thread_id: str, req: MemoryQuery):
+    async def events():
+        answer = ""
+        async for text in async_runtime.relay(lambda: memory_core.astream_answer(thread_id, req.question)):
+            answer += text
+            yield "token", {"text": text}
+        await asyncio.to_thread(memory_core.record_turn, thread_id, req.question, answer)
+        yield "done", {"pending_summary_turns": memory_core.get_summary_worker().pending_turns(thread_id)}
+
+    return sse_response(events())
+
+
+@app.get("/memory/{thread_id}")
+async def memory_state(thread_id: str, limit: int = 10):
+    store = memory_core.get_session_store()
+    messages = await asyncio.to_thread(store.get_messages, thread_id, limit)
+    summary = await asyncio.to_thread(memory_core.load_summary, thread_id)
+    return {
+        "summary": summary,
+        "messages": [{"role": role, "content": content} for role, content in messages],
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("server:app", host="127.0.0.1", port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,188 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite")
+SESSION_CACHE_THREADS = int(os.getenv("SESSION_CACHE_THREADS", "1000"))  # 메모리에 둘 최대 사용자 수
+SESSION_CACHE_MESSAGES = 20   # 사용자별로 메모리에 둘 최근 메시지 수
+SESSION_BATCH_SIZE = 64       # 모아서 쓸 최대 메시지 수
+SESSION_FLUSH_INTERVAL = 0.5  # 최대 쓰기 지연(초)
+
+
+# 1. 세션 저장소 인터페이스
+class SessionStore(ABC):
+    """사용자(thread_id)별 대화 기록과 장기기억 요약을 저장하는 인터페이스"""
+
+    @abstractmethod
+    def append_messages(self, thread_id, messages):
+        """messages: [(role, content), ...]  role 은 "human" / "ai" """
+
+    @abstractmethod
+    def get_messages(self, thread_id, limit=10):
+        """최근 limit 개의 (role, content) 목록 (오래된 것 → 최신 순)"""
+
+    @abstractmethod
+    def get_summary(self, thread_id):
+        """장기기억 요약 (없으면 빈 문자열)"""
+
+    @abstractmethod
+    def set_summary(self, thread_id, summary):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# 2. SQLite(WAL) 구현
+class SQLiteSessionStore(SessionStore):
+    """
+    임베디드 SQLite 기반 세션 저장소.
+    - WAL 모드: 쓰는 동안에도 다른 연결/프로세스가 읽을 수 있다.
+    - thread_id 인덱스로 사용자별 조회
+    - 메시지는 모아서(batch) 한 트랜잭션으로 기록 (최대 SESSION_FLUSH_INTERVAL 초 지연)
+    - 최근 메시지는 사용자별 LRU 캐시에 두되, 캐시할 사용자 수를 제한해 메모리 사용량을 묶는다.
+      다른 프로세스(서버 워커)가 같은 DB 에 쓸 수 있으므로, 캐시를 쓰기 전에 사용자의
+      마지막 메시지 id 를 확인해 바뀌었으면 다시 읽는다. 요약은 캐시하지 않고 매번 읽는다.
+    """
+
+    def __init__(
+        self,
+        path=SESSION_DB_PATH,
+        cache_threads=SESSION_CACHE_THREADS,
+        cache_messages=SESSION_CACHE_MESSAGES,
+        batch_size=SESSION_BATCH_SIZE,
+        flush_interval=SESSION_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.cache_threads = cache_threads
+        self.cache_messages = cache_messages
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._buffer = []               # 아직 기록하지 않은 (thread_id, role, content, created_at)
+        self._recent = OrderedDict()    # thread_id → (DB 의 마지막 메시지 id, deque[(role, content)])  (LRU)
+        self._closed = threading.Event()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id  TEXT NOT NULL,
+                role       TEXT NOT NULL,
+                content    TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages(thread_id, id);
+            CREATE TABLE IF NOT EXISTS summaries (
+                thread_id  TEXT PRIMARY KEY,
+                summary    TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+        # 주기적으로 버퍼를 기록하는 백그라운드 스레드
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-flush", daemon=True)
+        self._flusher.start()
+
+    # 캐시 도우미
+    def _touch(self, cache, thread_id):
+        cache.move_to_end(thread_id)
+        while len(cache) > self.cache_threads:
+            cache.popitem(last=False)
+
+    def _last_id(self, thread_id):
+        (last_id,) = self._conn.execute(
+            "SELECT MAX(id) FROM messages WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        return last_id or 0
+
+    def _load_recent(self, thread_id):
+        # (thread_id, id) 인덱스로 마지막 id 만 확인 - 다른 워커가 추가했으면 캐시를 새로 만든다
+        last_id = self._last_id(thread_id)
+        entry = self._recent.get(thread_id)
+        if entry is None or entry[0] != last_id:
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE thread_id = ? ORDER BY id DESC LIMIT ?",
+                (thread_id, self.cache_messages),
+            ).fetchall()
+            recent = deque(reversed(rows), maxlen=self.cache_messages)
+            # 아직 기록되지 않은 버퍼의 메시지도 반영
+            recent.extend((role, content) for tid, role, content, _ in self._buffer if tid == thread_id)
+            entry = self._recent[thread_id] = (last_id, recent)
+        self._touch(self._recent, thread_id)
+        return entry[1]
+
+    # 메시지
+    def append_messages(self, thread_id, messages):
+        now = time.time()
+        with self._lock:
+            recent = self._load_recent(thread_id)
+            for role, content in messages:
+                self._buffer.append((thread_id, role, content, now))
+                recent.append((role, content))
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def get_messages(self, thread_id, limit=10):
+        with self._lock:
+            if limit <= self.cache_messages:
+                return list(self._load_recent(thread_id))[-limit:]
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE thread_id = ? ORDER BY id DESC LIMIT ?",
+                (thread_id, limit),
+            ).fetchall()
+            return list(reversed(rows))
+
+    # 요약
+    def get_summary(self, thread_id):
+        # 기본 키 조회 한 번 - 다른 워커가 갱신한 요약도 바로 보인다
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            return row[0] if row else ""
+
+    def set_summary(self, thread_id, summary):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (thread_id, summary, updated_at) VALUES (?, ?, ?)",
+                (thread_id, summary, time.time()),
+            )
+            self._conn.commit()
+
+    # 기록
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        self._conn.executemany(
+            "INSERT INTO messages (thread_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            self._buffer,
+        )
+        self._conn.commit()
+        self._buffer = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from doc_registry import current_index_path, index_version
+
+
+def current_rss_bytes():
+    """현재 프로세스의 메모리 사용량(RSS). /proc 이 없으면 최대 RSS 로 대신한다."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def directory_bytes(path):
+    if not os.path.isdir(path):
+        return 0
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+        if os.path.isfile(os.path.join(path, name))
+    )
+
+
+class SharedVectorStore:
+    """
+    프로세스 전체(모든 세션)가 함께 쓰는 벡터스토어/체인 캐시.
+    - 인덱스는 한 번만 읽고, 디스크의 인덱스 버전(CURRENT)이 바뀐 경우에만 다시 읽는다.
+    - 체인도 인덱스 버전별로 한 번만 만든다.
+    - 로드 시간, 인덱스 크기, 프로세스 메모리 사용량을 stats() 로 확인할 수 있다.
+    """
+
+    def __init__(self, index_dir, loader):
+        self.index_dir = index_dir
+        self.loader = loader          # () -> DocumentIndex (실패 시 None)
+        self._index = None
+        self._chains = {}
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "load_seconds": 0.0, "rss_delta_bytes": 0}
+
+    def get(self):
+        """현재 버전의 DocumentIndex 반환 (버전 확인은 CURRENT 파일 읽기 1회)"""
+        version = index_version(self.index_dir)
+        index = self._index
+        if index is not None and index.loaded_version == version:
+            return index
+        with self._lock:
+            if self._index is None or self._index.loaded_version != index_version(self.index_dir):
+                rss_before = current_rss_bytes()
+                start = time.perf_counter()
+                loaded = self.loader()
+                if loaded is None:
+                    return self._index
+                self._index = loaded
+                self._chains = {}
+                self._stats["loads"] += 1
+                self._stats["load_seconds"] = time.perf_counter() - start
+                self._stats["rss_delta_bytes"] = current_rss_bytes() - rss_before
+            return self._index
+
+    def get_versioned_chain(self, build_fn):
+        """
+        (체인, 인덱스 버전) - 체인은 그 버전의 스냅샷으로 만들므로 답변 캐시 키에 이 버전을 쓰면
+        체인이 검색한 데이터와 캐시 버전이 어긋나지 않는다. 버전이 바뀌면 build_fn(스냅샷)으로 새로 생성.
+        """
+        index = self.get()
+        if index is None:
+            return None, None
+        snapshot = index.snapshot()
+        if snapshot.vectordb is None:
+            return None, snapshot.version
+        # Streamlit 은 매 실행마다 함수를 새로 정의하므로 키는 인덱스 버전만 사용
+        key = snapshot.version
+        chain = self._chains.get(key)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    chain = build_fn(snapshot)
+                    self._chains = {key: chain}
+        return chain, key
+
+    def get_chain(self, build_fn):
+        """현재 인덱스 버전에 맞는 체인 반환"""
+        return self.get_versioned_chain(build_fn)[0]
+
+    def stats(self):
+        index = self._index
+        return {
+            **self._stats,
+            "version": index.loaded_version if index is not None else None,
+            "index_bytes": directory_bytes(current_index_path(self.index_dir)),
+            "rss_bytes": current_rss_bytes(),
+        }
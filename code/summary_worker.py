@@ -0,0 +1,127 @@
+import logging
+import os
+import queue
+import threading
+
+from history import count_message_tokens
+
+# 요약 갱신 조건: 쌓인 대화가 N턴 이상이거나 토큰 수가 기준 이상일 때
+SUMMARY_EVERY_TURNS = int(os.getenv("SUMMARY_EVERY_TURNS", "3"))
+SUMMARY_TOKEN_THRESHOLD = int(os.getenv("SUMMARY_TOKEN_THRESHOLD", "1500"))
+# 요약 실패 시 재시도 간격: 2초, 4초, 8초 ... 최대 60초
+SUMMARY_RETRY_BASE = float(os.getenv("SUMMARY_RETRY_BASE", "2"))
+SUMMARY_RETRY_MAX = float(os.getenv("SUMMARY_RETRY_MAX", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryWorker:
+    """
+    장기기억 요약을 답변 경로 밖(백그라운드 스레드)에서 갱신한다.
+    - submit() 은 대화를 대기열에 넣기만 하므로 답변을 막지 않는다.
+    - 같은 사용자의 여러 턴을 모아서(coalesce) 한 번의 요약 호출로 반영한다.
+    - 요약에 실패하면 대화를 되돌려 두고 지수 백오프로 다시 시도한다.
+    summarize_fn(이전 요약, [(질문, 답변), ...]) -> 새 요약 문자열
+    load_fn(thread_id) -> 현재 요약,  save_fn(thread_id, 요약) -> None
+    """
+
+    def __init__(
+        self,
+        summarize_fn,
+        load_fn,
+        save_fn,
+        every_turns=SUMMARY_EVERY_TURNS,
+        token_threshold=SUMMARY_TOKEN_THRESHOLD,
+    ):
+        self.summarize_fn = summarize_fn
+        self.load_fn = load_fn
+        self.save_fn = save_fn
+        self.every_turns = every_turns
+        self.token_threshold = token_threshold
+        self._pending = {}        # thread_id → [(질문, 답변), ...]
+        self._pending_tokens = {}
+        self._queued = set()      # 이미 대기열에 들어간 thread_id (중복 작업 방지)
+        self._failures = {}       # thread_id → 연속 실패 횟수
+        self._retrying = set()    # 재시도 타이머가 걸린 thread_id
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._idle = threading.Condition(self._lock)
+        self._running = 0
+        self._thread = threading.Thread(target=self._run, name="summary-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, thread_id, question, answer):
+        """대화 한 턴을 추가하고, 조건을 넘으면 요약 작업을 예약"""
+        tokens = count_message_tokens(question) + count_message_tokens(answer)
+        with self._lock:
+            self._pending.setdefault(thread_id, []).append((question, answer))
+            self._pending_tokens[thread_id] = self._pending_tokens.get(thread_id, 0) + tokens
+            ready = (
+                len(self._pending[thread_id]) >= self.every_turns
+                or self._pending_tokens[thread_id] >= self.token_threshold
+            )
+            if ready:
+                self._schedule(thread_id)
+
+    def flush(self, thread_id=None, wait=False):
+        """조건과 상관없이 대기 중인 대화를 요약 (wait=True 면 끝날 때까지 대기)"""
+        with self._lock:
+            for tid in ([thread_id] if thread_id is not None else list(self._pending)):
+                if self._pending.get(tid):
+                    self._schedule(tid)
+            if wait:
+                self._idle.wait_for(lambda: not self._queued and self._running == 0)
+
+    def pending_turns(self, thread_id):
+        with self._lock:
+            return len(self._pending.get(thread_id, []))
+
+    def _schedule(self, thread_id):
+        if thread_id not in self._queued:
+            self._queued.add(thread_id)
+            self._queue.put(thread_id)
+
+    def _schedule_retry(self, thread_id):
+        """실패 횟수에 따라 늦춰서 다시 예약 (이미 타이머가 있으면 그대로 둔다)"""
+        if thread_id in self._retrying:
+            return
+        failures = self._failures.get(thread_id, 1)
+        delay = min(SUMMARY_RETRY_MAX, SUMMARY_RETRY_BASE * 2 ** (failures - 1))
+        self._retrying.add(thread_id)
+
+        def retry():
+            with self._lock:
+                self._retrying.discard(thread_id)
+                if self._pending.get(thread_id):
+                    self._schedule(thread_id)
+
+        timer = threading.Timer(delay, retry)
+        timer.daemon = True
+        timer.start()
+
+    def _run(self):
+        while True:
+            thread_id = self._queue.get()
+            with self._lock:
+                self._queued.discard(thread_id)
+                turns = self._pending.pop(thread_id, [])
+                tokens = self._pending_tokens.pop(thread_id, 0)
+                self._running += 1
+            try:
+                if turns:
+                    new_summary = self.summarize_fn(self.load_fn(thread_id), turns)
+                    self.save_fn(thread_id, new_summary)
+                with self._lock:
+                    self._failures.pop(thread_id, None)
+            except Exception:
+                logger.exception("summary update failed for %s", thread_id)
+                # 실패한 대화와 토큰 수를 되돌리고, 새 턴이 없어도 백오프 후 다시 시도
+                with self._lock:
+                    self._pending[thread_id] = turns + self._pending.get(thread_id, [])
+                    self._pending_tokens[thread_id] = tokens + self._pending_tokens.get(thread_id, 0)
+                    self._failures[thread_id] = self._failures.get(thread_id, 0) + 1
+                    self._schedule_retry(thread_id)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._idle.notify_all()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# code/ 의 모듈은 같은 폴더 기준으로 import 하므로 경로에 추가한다
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ByteEncoding:
+    """UTF-8 바이트 하나를 토큰 하나로 세는 가짜 인코딩 (tiktoken 의 BPE 파일을 내려받지 않음)"""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text.encode("utf-8"))
+
+    def decode_bytes(self, tokens):
+        return bytes(tokens)
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="replace")
+
+
+@pytest.fixture
+def offline_tokenizer(monkeypatch):
+    """토큰 계산을 ByteEncoding 으로 바꿔 네트워크 없이 테스트한다"""
+    tokenizer = pytest.importorskip("tokenizer")
+    monkeypatch.setattr(tokenizer, "get_encoding", lambda name=tokenizer.DEFAULT_ENCODING: ByteEncoding())
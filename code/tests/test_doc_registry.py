@@ -0,0 +1,126 @@
+"""DocumentIndex 의 copy-on-write 커밋 - 읽는 쪽 스냅샷은 쓰기 중에도, 실패한 쓰기 뒤에도 그대로"""
+import threading
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+pytest.importorskip("tiktoken")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from doc_registry import DocumentIndex  # noqa: E402
+from embedding_cache import EmbeddingCache, HashEmbeddings  # noqa: E402
+from lexical_index import HybridRetriever  # noqa: E402
+
+pytestmark = pytest.mark.usefixtures("offline_tokenizer")
+
+
+def make_docs(source, n):
+    return [Document(page_content=f"{source} 카드 안내 {i}번 조항", metadata={"source": source, "page": i}) for i in range(n)]
+
+
+@pytest.fixture
+def make_index(tmp_path):
+    caches = []
+
+    def make(index_type="flat", mmap=True):
+        cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+        caches.append(cache)
+        return DocumentIndex(str(tmp_path / "index"), HashEmbeddings(), cache=cache, index_type=index_type, mmap=mmap)
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_snapshot_is_not_changed_by_later_writes(make_index):
+    index = make_index()
+    index.add_document("a.pdf", make_docs("a.pdf", 3))
+    before = index.snapshot()
+
+    index.add_document("b.pdf", make_docs("b.pdf", 4))
+    index.remove_document("a.pdf")
+
+    assert before.vectordb.index.ntotal == 3
+    assert len(before.lexical) == 3
+    assert set(before.documents) == {"a.pdf"}
+    after = index.snapshot()
+    assert after.version != before.version
+    assert after.vectordb.index.ntotal == 4
+    assert set(index.list_documents()) == {"b.pdf"}
+
+
+def test_failed_write_leaves_snapshot_and_disk_unchanged(make_index):
+    index = make_index()
+    index.add_document("a.pdf", make_docs("a.pdf", 2))
+    before = index.snapshot()
+
+    def broken():
+        yield from make_docs("b.pdf", 2)
+        raise OSError("upload interrupted")
+
+    with pytest.raises(OSError):
+        index.add_document("b.pdf", broken())
+    assert index.snapshot() is before
+    assert index.version == before.version
+    assert before.vectordb.index.ntotal == 2
+    assert "b.pdf" not in index.documents
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw", "pq", "sq"])
+def test_index_types_add_and_remove(make_index, index_type):
+    index = make_index(index_type)
+    index.add_document("one.pdf", make_docs("one.pdf", 1))   # 학습 벡터 1개
+    index.add_document("many.pdf", make_docs("many.pdf", 40))
+    index.remove_document("one.pdf")
+    assert index.vectordb.index.ntotal == 40
+
+    reopened = make_index(index_type)  # 메모리 맵으로 다시 열어 수정
+    reopened.replace_document("many.pdf", make_docs("many.pdf", 30))
+    assert reopened.vectordb.index.ntotal == 30
+    assert len(reopened.vectordb.similarity_search("카드 안내", k=4)) == 4
+
+
+def test_search_while_writing(make_index):
+    index = make_index()
+    index.add_document("base.pdf", make_docs("base.pdf", 20))
+    retriever = HybridRetriever(vectordb=index.vectordb, lexical=index.lexical)
+    errors, done = [], threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                assert len(retriever.invoke("카드 안내 3번")) == 4
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+                return
+
+    reader = threading.Thread(target=search)
+    reader.start()
+    try:
+        for i in range(5):
+            index.add_document(f"doc{i}.pdf", make_docs(f"doc{i}.pdf", 20))
+            index.remove_document(f"doc{i}.pdf")
+    finally:
+        done.set()
+        reader.join()
+    assert errors == []
+    assert retriever.vectordb.index.ntotal == 20
+
+
+def test_writes_return_committed_version(make_index):
+    index = make_index()
+    added = index.replace_document("a.pdf", make_docs("a.pdf", 2))   # 없는 출처는 추가
+    assert added["added"] == 2 and added["version"] == index.loaded_version
+    unchanged = index.replace_document("a.pdf", make_docs("a.pdf", 2))
+    assert unchanged == {"added": 0, "removed": 0, "version": added["version"]}
+
+    other = make_index()  # 같은 폴더를 여는 다른 워커
+    removed = other.remove_document("a.pdf")
+    assert removed["version"] != added["version"]
+    # 이 워커는 아직 a.pdf 가 있는 버전을 들고 있지만, 잠금 안에서 최신 버전을 다시 읽는다
+    assert "a.pdf" in index.documents
+    with pytest.raises(KeyError):
+        index.remove_document("a.pdf")
+    assert index.loaded_version == removed["version"]
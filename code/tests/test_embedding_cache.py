@@ -0,0 +1,73 @@
+"""임베딩 캐시 적중과 중단된 임베딩 작업의 체크포인트 재개 (오프라인, 가짜 임베딩)"""
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("tiktoken")
+
+pytestmark = pytest.mark.usefixtures("offline_tokenizer")
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache, HashEmbeddings  # noqa: E402
+from embedding_pipeline import EmbeddingPipeline  # noqa: E402
+
+
+class FailingEmbeddings(HashEmbeddings):
+    """fail_after 개 배치까지만 성공하고 이후 요청은 모두 실패 (중간에 끊긴 작업 흉내)"""
+
+    def __init__(self, fail_after, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_after = fail_after
+        self.batches = 0
+
+    async def aembed_documents(self, texts):
+        self.batches += 1
+        if self.batches > self.fail_after:
+            raise ValueError("connection dropped")
+        return self.embed_documents(texts)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_second_pass_is_served_from_cache(cache):
+    underlying = HashEmbeddings()
+    embedder = CachedEmbeddings(underlying, cache=cache)
+    texts = ["카드 분실 신고", "연회비 안내", "카드 분실 신고"]
+
+    first = embedder.embed_documents(texts)
+    assert underlying.calls == 2  # 같은 텍스트는 한 번만 임베딩
+    assert first[0] == first[2]
+
+    second = embedder.embed_documents(texts)
+    assert underlying.calls == 2
+    # 캐시는 float32 로 저장한다
+    assert second == [pytest.approx(v, abs=1e-6) for v in first]
+    assert cache.stats()["hits"] == 3
+
+
+def test_normalized_text_shares_cache_entry(cache):
+    underlying = HashEmbeddings()
+    embedder = CachedEmbeddings(underlying, cache=cache)
+    embedder.embed_documents(["결제일  변경\n"])
+    embedder.embed_documents([" 결제일 변경"])
+    assert underlying.calls == 1
+    assert len(cache) == 1
+
+
+def test_interrupted_run_resumes_from_finished_batches(cache):
+    texts = [f"청크 {i}" for i in range(10)]
+    failing = FailingEmbeddings(fail_after=2, model="hash-embedding")
+    pipeline = EmbeddingPipeline(failing, batch_size=2, max_concurrency=1, max_retries=0)
+    with pytest.raises(ValueError):
+        CachedEmbeddings(failing, cache=cache, pipeline=pipeline).embed_documents(texts)
+    # 끝난 배치 두 개(청크 4개)는 실패 전에 캐시에 저장됐다
+    assert len(cache) == 4
+
+    underlying = HashEmbeddings(model="hash-embedding")
+    pipeline = EmbeddingPipeline(underlying, batch_size=2, max_concurrency=1)
+    vectors = CachedEmbeddings(underlying, cache=cache, pipeline=pipeline).embed_documents(texts)
+    assert underlying.calls == 6
+    assert vectors == [pytest.approx(v, abs=1e-6) for v in underlying.embed_documents(texts)]
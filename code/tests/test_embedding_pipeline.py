@@ -0,0 +1,110 @@
+"""임베딩 파이프라인의 재시도/백오프 - 가짜 예외와 가짜 OpenAI 서버(fake_openai_server)로 확인"""
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("tiktoken")
+
+pytestmark = pytest.mark.usefixtures("offline_tokenizer")
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from embedding_cache import HashEmbeddings  # noqa: E402
+from embedding_pipeline import EmbeddingPipeline, is_retryable, make_batches  # noqa: E402
+from fake_openai_server import FakeOpenAIConfig, fake_vector, start_server  # noqa: E402
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FlakyEmbeddings(HashEmbeddings):
+    """처음 failures 번의 요청은 status 오류로 실패"""
+
+    def __init__(self, failures, status=429, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.status = status
+        self.requests = 0
+
+    async def aembed_documents(self, texts):
+        self.requests += 1
+        if self.requests <= self.failures:
+            raise StatusError(self.status)
+        return self.embed_documents(texts)
+
+
+def test_batches_respect_size_and_token_limits():
+    texts = ["가 나 다"] * 5
+    batches = make_batches(texts, batch_size=2, max_tokens=10_000)
+    assert [indices for indices, _ in batches] == [[0, 1], [2, 3], [4]]
+    assert all(len(indices) == 1 for indices, _ in make_batches(texts, batch_size=10, max_tokens=1))
+
+
+def test_retryable_status_codes():
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400))
+    assert is_retryable(TimeoutError())
+
+
+def test_rate_limited_batches_are_retried_with_backoff():
+    underlying = FlakyEmbeddings(failures=3)
+    pipeline = EmbeddingPipeline(underlying, batch_size=2, max_concurrency=1, base_delay=0.01, max_delay=0.05)
+    texts = [f"청크 {i}" for i in range(6)]
+    assert pipeline.embed(texts) == underlying.embed_documents(texts)
+    assert pipeline.stats["retries"] == 3
+    assert pipeline.stats["batches"] == 3
+
+
+def test_non_retryable_error_is_raised():
+    underlying = FlakyEmbeddings(failures=1, status=400)
+    pipeline = EmbeddingPipeline(underlying, base_delay=0.01)
+    with pytest.raises(StatusError):
+        pipeline.embed(["청크"])
+    assert pipeline.stats["retries"] == 0
+
+
+class HTTPEmbeddings(Embeddings):
+    """urllib 로 /v1/embeddings 를 호출하는 최소 클라이언트 (HTTP 오류는 status_code/response 를 가진 예외로)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def embed_documents(self, texts):
+        request = urllib.request.Request(
+            f"{self.base_url}/embeddings",
+            data=json.dumps({"model": "text-embedding-ada-002", "input": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return [item["embedding"] for item in json.load(response)["data"]]
+        except urllib.error.HTTPError as e:
+            error = StatusError(e.code)
+            error.response = e
+            raise error from None
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_retries_after_429_from_fake_server():
+    config = FakeOpenAIConfig(latency=0.0, max_rps=2, dimensions=8)
+    server, base_url = start_server(config)
+    try:
+        pipeline = EmbeddingPipeline(HTTPEmbeddings(base_url), batch_size=2, max_concurrency=4, base_delay=0.01)
+        texts = [f"청크 {i}" for i in range(8)]
+        vectors = pipeline.embed(texts)
+    finally:
+        server.shutdown()
+
+    # 동시에 보낸 4개 요청 중 일부는 429 를 받고 Retry-After 만큼 모두 기다린 뒤 다시 보낸다
+    assert config.rejected > 0
+    assert pipeline.stats["retries"] == config.rejected
+    assert vectors == [pytest.approx(fake_vector(t, 8)) for t in texts]
@@ -0,0 +1,25 @@
+"""작은 학습 데이터에서 ivf/pq 인덱스 만들기"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from faiss_index import build_faiss_index, factory_string, needs_retrain  # noqa: E402
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5])
+def test_pq_trains_on_few_vectors(n):
+    x = np.random.default_rng(0).random((n, 16), dtype="float32")
+    index, params = build_faiss_index(x, "pq", {"m": 4})
+    index.add(x)
+    assert index.ntotal == n
+    assert needs_retrain(params, n * 2)
+
+
+def test_pq_codebook_never_exceeds_training_vectors():
+    params = {"nlist": 256, "m": 8, "nbits": 8}
+    assert factory_string("pq", 16, 1, params) == "IVF1,Flat"
+    assert factory_string("pq", 16, 3, params) == "IVF1,PQ8x1np"
+    assert factory_string("pq", 16, 100, params) == "IVF2,PQ8x6np"
+    assert factory_string("pq", 16, 20000, params) == "IVF256,PQ8x8np"
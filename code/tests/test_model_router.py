@@ -0,0 +1,115 @@
+"""모델 라우터의 분류, 첫 토큰 전 대체(fallback), TTFT 목표(SLO) 기반 전환 - FakeChatBackend 사용"""
+import pytest
+
+pytest.importorskip("tiktoken")
+
+pytestmark = pytest.mark.usefixtures("offline_tokenizer")
+
+from model_router import ROUTER_MIN_SAMPLES, FakeChatBackend, ModelRouter, OpenAIChatBackend  # noqa: E402
+
+FAST, STRONG = "fast-model", "strong-model"
+MESSAGES = [{"role": "user", "content": "안녕하세요"}]
+
+
+def make_router(latency=None, error_rate=None, **kwargs):
+    backend = FakeChatBackend(latency=latency, error_rate=error_rate, tokens_per_second=10_000, answer_tokens=3)
+    kwargs.setdefault("first_token_timeout", 1.0)
+    return ModelRouter(backend, fast_model=FAST, strong_model=STRONG, **kwargs)
+
+
+def test_classify_by_length_and_hints():
+    router = make_router(long_context=100)
+    assert router.classify("카드 연회비 알려줘")[0] == FAST
+    assert router.classify("두 요금제를 비교해줘")[0] == STRONG
+    assert router.classify("짧은 질문", context_tokens=500)[0] == STRONG
+
+
+def test_falls_back_on_first_token_timeout():
+    router = make_router(latency={FAST: 0.5, STRONG: 0.0}, first_token_timeout=0.05)
+    decision = router.route("안녕하세요")
+    assert decision.model == FAST
+    answer = "".join(router.stream(decision, MESSAGES))
+    assert decision.used == STRONG
+    assert "TimeoutError" in decision.fallback_reason
+    assert answer.startswith(f" {STRONG}-0")
+    assert router.stats()[FAST]["errors"] == 1
+
+
+def test_falls_back_on_connection_error():
+    router = make_router(latency={FAST: 0.0, STRONG: 0.0}, error_rate={FAST: 1.0})
+    decision = router.route("안녕하세요")
+    "".join(router.stream(decision, MESSAGES))
+    assert decision.used == STRONG
+    assert "ConnectionError" in decision.fallback_reason
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, message=""):
+        super().__init__(message or f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FailingPrimaryBackend(FakeChatBackend):
+    """FAST 모델은 첫 토큰 전에 error 로 실패"""
+
+    def __init__(self, error):
+        super().__init__(latency={FAST: 0.0, STRONG: 0.0}, tokens_per_second=10_000, answer_tokens=3)
+        self.error = error
+
+    def stream(self, model, messages, temperature, timeout):
+        if model == FAST:
+            raise self.error
+        yield from super().stream(model, messages, temperature, timeout)
+
+
+@pytest.mark.parametrize("error", [StatusError(404, "model not found"), StatusError(403), PermissionError()])
+def test_falls_back_on_model_errors(error):
+    router = ModelRouter(FailingPrimaryBackend(error), fast_model=FAST, strong_model=STRONG)
+    decision = router.route("안녕하세요")
+    "".join(router.stream(decision, MESSAGES))
+    assert decision.used == STRONG
+
+
+@pytest.mark.parametrize("error", [StatusError(400), Exception("context_length_exceeded")])
+def test_input_errors_are_not_retried_on_another_model(error):
+    router = ModelRouter(FailingPrimaryBackend(error), fast_model=FAST, strong_model=STRONG)
+    decision = router.route("안녕하세요")
+    with pytest.raises(type(error)):
+        "".join(router.stream(decision, MESSAGES))
+    assert decision.used is None
+
+
+def test_openai_backend_disables_sdk_retries():
+    openai = pytest.importorskip("openai")
+    client = openai.OpenAI(api_key="fake", base_url="http://127.0.0.1:9/v1", max_retries=3)
+    assert OpenAIChatBackend(client).client.max_retries == 0
+
+
+def test_last_candidate_error_is_raised():
+    router = make_router(latency={FAST: 0.0, STRONG: 0.0}, error_rate={FAST: 1.0, STRONG: 1.0})
+    decision = router.route("안녕하세요")
+    with pytest.raises(ConnectionError):
+        "".join(router.stream(decision, MESSAGES))
+    assert decision.used is None
+
+
+def test_switches_model_when_p95_ttft_misses_slo():
+    router = make_router(latency={FAST: 0.02, STRONG: 0.0}, ttft_slo=0.01)
+    # 측정 수가 모자라면 분류 결과를 그대로 쓴다
+    for _ in range(ROUTER_MIN_SAMPLES):
+        decision = router.route("안녕하세요")
+        assert decision.model == FAST
+        "".join(router.stream(decision, MESSAGES))
+
+    decision = router.route("안녕하세요")
+    assert decision.model == STRONG
+    assert decision.fallbacks == [FAST]
+    assert "목표" in decision.reason
+
+
+def test_keeps_model_when_other_also_misses_slo():
+    router = make_router(latency={FAST: 0.02, STRONG: 0.02}, ttft_slo=0.01)
+    for model in (FAST, STRONG):
+        for _ in range(ROUTER_MIN_SAMPLES):
+            "".join(router.stream(router.route("안녕하세요", requested=model), MESSAGES))
+    assert router.route("안녕하세요").model == FAST
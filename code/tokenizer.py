@@ -0,0 +1,29 @@
+from functools import lru_cache
+
+import tiktoken
+from tiktoken.model import encoding_name_for_model
+
+DEFAULT_ENCODING = "cl100k_base"      # 임베딩 모델(text-embedding-ada-002) 기준
+FALLBACK_CHAT_ENCODING = "o200k_base"  # tiktoken 이 모르는 채팅 모델
+
+
+# 토큰 수 계산 도우미 - 임베딩 배치, RAG 문맥, 대화 기록이 함께 쓴다
+@lru_cache(maxsize=8)
+def get_encoding(name=DEFAULT_ENCODING):
+    return tiktoken.get_encoding(name)
+
+
+def encoding_name_for(model):
+    """모델 이름 → 인코딩 이름 (BPE 파일을 내려받지 않는 표 조회)"""
+    try:
+        return encoding_name_for_model(model)
+    except KeyError:
+        return FALLBACK_CHAT_ENCODING
+
+
+def encoding_for(model):
+    return get_encoding(encoding_name_for(model))
+
+
+def count_tokens(text, encoding_name=DEFAULT_ENCODING):
+    return len(get_encoding(encoding_name).encode(text, disallowed_special=()))